@@ -1,30 +1,10 @@
 from flask import request, jsonify
 from flask_restful import Resource
 from config import get_db_connection
-import jwt
+from auth_middleware import get_user_from_token
 import random
 import string
 
-def verify_token(token):
-    """Verify JWT token and return user data"""
-    try:
-        payload = jwt.decode(token, 'your-secret-key-here-change-in-production', algorithms=['HS256'])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
-
-def get_user_from_token():
-    """Extract user from authorization token"""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    
-    token = auth_header.split(' ')[1]
-    user_data = verify_token(token)
-    return user_data
-
 class Accounts(Resource):
     def get(self):
         """Get all accounts for the user"""
@@ -1,52 +1,69 @@
 from flask import request, jsonify
 from flask_restful import Resource
-from config import get_db_connection
+from config import get_db_connection, Config
+from auth_middleware import get_user_from_token, admin_role_cache, invalidate_admin_role
 import jwt
 from decimal import Decimal
 from passlib.hash import pbkdf2_sha256
+import base64
 import datetime
+import json
 from services.stock_service import stock_service
+from services.portfolio_valuation import portfolio_valuation
+from services.price_history import price_history
+from services.crypto_service import crypto_service
+from services.metrics_service import metrics_service
+from services.ledger_service import ledger_service
+from services.crypto_funding_service import crypto_funding_service, FUNDING_ACTIONS
+from export_stream import streaming_response, csv_chunks
+from ttl_cache import TTLCache
 
-def verify_token(token):
-    """Verify JWT token and return user data"""
-    try:
-        payload = jwt.decode(token, 'your-secret-key-here-change-in-production', algorithms=['HS256'])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
-
-def get_admin_from_token():
-    """Extract admin from authorization token - only users with is_admin=True"""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    
-    token = auth_header.split(' ')[1]
-    user_data = verify_token(token)
+def get_admin_from_token(cursor=None):
+    """Extract admin from authorization token - only users with is_admin=True
     
+    The is_admin flag is served from a short-lived cache; on a miss it is read
+    with the caller's cursor when given, otherwise with a short query on its
+    own connection. Handlers pass the cursor of the connection they already
+    checked out and call it before parsing the request, so a non-admin gets
+    403 before any validation and no second connection is opened.
+    """
+    user_data = get_user_from_token()
     if not user_data:
         return None
     
-    # Check if user is admin in database
-    conn = get_db_connection()
-    if not conn:
-        return None
-        
-    try:
-        cursor = conn.cursor(dictionary=True, buffered=True)
-        cursor.execute("SELECT is_admin FROM users WHERE user_id = %s", (user_data['user_id'],))
-        user = cursor.fetchone()
-        
-        if user and user['is_admin']:
-            return user_data
-        return None
-    except:
-        return None
-    finally:
-        cursor.close()
-        conn.close()
+    user_id = user_data['user_id']
+    is_admin = admin_role_cache.get(user_id)
+    if is_admin is not None:
+        return user_data if is_admin else None
+    
+    if cursor is not None:
+        try:
+            is_admin = fetch_is_admin(cursor, user_id)
+        except:
+            return None
+    else:
+        # Check if user is admin in database
+        conn = get_db_connection()
+        if not conn:
+            return None
+            
+        try:
+            own_cursor = conn.cursor(dictionary=True, buffered=True)
+            is_admin = fetch_is_admin(own_cursor, user_id)
+        except:
+            return None
+        finally:
+            own_cursor.close()
+            conn.close()
+    
+    admin_role_cache.put(user_id, is_admin)
+    return user_data if is_admin else None
+
+def fetch_is_admin(cursor, user_id):
+    """Read users.is_admin using a dictionary cursor"""
+    cursor.execute("SELECT is_admin FROM users WHERE user_id = %s", (user_id,))
+    user = cursor.fetchone()
+    return bool(user and user['is_admin'])
 
 def serialize_dates(obj):
     """Convert date/datetime objects to ISO format strings for JSON serialization"""
@@ -59,6 +76,108 @@ def serialize_dates(obj):
     else:
         return obj
 
+MAX_ADMIN_PAGE_SIZE = 200
+
+def encode_page_cursor(*values):
+    """Encode the last row's sort position as an opaque cursor"""
+    raw = json.dumps([serialize_dates(value) for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_page_cursor(cursor_value, size):
+    """Decode a cursor from encode_page_cursor into its `size` values; raises ValueError"""
+    try:
+        padded = cursor_value + '=' * (-len(cursor_value) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+def keyset_condition(sort_column, id_column, descending):
+    """WHERE fragment selecting rows after (sort value, id) in the page order"""
+    op = '<' if descending else '>'
+    if sort_column == id_column:
+        return f"{id_column} {op} %s", 1
+    return f"({sort_column} {op} %s OR ({sort_column} = %s AND {id_column} {op} %s))", 3
+
+def nullable_keyset_condition(sort_column, id_column, descending, sort_value, last_id):
+    """keyset_condition for a nullable sort column, returned as (fragment, params)
+    
+    MySQL sorts NULLs first ascending and last descending; a NULL never
+    compares equal, so NULL sort values need their own branch.
+    """
+    op = '<' if descending else '>'
+    if sort_value is None:
+        if descending:
+            return f"({sort_column} IS NULL AND {id_column} {op} %s)", [last_id]
+        return f"({sort_column} IS NOT NULL OR {id_column} {op} %s)", [last_id]
+    condition = f"{sort_column} {op} %s OR ({sort_column} = %s AND {id_column} {op} %s)"
+    if descending:
+        condition += f" OR {sort_column} IS NULL"
+    return f"({condition})", [sort_value, sort_value, last_id]
+
+def like_prefix(value):
+    """LIKE pattern matching values that start with `value` (wildcards escaped)"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+admin_count_cache = TTLCache(Config.ADMIN_COUNT_CACHE_SIZE, Config.ADMIN_COUNT_CACHE_TTL)
+
+def approximate_count(cursor, table, where, params):
+    """Optimizer row estimate for `SELECT ... FROM table WHERE where`, cached per filter"""
+    key = (table, where, tuple(params))
+    total = admin_count_cache.get(key)
+    if total is None:
+        cursor.execute(f"EXPLAIN SELECT 1 FROM {table} WHERE {where}", params)
+        plan = cursor.fetchall()
+        total = int(plan[0]['rows'] or 0) if plan else 0
+        admin_count_cache.put(key, total)
+    return total
+
+
+def parse_filter_date(value, field):
+    """Parse a YYYY-MM-DD query parameter"""
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'Invalid {field} date. Use YYYY-MM-DD')
+
+def created_at_conditions(alias, id_column, paginate=True):
+    """WHERE clauses for the `from`/`to` dates (inclusive) and a newest-first `cursor`; raises ValueError"""
+    where = []
+    params = []
+    if request.args.get('from'):
+        where.append(f"{alias}.created_at >= %s")
+        params.append(parse_filter_date(request.args['from'], 'from'))
+    if request.args.get('to'):
+        where.append(f"{alias}.created_at < %s")
+        params.append(parse_filter_date(request.args['to'], 'to') + datetime.timedelta(days=1))
+    
+    page_cursor = request.args.get('cursor')
+    if paginate and page_cursor:
+        try:
+            created_at, last_id = decode_page_cursor(page_cursor, 2)
+            created_at = datetime.datetime.fromisoformat(created_at)
+        except (ValueError, TypeError):
+            raise ValueError('Invalid cursor')
+        condition, _ = keyset_condition(f"{alias}.created_at", f"{alias}.{id_column}", True)
+        where.append(condition)
+        params += [created_at, created_at, last_id]
+    return where, params
+
+USER_SORT_COLUMNS = {
+    'created_at': 'created_at',
+    'user_id': 'user_id',
+    'email': 'email',
+    'name': 'full_name'
+}
+NULLABLE_USER_SORTS = {'name'}
+USER_SEARCH_COLUMNS = {
+    'email': 'email',
+    'name': 'full_name',
+    'phone': 'phone'
+}
+
 class AdminRegister(Resource):
     def post(self):
         """Register a new admin (protected endpoint)"""
@@ -138,13 +257,16 @@ class AdminLogin(Resource):
             if not pbkdf2_sha256.verify(password, admin['password_hash']):
                 return {'error': 'Invalid password'}, 401
             
+            # The flag was just read from the database; drop any cached copy
+            invalidate_admin_role(admin['user_id'])
+            
             # Generate JWT token
             token = jwt.encode({
                 'user_id': admin['user_id'],
                 'email': admin['email'],
                 'is_admin': True,
                 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-            }, 'your-secret-key-here-change-in-production', algorithm='HS256')
+            }, Config.JWT_SECRET_KEY, algorithm='HS256')
             
             return {
                 'message': 'Admin login successful',
@@ -165,11 +287,13 @@ class AdminLogin(Resource):
 
 class AdminUsers(Resource):
     def get(self):
-        """Get all users (Admin only)"""
-        admin_data = get_admin_from_token()
-        if not admin_data:
-            return {'error': 'Admin access required'}, 403
+        """List users a page at a time (Admin only).
         
+        `sort` is one of created_at, user_id, email or name and `order` is asc
+        or desc; pass the previous page's `next_cursor` as `cursor` to get the
+        next page. `q` is a prefix search on email, name and phone (`field`
+        restricts it to one of them). `total_users` is a cached estimate.
+        """
         conn = get_db_connection()
         if not conn:
             return {'error': 'Database connection failed'}, 500
@@ -177,15 +301,71 @@ class AdminUsers(Resource):
         try:
             cursor = conn.cursor(dictionary=True, buffered=True)
             
-            cursor.execute("""
+            if not get_admin_from_token(cursor):
+                return {'error': 'Admin access required'}, 403
+            
+            limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_ADMIN_PAGE_SIZE)
+            sort = request.args.get('sort', 'created_at')
+            order = request.args.get('order', 'desc').lower()
+            
+            if sort not in USER_SORT_COLUMNS:
+                return {'error': f'Sort must be one of: {", ".join(USER_SORT_COLUMNS)}'}, 400
+            if order not in ('asc', 'desc'):
+                return {'error': 'Order must be asc or desc'}, 400
+            
+            sort_column = USER_SORT_COLUMNS[sort]
+            descending = order == 'desc'
+            
+            where = []
+            params = []
+            search = (request.args.get('q') or '').strip()
+            if search:
+                field = request.args.get('field')
+                if field and field not in USER_SEARCH_COLUMNS:
+                    return {'error': f'Field must be one of: {", ".join(USER_SEARCH_COLUMNS)}'}, 400
+                columns = [USER_SEARCH_COLUMNS[field]] if field else list(USER_SEARCH_COLUMNS.values())
+                where.append('(' + ' OR '.join(f"{column} LIKE %s" for column in columns) + ')')
+                params += [like_prefix(search)] * len(columns)
+            
+            filter_sql = ' AND '.join(where) or '1 = 1'
+            filter_params = list(params)
+            
+            page_cursor = request.args.get('cursor')
+            if page_cursor:
+                try:
+                    sort_value, last_user_id = decode_page_cursor(page_cursor, 2)
+                    if sort == 'created_at':
+                        sort_value = datetime.datetime.fromisoformat(sort_value)
+                except (ValueError, TypeError):
+                    return {'error': 'Invalid cursor'}, 400
+                if sort in NULLABLE_USER_SORTS:
+                    condition, keyset_params = nullable_keyset_condition(
+                        sort_column, 'user_id', descending, sort_value, last_user_id
+                    )
+                else:
+                    condition, size = keyset_condition(sort_column, 'user_id', descending)
+                    keyset_params = [sort_value, sort_value, last_user_id] if size == 3 else [last_user_id]
+                where.append(condition)
+                params += keyset_params
+            
+            direction = 'DESC' if descending else 'ASC'
+            order_by = f"{sort_column} {direction}"
+            if sort_column != 'user_id':
+                order_by += f", user_id {direction}"
+            
+            cursor.execute(f"""
                 SELECT 
                     user_id, email, full_name, phone, date_of_birth,
                     is_admin, created_at, updated_at
                 FROM users 
-                ORDER BY created_at DESC
-            """)
+                WHERE {' AND '.join(where) or '1 = 1'}
+                ORDER BY {order_by}
+                LIMIT %s
+            """, params + [limit + 1])
             
             users = cursor.fetchall()
+            has_more = len(users) > limit
+            users = users[:limit]
             
             # ✅ FIX: Serialize all dates to ISO format strings
             formatted_users = []
@@ -201,9 +381,22 @@ class AdminUsers(Resource):
                     'updated_at': user['updated_at'].isoformat() if user['updated_at'] else None
                 })
             
+            next_cursor = None
+            if has_more and users:
+                last = users[-1]
+                next_cursor = encode_page_cursor(last[sort_column], last['user_id'])
+            
             return {
                 'users': formatted_users,
-                'total_users': len(users)
+                'total_users': approximate_count(cursor, 'users', filter_sql, filter_params),
+                'pagination': {
+                    'limit': limit,
+                    'sort': sort,
+                    'order': order,
+                    'has_more': has_more,
+                    'next_cursor': next_cursor,
+                    'total_is_estimate': True
+                }
             }
             
         except Exception as e:
@@ -213,13 +406,125 @@ class AdminUsers(Resource):
             cursor.close()
             conn.close()
 
+class AdminUsersOverview(Resource):
+    def get(self):
+        """Users with account, balance, crypto and KYC totals, newest first (Admin only).
+        
+        One grouped query per page: the page of users is selected first and
+        only those users are joined to their accounts, wallets and profile.
+        Pass the previous page's `next_cursor` as `cursor` to continue.
+        """
+        conn = get_db_connection()
+        if not conn:
+            return {'error': 'Database connection failed'}, 500
+            
+        try:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            
+            if not get_admin_from_token(cursor):
+                return {'error': 'Admin access required'}, 403
+            
+            limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_ADMIN_PAGE_SIZE)
+            
+            where = '1 = 1'
+            params = []
+            page_cursor = request.args.get('cursor')
+            if page_cursor:
+                try:
+                    created_at, last_user_id = decode_page_cursor(page_cursor, 2)
+                    created_at = datetime.datetime.fromisoformat(created_at)
+                except (ValueError, TypeError):
+                    return {'error': 'Invalid cursor'}, 400
+                where, _ = keyset_condition('created_at', 'user_id', True)
+                params = [created_at, created_at, last_user_id]
+            
+            # One LEFT JOIN per currency; (user_id, currency) is unique so these add no rows
+            currencies = crypto_service.config.SUPPORTED_CRYPTO
+            wallet_columns = ''.join(
+                f", MAX(w_{currency.lower()}.balance) AS {currency.lower()}_balance" for currency in currencies
+            )
+            wallet_joins = ''.join(
+                f" LEFT JOIN crypto_wallets w_{currency.lower()}"
+                f" ON w_{currency.lower()}.user_id = u.user_id AND w_{currency.lower()}.currency = '{currency}'"
+                for currency in currencies
+            )
+            
+            cursor.execute(f"""
+                SELECT 
+                    u.user_id, u.email, u.full_name, u.is_admin, u.created_at,
+                    MAX(p.kyc_tier) AS kyc_tier,
+                    COUNT(a.account_id) AS account_count,
+                    COALESCE(SUM(a.balance), 0) AS total_balance
+                    {wallet_columns}
+                FROM (
+                    SELECT user_id, email, full_name, is_admin, created_at
+                    FROM users
+                    WHERE {where}
+                    ORDER BY created_at DESC, user_id DESC
+                    LIMIT %s
+                ) u
+                LEFT JOIN user_profiles p ON p.user_id = u.user_id
+                LEFT JOIN accounts a ON a.user_id = u.user_id
+                {wallet_joins}
+                GROUP BY u.user_id, u.email, u.full_name, u.is_admin, u.created_at
+                ORDER BY u.created_at DESC, u.user_id DESC
+            """, params + [limit + 1])
+            
+            users = cursor.fetchall()
+            has_more = len(users) > limit
+            users = users[:limit]
+            
+            live_prices = crypto_service.get_live_prices()
+            
+            formatted_users = []
+            for user in users:
+                wallets = {}
+                crypto_total_usd = Decimal('0')
+                for currency in currencies:
+                    balance = user[f'{currency.lower()}_balance']
+                    if balance is None:
+                        continue
+                    wallets[currency] = float(balance)
+                    crypto_total_usd += Decimal(str(balance)) * live_prices.get(currency, Decimal('0'))
+                
+                formatted_users.append({
+                    'user_id': user['user_id'],
+                    'email': user['email'],
+                    'full_name': user['full_name'],
+                    'is_admin': bool(user['is_admin']),
+                    'kyc_tier': user['kyc_tier'] or 'unverified',
+                    'account_count': user['account_count'],
+                    'total_balance': float(user['total_balance']),
+                    'crypto_wallets': wallets,
+                    'crypto_total_usd': float(crypto_total_usd),
+                    'created_at': user['created_at'].isoformat() if user['created_at'] else None
+                })
+            
+            next_cursor = None
+            if has_more and users:
+                last = users[-1]
+                next_cursor = encode_page_cursor(last['created_at'], last['user_id'])
+            
+            return {
+                'users': formatted_users,
+                'total_users': approximate_count(cursor, 'users', '1 = 1', []),
+                'pagination': {
+                    'limit': limit,
+                    'has_more': has_more,
+                    'next_cursor': next_cursor,
+                    'total_is_estimate': True
+                }
+            }
+            
+        except Exception as e:
+            return {'error': f'Failed to get users overview: {str(e)}'}, 500
+        finally:
+            cursor.close()
+            conn.close()
+
 class AdminUserAccounts(Resource):
     def get(self, user_id):
         """Get all accounts for a specific user (Admin only)"""
-        admin_data = get_admin_from_token()
-        if not admin_data:
-            return {'error': 'Admin access required'}, 403
-        
         conn = get_db_connection()
         if not conn:
             return {'error': 'Database connection failed'}, 500
@@ -227,6 +532,9 @@ class AdminUserAccounts(Resource):
         try:
             cursor = conn.cursor(dictionary=True, buffered=True)
             
+            if not get_admin_from_token(cursor):
+                return {'error': 'Admin access required'}, 403
+            
             # Get user info
             cursor.execute("SELECT user_id, email, full_name FROM users WHERE user_id = %s", (user_id,))
             user = cursor.fetchone()
@@ -277,25 +585,6 @@ class AdminUserAccounts(Resource):
 class AdminAdjustBalance(Resource):
     def post(self):
         """Admin: Add or subtract from user account balance"""
-        admin_data = get_admin_from_token()
-        if not admin_data:
-            return {'error': 'Admin access required'}, 403
-        
-        data = request.get_json()
-        required_fields = ['user_id', 'account_type', 'amount', 'description']
-        for field in required_fields:
-            if not data or not data.get(field):
-                return {'error': f'{field} is required'}, 400
-        
-        user_id = data['user_id']
-        account_type = data['account_type']
-        description = data['description']
-        
-        try:
-            amount = Decimal(str(data['amount']))
-        except ValueError:
-            return {'error': 'Invalid amount'}, 400
-        
         conn = get_db_connection()
         if not conn:
             return {'error': 'Database connection failed'}, 500
@@ -303,37 +592,41 @@ class AdminAdjustBalance(Resource):
         try:
             cursor = conn.cursor(dictionary=True, buffered=True)
             
-            # Get user account
-            cursor.execute("""
-                SELECT account_id, account_number, balance 
-                FROM accounts 
-                WHERE user_id = %s AND account_type = %s
-            """, (user_id, account_type))
+            if not get_admin_from_token(cursor):
+                return {'error': 'Admin access required'}, 403
             
-            account = cursor.fetchone()
+            data = request.get_json()
+            required_fields = ['user_id', 'account_type', 'amount', 'description']
+            for field in required_fields:
+                if not data or not data.get(field):
+                    return {'error': f'{field} is required'}, 400
+            
+            user_id = data['user_id']
+            account_type = data['account_type']
+            description = data['description']
+            
+            try:
+                amount = Decimal(str(data['amount']))
+            except ValueError:
+                return {'error': 'Invalid amount'}, 400
+            
+            # Get and lock user account
+            account = ledger_service.lock_account(
+                cursor, "user_id = %s AND account_type = %s", (user_id, account_type)
+            )
             
             if not account:
                 return {'error': 'Account not found'}, 404
             
-            # Calculate new balance
-            current_balance = Decimal(str(account['balance']))
-            new_balance = current_balance + amount
-            
             # Prevent negative balance
-            if new_balance < 0:
+            current_balance = Decimal(str(account['balance']))
+            if current_balance + amount < 0:
                 return {'error': 'Balance cannot be negative'}, 400
             
-            # Update balance
-            cursor.execute(
-                "UPDATE accounts SET balance = %s WHERE account_id = %s",
-                (float(new_balance), account['account_id'])
-            )
-            
-            # Record admin transaction
+            # Update balance and record admin transaction
             transaction_type = 'deposit' if amount > 0 else 'withdraw'
-            cursor.execute(
-                "INSERT INTO transactions (account_id, type, amount, balance_after, description) VALUES (%s, %s, %s, %s, %s)",
-                (account['account_id'], transaction_type, float(abs(amount)), float(new_balance), f'Admin adjustment: {description}')
+            _, new_balance = ledger_service.post(
+                cursor, account, transaction_type, abs(amount), f'Admin adjustment: {description}'
             )
             
             conn.commit()
@@ -361,20 +654,6 @@ class AdminAdjustBalance(Resource):
 class AdminAddStock(Resource):
     def post(self):
         """Admin: Add new stock to the system"""
-        admin_data = get_admin_from_token()
-        if not admin_data:
-            return {'error': 'Admin access required'}, 403
-        
-        data = request.get_json()
-        required_fields = ['symbol', 'company_name']
-        for field in required_fields:
-            if not data or not data.get(field):
-                return {'error': f'{field} is required'}, 400
-        
-        symbol = data['symbol'].upper()
-        company_name = data['company_name']
-        initial_price = data.get('initial_price', 100.00)
-        
         conn = get_db_connection()
         if not conn:
             return {'error': 'Database connection failed'}, 500
@@ -382,6 +661,19 @@ class AdminAddStock(Resource):
         try:
             cursor = conn.cursor(dictionary=True, buffered=True)
             
+            if not get_admin_from_token(cursor):
+                return {'error': 'Admin access required'}, 403
+            
+            data = request.get_json()
+            required_fields = ['symbol', 'company_name']
+            for field in required_fields:
+                if not data or not data.get(field):
+                    return {'error': f'{field} is required'}, 400
+            
+            symbol = data['symbol'].upper()
+            company_name = data['company_name']
+            initial_price = data.get('initial_price', 100.00)
+            
             # Check if stock already exists
             cursor.execute("SELECT stock_id FROM stocks WHERE symbol = %s", (symbol,))
             if cursor.fetchone():
@@ -416,25 +708,6 @@ class AdminAddStock(Resource):
 class AdminUpdateStockPrice(Resource):
     def post(self):
         """Admin: Manually update stock price"""
-        admin_data = get_admin_from_token()
-        if not admin_data:
-            return {'error': 'Admin access required'}, 403
-        
-        data = request.get_json()
-        required_fields = ['symbol', 'new_price']
-        for field in required_fields:
-            if not data or not data.get(field):
-                return {'error': f'{field} is required'}, 400
-        
-        symbol = data['symbol'].upper()
-        
-        try:
-            new_price = Decimal(str(data['new_price']))
-            if new_price <= 0:
-                return {'error': 'Price must be positive'}, 400
-        except ValueError:
-            return {'error': 'Invalid price'}, 400
-        
         conn = get_db_connection()
         if not conn:
             return {'error': 'Database connection failed'}, 500
@@ -442,6 +715,24 @@ class AdminUpdateStockPrice(Resource):
         try:
             cursor = conn.cursor(dictionary=True, buffered=True)
             
+            if not get_admin_from_token(cursor):
+                return {'error': 'Admin access required'}, 403
+            
+            data = request.get_json()
+            required_fields = ['symbol', 'new_price']
+            for field in required_fields:
+                if not data or not data.get(field):
+                    return {'error': f'{field} is required'}, 400
+            
+            symbol = data['symbol'].upper()
+            
+            try:
+                new_price = Decimal(str(data['new_price']))
+                if new_price <= 0:
+                    return {'error': 'Price must be positive'}, 400
+            except ValueError:
+                return {'error': 'Invalid price'}, 400
+            
             # Get current stock price
             cursor.execute("SELECT current_price FROM stocks WHERE symbol = %s", (symbol,))
             stock = cursor.fetchone()
@@ -460,7 +751,12 @@ class AdminUpdateStockPrice(Resource):
                 WHERE symbol = %s
             """, (float(new_price), float(daily_change), float(daily_change_percent), symbol))
             
+            # Record the price tick and revalue every holding of this symbol
+            price_history.record_ticks(cursor, [(symbol, new_price)], source='admin')
+            portfolio_valuation.revalue_symbols(cursor, [symbol])
+            
             conn.commit()
+            portfolio_valuation.invalidate()
             
             return {
                 'message': 'Stock price updated successfully',
@@ -483,10 +779,6 @@ class AdminUpdateStockPrice(Resource):
 class AdminAllStocks(Resource):
     def get(self):
         """Admin: Get all stocks in the system"""
-        admin_data = get_admin_from_token()
-        if not admin_data:
-            return {'error': 'Admin access required'}, 403
-        
         conn = get_db_connection()
         if not conn:
             return {'error': 'Database connection failed'}, 500
@@ -494,6 +786,9 @@ class AdminAllStocks(Resource):
         try:
             cursor = conn.cursor(dictionary=True, buffered=True)
             
+            if not get_admin_from_token(cursor):
+                return {'error': 'Admin access required'}, 403
+            
             cursor.execute("""
                 SELECT stock_id, symbol, company_name, current_price, daily_change, daily_change_percent, last_updated
                 FROM stocks 
@@ -525,128 +820,253 @@ class AdminAllStocks(Resource):
             cursor.close()
             conn.close()
 
+STOCK_TRANSACTION_STATUSES = ('pending', 'completed', 'cancelled')
+STOCK_TRANSACTION_COLUMNS = [
+    'transaction_id', 'user_id', 'user_email', 'user_name', 'symbol', 'company_name', 'type',
+    'quantity', 'price', 'total_amount', 'order_type', 'status', 'created_at'
+]
+
+def format_stock_transaction(tx):
+    return {
+        'transaction_id': tx['transaction_id'],
+        'user_id': tx['user_id'],
+        'user_email': tx['email'],
+        'user_name': tx['full_name'],
+        'symbol': tx['symbol'],
+        'company_name': tx['company_name'],
+        'type': tx['type'],
+        'quantity': float(tx['quantity']),
+        'price': float(tx['price']),
+        'total_amount': float(tx['total_amount']),
+        'order_type': tx['order_type'],
+        'status': tx['status'],
+        'created_at': tx['created_at'].isoformat() if tx['created_at'] else None
+    }
+
 class AdminStockTransactions(Resource):
     def get(self):
-        """Admin: Get all stock transactions in the system"""
-        admin_data = get_admin_from_token()
-        if not admin_data:
-            return {'error': 'Admin access required'}, 403
+        """Admin: Stock transactions, newest first, a page at a time.
         
+        Optional filters: `status`, `symbol`, `user_id` and `from` / `to`
+        (YYYY-MM-DD, inclusive). Pass the previous page's `next_cursor` as
+        `cursor`; `format=csv` streams every matching row instead.
+        """
         conn = get_db_connection()
         if not conn:
             return {'error': 'Database connection failed'}, 500
-            
+        
+        streaming = False
         try:
             cursor = conn.cursor(dictionary=True, buffered=True)
             
-            cursor.execute("""
+            if not get_admin_from_token(cursor):
+                return {'error': 'Admin access required'}, 403
+            
+            export_format = request.args.get('format', 'json').lower()
+            if export_format not in ('json', 'csv'):
+                return {'error': 'Format must be json or csv'}, 400
+            limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_ADMIN_PAGE_SIZE)
+            
+            where = []
+            params = []
+            status = request.args.get('status')
+            if status:
+                if status not in STOCK_TRANSACTION_STATUSES:
+                    return {'error': f'Status must be one of: {", ".join(STOCK_TRANSACTION_STATUSES)}'}, 400
+                where.append("st.status = %s")
+                params.append(status)
+            if request.args.get('symbol'):
+                where.append("st.symbol = %s")
+                params.append(request.args['symbol'].upper())
+            if request.args.get('user_id'):
+                user_id = request.args.get('user_id', type=int)
+                if user_id is None:
+                    return {'error': 'user_id must be an integer'}, 400
+                where.append("st.user_id = %s")
+                params.append(user_id)
+            
+            try:
+                date_where, date_params = created_at_conditions('st', 'transaction_id', paginate=export_format == 'json')
+            except ValueError as e:
+                return {'error': str(e)}, 400
+            where += date_where
+            params += date_params
+            
+            query = f"""
                 SELECT st.*, u.email, u.full_name, s.company_name
                 FROM stock_transactions st
                 JOIN users u ON st.user_id = u.user_id
                 JOIN stocks s ON st.symbol = s.symbol
-                ORDER BY st.created_at DESC
-                LIMIT 100
-            """)
+                WHERE {' AND '.join(where) or '1 = 1'}
+                ORDER BY st.created_at DESC, st.transaction_id DESC
+            """
+            
+            if export_format == 'csv':
+                # Unbuffered: rows are pulled from the server as the response is written
+                cursor.close()
+                cursor = conn.cursor(dictionary=True, buffered=False)
+                cursor.execute(query, params)
+                streaming = True
+                body = csv_chunks(cursor, STOCK_TRANSACTION_COLUMNS, format_stock_transaction)
+                return streaming_response(conn, cursor, body, 'text/csv', 'stock_transactions.csv')
+            
+            cursor.execute(query + " LIMIT %s", params + [limit + 1])
             
             transactions = cursor.fetchall()
+            has_more = len(transactions) > limit
+            transactions = transactions[:limit]
             
-            formatted_transactions = []
-            for tx in transactions:
-                formatted_transactions.append({
-                    'transaction_id': tx['transaction_id'],
-                    'user_id': tx['user_id'],
-                    'user_email': tx['email'],
-                    'user_name': tx['full_name'],
-                    'symbol': tx['symbol'],
-                    'company_name': tx['company_name'],
-                    'type': tx['type'],
-                    'quantity': float(tx['quantity']),
-                    'price': float(tx['price']),
-                    'total_amount': float(tx['total_amount']),
-                    'order_type': tx['order_type'],
-                    'status': tx['status'],
-                    'created_at': tx['created_at'].isoformat() if tx['created_at'] else None
-                })
+            formatted_transactions = [format_stock_transaction(tx) for tx in transactions]
+            
+            next_cursor = None
+            if has_more and transactions:
+                last = transactions[-1]
+                next_cursor = encode_page_cursor(last['created_at'], last['transaction_id'])
             
             return {
                 'transactions': formatted_transactions,
-                'total_transactions': len(transactions)
+                'total_transactions': len(transactions),
+                'pagination': {
+                    'limit': limit,
+                    'has_more': has_more,
+                    'next_cursor': next_cursor
+                }
             }
             
         except Exception as e:
             return {'error': f'Failed to get stock transactions: {str(e)}'}, 500
         finally:
-            cursor.close()
-            conn.close()
+            if not streaming:
+                cursor.close()
+                conn.close()
+
+FUNDING_REQUEST_STATUSES = ('pending', 'approved', 'rejected')
+FUNDING_REQUEST_COLUMNS = [
+    'request_id', 'user_id', 'user_email', 'user_name', 'account_number', 'currency',
+    'crypto_amount', 'usd_amount', 'status', 'admin_notes', 'created_at', 'updated_at'
+]
+
+def format_funding_request(req):
+    return {
+        'request_id': req['request_id'],
+        'user_id': req['user_id'],
+        'user_email': req['email'],
+        'user_name': req['full_name'],
+        'account_number': req['account_number'],
+        'currency': req['currency'],
+        'crypto_amount': float(req['crypto_amount']),
+        'usd_amount': float(req['usd_amount']),
+        'status': req['status'],
+        'admin_notes': req['admin_notes'],
+        'created_at': req['created_at'].isoformat() if req['created_at'] else None,
+        'updated_at': req['updated_at'].isoformat() if req['updated_at'] else None
+    }
 
 class AdminCryptoFundingRequests(Resource):
     def get(self):
-        """Admin: Get all pending crypto funding requests"""
-        admin_data = get_admin_from_token()
-        if not admin_data:
-            return {'error': 'Admin access required'}, 403
+        """Admin: Crypto funding requests, newest first, a page at a time.
         
+        `status` defaults to pending (`all` for every status); other filters
+        are `currency`, `user_id` and `from` / `to` (YYYY-MM-DD, inclusive).
+        Pass the previous page's `next_cursor` as `cursor`; `format=csv`
+        streams every matching row instead.
+        """
         conn = get_db_connection()
         if not conn:
             return {'error': 'Database connection failed'}, 500
-            
+        
+        streaming = False
         try:
             cursor = conn.cursor(dictionary=True, buffered=True)
             
-            cursor.execute("""
+            if not get_admin_from_token(cursor):
+                return {'error': 'Admin access required'}, 403
+            
+            export_format = request.args.get('format', 'json').lower()
+            if export_format not in ('json', 'csv'):
+                return {'error': 'Format must be json or csv'}, 400
+            limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_ADMIN_PAGE_SIZE)
+            
+            where = []
+            params = []
+            status = request.args.get('status', 'pending')
+            if status != 'all':
+                if status not in FUNDING_REQUEST_STATUSES:
+                    return {'error': f'Status must be all or one of: {", ".join(FUNDING_REQUEST_STATUSES)}'}, 400
+                where.append("cfr.status = %s")
+                params.append(status)
+            if request.args.get('currency'):
+                where.append("cfr.currency = %s")
+                params.append(request.args['currency'].upper())
+            if request.args.get('user_id'):
+                user_id = request.args.get('user_id', type=int)
+                if user_id is None:
+                    return {'error': 'user_id must be an integer'}, 400
+                where.append("cfr.user_id = %s")
+                params.append(user_id)
+            
+            try:
+                date_where, date_params = created_at_conditions('cfr', 'request_id', paginate=export_format == 'json')
+            except ValueError as e:
+                return {'error': str(e)}, 400
+            where += date_where
+            params += date_params
+            
+            query = f"""
                 SELECT cfr.*, u.email, u.full_name, a.account_number
                 FROM crypto_funding_requests cfr
                 JOIN users u ON cfr.user_id = u.user_id
                 LEFT JOIN accounts a ON u.user_id = a.user_id AND a.account_type = 'checking'
-                WHERE cfr.status = 'pending'
-                ORDER BY cfr.created_at DESC
-            """)
+                WHERE {' AND '.join(where) or '1 = 1'}
+                ORDER BY cfr.created_at DESC, cfr.request_id DESC
+            """
+            
+            if export_format == 'csv':
+                # Unbuffered: rows are pulled from the server as the response is written
+                cursor.close()
+                cursor = conn.cursor(dictionary=True, buffered=False)
+                cursor.execute(query, params)
+                streaming = True
+                body = csv_chunks(cursor, FUNDING_REQUEST_COLUMNS, format_funding_request)
+                return streaming_response(conn, cursor, body, 'text/csv', 'crypto_funding_requests.csv')
+            
+            cursor.execute(query + " LIMIT %s", params + [limit + 1])
             
             requests = cursor.fetchall()
+            has_more = len(requests) > limit
+            requests = requests[:limit]
             
-            formatted_requests = []
-            for req in requests:
-                formatted_requests.append({
-                    'request_id': req['request_id'],
-                    'user_id': req['user_id'],
-                    'user_email': req['email'],
-                    'user_name': req['full_name'],
-                    'account_number': req['account_number'],
-                    'currency': req['currency'],
-                    'crypto_amount': float(req['crypto_amount']),
-                    'usd_amount': float(req['usd_amount']),
-                    'status': req['status'],
-                    'admin_notes': req['admin_notes'],
-                    'created_at': req['created_at'].isoformat() if req['created_at'] else None,
-                    'updated_at': req['updated_at'].isoformat() if req['updated_at'] else None
-                })
+            formatted_requests = [format_funding_request(req) for req in requests]
+            
+            next_cursor = None
+            if has_more and requests:
+                last = requests[-1]
+                next_cursor = encode_page_cursor(last['created_at'], last['request_id'])
             
+            # pending_requests / total_pending are kept for older clients and
+            # hold whatever `status` selected; new clients should read `requests`
             return {
+                'requests': formatted_requests,
                 'pending_requests': formatted_requests,
-                'total_pending': len(requests)
+                'total_pending': len(requests),
+                'pagination': {
+                    'limit': limit,
+                    'status': status,
+                    'has_more': has_more,
+                    'next_cursor': next_cursor
+                }
             }
             
         except Exception as e:
             return {'error': f'Failed to get funding requests: {str(e)}'}, 500
         finally:
-            cursor.close()
-            conn.close()
+            if not streaming:
+                cursor.close()
+                conn.close()
 
 class AdminApproveCryptoFunding(Resource):
     def post(self):
         """Admin: Approve a crypto funding request"""
-        admin_data = get_admin_from_token()
-        if not admin_data:
-            return {'error': 'Admin access required'}, 403
-        
-        data = request.get_json()
-        if not data or not data.get('request_id'):
-            return {'error': 'Request ID is required'}, 400
-        
-        request_id = data['request_id']
-        admin_notes = data.get('admin_notes', 'Approved by admin')
-        target_account_type = data.get('account_type', 'checking')  # Allow override, default checking
-        
         conn = get_db_connection()
         if not conn:
             return {'error': 'Database connection failed'}, 500
@@ -654,91 +1074,28 @@ class AdminApproveCryptoFunding(Resource):
         try:
             cursor = conn.cursor(dictionary=True, buffered=True)
             
-            # Get the funding request
-            cursor.execute("""
-                SELECT cfr.*, u.email
-                FROM crypto_funding_requests cfr
-                JOIN users u ON cfr.user_id = u.user_id
-                WHERE cfr.request_id = %s AND cfr.status = 'pending'
-            """, (request_id,))
-            
-            funding_request = cursor.fetchone()
+            if not get_admin_from_token(cursor):
+                return {'error': 'Admin access required'}, 403
             
-            if not funding_request:
-                return {'error': 'Pending funding request not found'}, 404
+            data = request.get_json()
+            if not data or not data.get('request_id'):
+                return {'error': 'Request ID is required'}, 400
             
-            user_id = funding_request['user_id']
-            currency = funding_request['currency']
-            crypto_amount = Decimal(str(funding_request['crypto_amount']))
-            usd_amount = Decimal(str(funding_request['usd_amount']))
+            request_id = data['request_id']
+            admin_notes = data.get('admin_notes', 'Approved by admin')
+            target_account_type = data.get('account_type', 'checking')  # Allow override, default checking
             
-            # Get user's target bank account (flexible type)
-            cursor.execute("""
-                SELECT account_id, account_number, balance 
-                FROM accounts 
-                WHERE user_id = %s AND account_type = %s
-            """, (user_id, target_account_type))
+            # Same locking path as the batch endpoint
+            result = crypto_funding_service.process_batch(
+                cursor, 'approve', [request_id], admin_notes, target_account_type
+            )[0]
             
-            account = cursor.fetchone()
+            if result['status'] == 'error':
+                conn.rollback()
+                return {'error': result['error']}, 404
             
-            if not account:
-                return {'error': f'User {target_account_type} account not found'}, 404
-            
-            # Update bank balance
-            new_bank_balance = Decimal(str(account['balance'])) + usd_amount
-            cursor.execute(
-                "UPDATE accounts SET balance = %s WHERE account_id = %s",
-                (float(new_bank_balance), account['account_id'])
-            )
-            
-            # Get/update crypto wallet
-            cursor.execute("""
-                SELECT wallet_id, balance FROM crypto_wallets 
-                WHERE user_id = %s AND currency = %s
-            """, (user_id, currency))
-            
-            crypto_wallet = cursor.fetchone()
-            if not crypto_wallet:
-                return {'error': f'User crypto wallet for {currency} not found'}, 404
-            
-            new_crypto_balance = Decimal(str(crypto_wallet['balance'])) + crypto_amount
-            cursor.execute(
-                "UPDATE crypto_wallets SET balance = %s WHERE wallet_id = %s",
-                (float(new_crypto_balance), crypto_wallet['wallet_id'])
-            )
-            
-            # Record bank deposit transaction
-            cursor.execute("""
-                INSERT INTO transactions 
-                (account_id, type, amount, balance_after, description)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                account['account_id'],
-                'deposit',
-                float(usd_amount),
-                float(new_bank_balance),
-                f'Crypto funding approved: {crypto_amount:.8f} {currency} ({admin_notes})'
-            ))
-            
-            # Record crypto deposit transaction
-            cursor.execute("""
-                INSERT INTO crypto_transactions 
-                (wallet_id, type, amount, usd_value, status)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                crypto_wallet['wallet_id'],
-                'deposit',
-                float(crypto_amount),
-                float(usd_amount),
-                'confirmed'
-            ))
-            
-            # Update funding request status
-            cursor.execute("""
-                UPDATE crypto_funding_requests 
-                SET status = 'approved', admin_notes = %s, updated_at = CURRENT_TIMESTAMP
-                WHERE request_id = %s
-            """, (admin_notes, request_id))
+            cursor.execute("SELECT email FROM users WHERE user_id = %s", (result['user_id'],))
+            user = cursor.fetchone()
             
             conn.commit()
             
@@ -746,17 +1103,17 @@ class AdminApproveCryptoFunding(Resource):
                 'message': 'Crypto funding approved successfully',
                 'funding_details': {
                     'request_id': request_id,
-                    'user_id': user_id,
-                    'user_email': funding_request['email'],
-                    'currency': currency,
-                    'crypto_amount': float(crypto_amount),
-                    'usd_amount': float(usd_amount),
+                    'user_id': result['user_id'],
+                    'user_email': user['email'] if user else None,
+                    'currency': result['currency'],
+                    'crypto_amount': result['crypto_amount'],
+                    'usd_amount': result['usd_amount'],
                     'account_type': target_account_type,
-                    'account_number': account['account_number'],
-                    'previous_bank_balance': float(account['balance']),
-                    'new_bank_balance': float(new_bank_balance),
-                    'previous_crypto_balance': float(crypto_wallet['balance']),
-                    'new_crypto_balance': float(new_crypto_balance),
+                    'account_number': result['account_number'],
+                    'previous_bank_balance': round(result['new_bank_balance'] - result['usd_amount'], 2),
+                    'new_bank_balance': result['new_bank_balance'],
+                    'previous_crypto_balance': round(result['new_crypto_balance'] - result['crypto_amount'], 8),
+                    'new_crypto_balance': result['new_crypto_balance'],
                     'admin_notes': admin_notes
                 }
             }
@@ -772,17 +1129,6 @@ class AdminApproveCryptoFunding(Resource):
 class AdminRejectCryptoFunding(Resource):
     def post(self):
         """Admin: Reject a crypto funding request"""
-        admin_data = get_admin_from_token()
-        if not admin_data:
-            return {'error': 'Admin access required'}, 403
-        
-        data = request.get_json()
-        if not data or not data.get('request_id'):
-            return {'error': 'Request ID is required'}, 400
-        
-        request_id = data['request_id']
-        admin_notes = data.get('admin_notes', 'Rejected by admin')
-        
         conn = get_db_connection()
         if not conn:
             return {'error': 'Database connection failed'}, 500
@@ -790,25 +1136,25 @@ class AdminRejectCryptoFunding(Resource):
         try:
             cursor = conn.cursor(dictionary=True, buffered=True)
             
-            # Get the funding request
-            cursor.execute("""
-                SELECT cfr.*, u.email
-                FROM crypto_funding_requests cfr
-                JOIN users u ON cfr.user_id = u.user_id
-                WHERE cfr.request_id = %s AND cfr.status = 'pending'
-            """, (request_id,))
+            if not get_admin_from_token(cursor):
+                return {'error': 'Admin access required'}, 403
             
-            funding_request = cursor.fetchone()
+            data = request.get_json()
+            if not data or not data.get('request_id'):
+                return {'error': 'Request ID is required'}, 400
             
-            if not funding_request:
-                return {'error': 'Pending funding request not found'}, 404
+            request_id = data['request_id']
+            admin_notes = data.get('admin_notes', 'Rejected by admin')
             
-            # Update funding request status to rejected
-            cursor.execute("""
-                UPDATE crypto_funding_requests 
-                SET status = 'rejected', admin_notes = %s, updated_at = CURRENT_TIMESTAMP
-                WHERE request_id = %s
-            """, (admin_notes, request_id))
+            # Same locking path as the batch endpoint
+            result = crypto_funding_service.process_batch(cursor, 'reject', [request_id], admin_notes)[0]
+            
+            if result['status'] == 'error':
+                conn.rollback()
+                return {'error': result['error']}, 404
+            
+            cursor.execute("SELECT email FROM users WHERE user_id = %s", (result['user_id'],))
+            user = cursor.fetchone()
             
             conn.commit()
             
@@ -816,11 +1162,11 @@ class AdminRejectCryptoFunding(Resource):
                 'message': 'Crypto funding rejected successfully',
                 'rejection_details': {
                     'request_id': request_id,
-                    'user_id': funding_request['user_id'],
-                    'user_email': funding_request['email'],
-                    'currency': funding_request['currency'],
-                    'crypto_amount': float(funding_request['crypto_amount']),
-                    'usd_amount': float(funding_request['usd_amount']),
+                    'user_id': result['user_id'],
+                    'user_email': user['email'] if user else None,
+                    'currency': result['currency'],
+                    'crypto_amount': result['crypto_amount'],
+                    'usd_amount': result['usd_amount'],
                     'admin_notes': admin_notes
                 }
             }
@@ -828,6 +1174,98 @@ class AdminRejectCryptoFunding(Resource):
         except Exception as e:
             conn.rollback()
             return {'error': f'Failed to reject funding: {str(e)}'}, 500
+        finally:
+            cursor.close()
+            conn.close()
+
+class AdminBatchCryptoFunding(Resource):
+    def post(self):
+        """Admin: Approve or reject many crypto funding requests in one transaction.
+        
+        Body: {"action": "approve"|"reject", "request_ids": [...], "admin_notes",
+        "account_type"}. Requests that cannot be processed are reported per
+        item and stay pending; the others are applied.
+        """
+        conn = get_db_connection()
+        if not conn:
+            return {'error': 'Database connection failed'}, 500
+            
+        try:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            
+            if not get_admin_from_token(cursor):
+                return {'error': 'Admin access required'}, 403
+            
+            data = request.get_json()
+            if not data or not isinstance(data.get('request_ids'), list) or not data['request_ids']:
+                return {'error': 'request_ids must be a non-empty list'}, 400
+            
+            action = data.get('action')
+            if action not in FUNDING_ACTIONS:
+                return {'error': f'Action must be one of: {", ".join(FUNDING_ACTIONS)}'}, 400
+            
+            max_requests = crypto_service.config.MAX_FUNDING_BATCH
+            if len(data['request_ids']) > max_requests:
+                return {'error': f'At most {max_requests} requests per batch'}, 400
+            
+            try:
+                request_ids = [int(request_id) for request_id in data['request_ids']]
+            except (TypeError, ValueError):
+                return {'error': 'request_ids must be integers'}, 400
+            
+            default_notes = 'Approved by admin' if action == 'approve' else 'Rejected by admin'
+            admin_notes = data.get('admin_notes', default_notes)
+            target_account_type = data.get('account_type', 'checking')
+            
+            results = crypto_funding_service.process_batch(
+                cursor, action, request_ids, admin_notes, target_account_type
+            )
+            
+            conn.commit()
+            
+            processed = sum(1 for result in results if result['status'] != 'error')
+            return {
+                'message': f'{processed} of {len(results)} funding requests processed',
+                'action': action,
+                'results': results,
+                'processed': processed,
+                'failed': len(results) - processed
+            }
+            
+        except Exception as e:
+            conn.rollback()
+            return {'error': f'Failed to process funding requests: {str(e)}'}, 500
+        finally:
+            cursor.close()
+            conn.close()
+
+MAX_METRICS_DAYS = 366
+
+class AdminMetrics(Resource):
+    def get(self):
+        """Dashboard totals from the metrics rollups (Admin only).
+        
+        `days` (default 7) selects how many daily rollups, ending today, are
+        returned and summed into the per-symbol trade volume.
+        """
+        conn = get_db_connection()
+        if not conn:
+            return {'error': 'Database connection failed'}, 500
+            
+        try:
+            cursor = conn.cursor(dictionary=True, buffered=True)
+            
+            if not get_admin_from_token(cursor):
+                return {'error': 'Admin access required'}, 403
+            
+            days = request.args.get('days', 7, type=int)
+            if not days or days < 1 or days > MAX_METRICS_DAYS:
+                return {'error': f'Days must be between 1 and {MAX_METRICS_DAYS}'}, 400
+            
+            return metrics_service.get_dashboard(cursor, days)
+            
+        except Exception as e:
+            return {'error': f'Failed to get metrics: {str(e)}'}, 500
         finally:
             cursor.close()
             conn.close()
\ No newline at end of file
@@ -1,7 +1,9 @@
 from flask import Flask, jsonify
 from flask_restful import Api
 from flask_cors import CORS
-from config import get_db_connection
+from config import get_db_connection, get_pool_stats
+from services.market_data_client import market_data_client
+from services.receipt_service import receipt_service
 
 # Authentication
 from routes.auth import Register, Login
@@ -10,7 +12,7 @@ from routes.auth import Register, Login
 from routes.banking import Balance, Deposit, Withdraw
 
 # Transactions
-from routes.transactions import TransactionHistory, TransactionDetail
+from routes.transactions import TransactionHistory, TransactionDetail, TransactionExport
 
 # Transfers
 from routes.transfers import Transfer, Beneficiaries
@@ -39,9 +41,14 @@ from routes.crypto_funding import (
 from routes.stocks import (
     StockMarket,
     StockDetail,
+    StockPriceHistory,
     BuyStock,
     SellStock,
+    BatchStockOrders,
+    StockOrders,
+    StockOrderDetail,
     StockPortfolio,
+    StockPortfolioAnalytics,
     StockTransactions
 )
 
@@ -58,6 +65,7 @@ from routes.admin import (
     AdminRegister,
     AdminLogin,
     AdminUsers,
+    AdminUsersOverview,
     AdminUserAccounts,
     AdminAdjustBalance,
     AdminAddStock,
@@ -66,7 +74,10 @@ from routes.admin import (
     AdminStockTransactions,
     AdminCryptoFundingRequests,
     AdminApproveCryptoFunding,
-    AdminRejectCryptoFunding
+    AdminRejectCryptoFunding,
+    AdminBatchCryptoFunding,
+    AdminMetrics,
+    get_admin_from_token
 )
 
 # -----------------------------------------------------------
@@ -95,6 +106,7 @@ api.add_resource(Withdraw, '/api/withdraw')
 
 # Transactions
 api.add_resource(TransactionHistory, '/api/transactions')
+api.add_resource(TransactionExport, '/api/transactions/export')
 api.add_resource(TransactionDetail, '/api/transactions/<int:transaction_id>')
 
 # Transfers
@@ -121,9 +133,14 @@ api.add_resource(GetUserPendingFundingRequests, '/api/crypto/pending-funding-req
 # Stocks
 api.add_resource(StockMarket, '/api/stocks/market')
 api.add_resource(StockDetail, '/api/stocks/<string:symbol>')
+api.add_resource(StockPriceHistory, '/api/stocks/<string:symbol>/history')
 api.add_resource(BuyStock, '/api/stocks/buy')
 api.add_resource(SellStock, '/api/stocks/sell')
+api.add_resource(BatchStockOrders, '/api/stocks/orders/batch')
+api.add_resource(StockOrders, '/api/stocks/orders')
+api.add_resource(StockOrderDetail, '/api/stocks/orders/<int:order_id>')
 api.add_resource(StockPortfolio, '/api/stocks/portfolio')
+api.add_resource(StockPortfolioAnalytics, '/api/stocks/portfolio/analytics')
 api.add_resource(StockTransactions, '/api/stocks/transactions')
 
 # Profile & KYC
@@ -136,6 +153,7 @@ api.add_resource(KYCDocuments, '/api/kyc/documents')
 api.add_resource(AdminRegister, '/api/admin/register')
 api.add_resource(AdminLogin, '/api/admin/login')
 api.add_resource(AdminUsers, '/api/admin/users')
+api.add_resource(AdminUsersOverview, '/api/admin/users/overview')
 api.add_resource(AdminUserAccounts, '/api/admin/users/<int:user_id>/accounts')
 api.add_resource(AdminAdjustBalance, '/api/admin/adjust-balance')
 api.add_resource(AdminAddStock, '/api/admin/stocks/add')
@@ -145,6 +163,11 @@ api.add_resource(AdminStockTransactions, '/api/admin/stock-transactions')
 api.add_resource(AdminCryptoFundingRequests, '/api/admin/crypto-funding-requests')
 api.add_resource(AdminApproveCryptoFunding, '/api/admin/approve-crypto-funding')
 api.add_resource(AdminRejectCryptoFunding, '/api/admin/reject-crypto-funding')
+api.add_resource(AdminBatchCryptoFunding, '/api/admin/crypto-funding-requests/batch')
+api.add_resource(AdminMetrics, '/api/admin/metrics')
+
+# Replay receipts a previous process left in the outbox
+receipt_service.start_worker()
 
 # -----------------------------------------------------------
 # ✅ UTILITY ROUTES
@@ -165,6 +188,18 @@ def test_db():
     else:
         return jsonify({'error': 'Database connection failed!'}), 500
 
+@app.route('/db-pool-stats')
+def db_pool_stats():
+    if not get_admin_from_token():
+        return jsonify({'error': 'Admin access required'}), 403
+    return jsonify(get_pool_stats())
+
+@app.route('/market-data-stats')
+def market_data_stats():
+    if not get_admin_from_token():
+        return jsonify({'error': 'Admin access required'}), 403
+    return jsonify(market_data_client.stats())
+
 
 # -----------------------------------------------------------
 # ✅ RUN SERVER (WORKS LOCALLY + ON RAILWAY)
@@ -1,6 +1,7 @@
 from flask import request, jsonify
 from flask_restful import Resource
-from config import get_db_connection
+from config import get_db_connection, Config
+from auth_middleware import invalidate_admin_role
 from passlib.hash import pbkdf2_sha256
 import re
 import jwt
@@ -109,6 +110,7 @@ class Login(Resource):
             
             # Check if user is admin
             is_admin = bool(user.get('is_admin', 0))
+            invalidate_admin_role(user['user_id'])
             
             # Generate JWT token
             token = jwt.encode({
@@ -116,7 +118,7 @@ class Login(Resource):
                 'email': user['email'],
                 'is_admin': is_admin,
                 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-            }, 'your-secret-key-here-change-in-production', algorithm='HS256')
+            }, Config.JWT_SECRET_KEY, algorithm='HS256')
             
             return {
                 'message': 'Login successful',
@@ -0,0 +1,106 @@
+import hashlib
+import threading
+import time
+
+import jwt
+from flask import request, g
+
+from config import Config
+from ttl_cache import TTLCache
+
+class TokenCache(TTLCache):
+    """Bounded LRU of verified JWT payloads, keyed by token hash.
+
+    Entries expire when the token's `exp` passes, so a cached token can
+    never outlive its signature's validity.
+    """
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        return super().get(self._key(token))
+
+    def put(self, token, payload):
+        ttl = None
+        if payload.get('exp') is not None:
+            ttl = payload['exp'] - time.time()
+            if ttl <= 0:
+                return
+        super().put(self._key(token), payload, ttl)
+
+token_cache = TokenCache(Config.AUTH_TOKEN_CACHE_SIZE)
+
+def verify_token(token):
+    """Verify JWT token and return user data"""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
+    try:
+        payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        return None
+    except jwt.InvalidTokenError:
+        return None
+
+    token_cache.put(token, payload)
+    return payload
+
+def get_user_from_token():
+    """Extract user from authorization token (decoded once per request, kept on flask.g)"""
+    if 'auth_user' in g:
+        return g.auth_user
+
+    user_data = None
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        token = auth_header.split(' ')[1]
+        user_data = verify_token(token)
+
+    g.auth_user = user_data
+    return user_data
+
+class AdminRoleCache:
+    """Short-lived per-user cache of users.is_admin.
+
+    Writers of users.is_admin must call invalidate(). No endpoint changes the
+    flag today (it is set in the database directly), so both logins
+    invalidate the entry for the row they just read; the TTL bounds staleness
+    across worker processes.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Cached is_admin flag, or None if unknown/expired"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            is_admin, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            return is_admin
+
+    def put(self, user_id, is_admin):
+        with self._lock:
+            self._entries[user_id] = (bool(is_admin), time.monotonic() + self.ttl)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+admin_role_cache = AdminRoleCache(Config.ADMIN_ROLE_CACHE_TTL)
+
+def invalidate_admin_role(user_id=None):
+    """Call after writing users.is_admin (None clears every user)"""
+    admin_role_cache.invalidate(user_id)
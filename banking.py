@@ -1,30 +1,13 @@
 from flask import request, jsonify
 from flask_restful import Resource
 from config import get_db_connection
-import jwt
+from auth_middleware import get_user_from_token
+from idempotency import idempotent
+from services.ledger_service import ledger_service
+from services.receipt_service import receipt_service
 import datetime
 from decimal import Decimal
 
-def verify_token(token):
-    """Verify JWT token and return user data"""
-    try:
-        payload = jwt.decode(token, 'your-secret-key-here-change-in-production', algorithms=['HS256'])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
-
-def get_user_from_token():
-    """Extract user from authorization token"""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    
-    token = auth_header.split(' ')[1]
-    user_data = verify_token(token)
-    return user_data
-
 class Balance(Resource):
     def get(self):
         user_data = get_user_from_token()
@@ -80,6 +63,7 @@ class Balance(Resource):
             conn.close()
 
 class Deposit(Resource):
+    @idempotent('deposit')
     def post(self):
         user_data = get_user_from_token()
         if not user_data:
@@ -106,24 +90,16 @@ class Deposit(Resource):
         try:
             cursor = conn.cursor(dictionary=True)
             
-            # Get account
+            # Get and lock account
             if account_number:
-                cursor.execute("""
-                    SELECT account_id, balance, account_type, account_number 
-                    FROM accounts 
-                    WHERE user_id = %s AND account_number = %s
-                """, (user_data['user_id'], account_number))
+                account = ledger_service.lock_account(
+                    cursor, "user_id = %s AND account_number = %s", (user_data['user_id'], account_number)
+                )
             else:
                 # Use first account as default
-                cursor.execute("""
-                    SELECT account_id, balance, account_type, account_number 
-                    FROM accounts 
-                    WHERE user_id = %s 
-                    ORDER BY created_at 
-                    LIMIT 1
-                """, (user_data['user_id'],))
-            
-            account = cursor.fetchone()
+                account = ledger_service.lock_account(
+                    cursor, "user_id = %s", (user_data['user_id'],), order_by='created_at'
+                )
             
             if not account:
                 return {'error': 'Account not found'}, 404
@@ -138,22 +114,14 @@ class Deposit(Resource):
                 elif account['account_type'] == 'checking' and amount < 50:
                     return {'error': 'First deposit to checking account must be at least $50'}, 400
             
-            # Update balance
-            current_balance = Decimal(str(account['balance']))
-            new_balance = current_balance + amount
-            
-            cursor.execute(
-                "UPDATE accounts SET balance = %s WHERE account_id = %s",
-                (float(new_balance), account['account_id'])
-            )
-            
-            # Record transaction
-            cursor.execute(
-                "INSERT INTO transactions (account_id, type, amount, balance_after, description) VALUES (%s, %s, %s, %s, %s)",
-                (account['account_id'], 'deposit', float(amount), float(new_balance), 'Cash deposit')
+            # Update balance and record transaction
+            transaction_id, new_balance = ledger_service.post(cursor, account, 'deposit', amount, 'Cash deposit')
+            receipt = receipt_service.create_deposit_receipt(
+                cursor, user_data['user_id'], amount, account['account_number'], 'Cash deposit', transaction_id
             )
             
             conn.commit()
+            receipt_service.publish(receipt)
             
             return {
                 'message': 'Deposit successful',
@@ -161,7 +129,8 @@ class Deposit(Resource):
                 'account_type': account['account_type'],
                 'amount': float(amount),
                 'new_balance': float(new_balance),
-                'transaction_type': 'deposit'
+                'transaction_type': 'deposit',
+                'receipt_number': receipt['receipt_number']
             }
             
         except Exception as e:
@@ -172,6 +141,7 @@ class Deposit(Resource):
             conn.close()
 
 class Withdraw(Resource):
+    @idempotent('withdraw')
     def post(self):
         user_data = get_user_from_token()
         if not user_data:
@@ -198,24 +168,16 @@ class Withdraw(Resource):
         try:
             cursor = conn.cursor(dictionary=True)
             
-            # Get account
+            # Get and lock account
             if account_number:
-                cursor.execute("""
-                    SELECT account_id, balance, account_type, account_number 
-                    FROM accounts 
-                    WHERE user_id = %s AND account_number = %s
-                """, (user_data['user_id'], account_number))
+                account = ledger_service.lock_account(
+                    cursor, "user_id = %s AND account_number = %s", (user_data['user_id'], account_number)
+                )
             else:
                 # Use first account as default
-                cursor.execute("""
-                    SELECT account_id, balance, account_type, account_number 
-                    FROM accounts 
-                    WHERE user_id = %s 
-                    ORDER BY created_at 
-                    LIMIT 1
-                """, (user_data['user_id'],))
-            
-            account = cursor.fetchone()
+                account = ledger_service.lock_account(
+                    cursor, "user_id = %s", (user_data['user_id'],), order_by='created_at'
+                )
             
             if not account:
                 return {'error': 'Account not found'}, 404
@@ -232,19 +194,14 @@ class Withdraw(Resource):
             elif account['account_type'] == 'checking' and new_balance < Decimal('5'):
                 return {'error': 'Checking account must maintain minimum balance of $5'}, 400
             
-            # Update balance
-            cursor.execute(
-                "UPDATE accounts SET balance = %s WHERE account_id = %s",
-                (float(new_balance), account['account_id'])
-            )
-            
-            # Record transaction
-            cursor.execute(
-                "INSERT INTO transactions (account_id, type, amount, balance_after, description) VALUES (%s, %s, %s, %s, %s)",
-                (account['account_id'], 'withdraw', float(amount), float(new_balance), 'Cash withdrawal')
+            # Update balance and record transaction
+            transaction_id, new_balance = ledger_service.post(cursor, account, 'withdraw', amount, 'Cash withdrawal')
+            receipt = receipt_service.create_withdrawal_receipt(
+                cursor, user_data['user_id'], amount, account['account_number'], 'Cash withdrawal', transaction_id
             )
             
             conn.commit()
+            receipt_service.publish(receipt)
             
             return {
                 'message': 'Withdrawal successful',
@@ -252,7 +209,8 @@ class Withdraw(Resource):
                 'account_type': account['account_type'],
                 'amount': float(amount),
                 'new_balance': float(new_balance),
-                'transaction_type': 'withdrawal'
+                'transaction_type': 'withdrawal',
+                'receipt_number': receipt['receipt_number']
             }
             
         except Exception as e:
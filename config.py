@@ -1,5 +1,8 @@
 import os
+import logging
+import threading
 import mysql.connector
+from db_pool import ConnectionPool, PoolTimeout
 
 class Config:
     DB_HOST = 'yamanote.proxy.rlwy.net'
@@ -8,19 +11,72 @@ class Config:
     DB_NAME = 'railway'
     DB_PORT = 51620
 
+    # Connection pool sizing
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))          # seconds to wait for a free connection
+    DB_POOL_IDLE_TIMEOUT = float(os.getenv('DB_POOL_IDLE_TIMEOUT', 300))  # drop connections idle longer than this
+    DB_POOL_RECYCLE = float(os.getenv('DB_POOL_RECYCLE', 1800))        # drop connections older than this
+
     SECRET_KEY = 'your-secret-key-change-in-production'
 
+    # JWT signing key and verified-token cache size (auth_middleware)
+    JWT_SECRET_KEY = 'your-secret-key-here-change-in-production'
+    AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 1024))
+    ADMIN_ROLE_CACHE_TTL = int(os.getenv('ADMIN_ROLE_CACHE_TTL', 60))  # seconds an is_admin lookup is trusted
+    ADMIN_COUNT_CACHE_TTL = int(os.getenv('ADMIN_COUNT_CACHE_TTL', 60))  # seconds an admin list row estimate is reused
+    ADMIN_COUNT_CACHE_SIZE = int(os.getenv('ADMIN_COUNT_CACHE_SIZE', 512))  # distinct admin list filters whose estimate is kept
+
+    # Idempotency-Key support for money-moving endpoints (idempotency.py)
+    IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+    IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', 2048))
+    IDEMPOTENCY_LEASE_SECONDS = int(os.getenv('IDEMPOTENCY_LEASE_SECONDS', 120))  # an in-progress claim older than this can be taken over
+
+    # Shared keep-alive HTTP pool for price providers (market_data_client)
+    MARKET_DATA_POOL_SIZE = int(os.getenv('MARKET_DATA_POOL_SIZE', 20))
+    MARKET_DATA_KEEPALIVE = float(os.getenv('MARKET_DATA_KEEPALIVE', 30))  # seconds an idle upstream connection is kept
+
+    # Write-behind receipt generation (receipt_service)
+    RECEIPT_BATCH_SIZE = int(os.getenv('RECEIPT_BATCH_SIZE', 100))             # receipts per insert batch
+    RECEIPT_SWEEP_INTERVAL = float(os.getenv('RECEIPT_SWEEP_INTERVAL', 60))    # seconds between outbox replays
+    RECEIPT_OUTBOX_GRACE = int(os.getenv('RECEIPT_OUTBOX_GRACE', 30))          # seconds before a queued receipt is replayed
+
+    # Admin dashboard rollups (metrics_service)
+    METRICS_COUNTER_SLOTS = int(os.getenv('METRICS_COUNTER_SLOTS', 8))  # rows each counter is spread over to avoid lock contention
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Get the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    connect_args={
+                        'host': Config.DB_HOST,
+                        'user': Config.DB_USER,
+                        'password': Config.DB_PASSWORD,
+                        'database': Config.DB_NAME,
+                        'port': Config.DB_PORT
+                    },
+                    size=Config.DB_POOL_SIZE,
+                    max_overflow=Config.DB_POOL_MAX_OVERFLOW,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    idle_timeout=Config.DB_POOL_IDLE_TIMEOUT,
+                    recycle=Config.DB_POOL_RECYCLE
+                )
+    return _pool
+
 def get_db_connection():
+    """Check out a pooled connection; conn.close() returns it to the pool"""
     try:
-        conn = mysql.connector.connect(
-            host=Config.DB_HOST,
-            user=Config.DB_USER,
-            password=Config.DB_PASSWORD,
-            database=Config.DB_NAME,
-            port=Config.DB_PORT
-        )
-        print("✅ Connected to Railway MySQL successfully!")
-        return conn
-    except mysql.connector.Error as e:
-        print(f"❌ Database connection error: {e}")
+        return get_pool().get_connection()
+    except (mysql.connector.Error, PoolTimeout) as e:
+        logging.error(f"❌ Database connection error: {e}")
         return None
+
+def get_pool_stats():
+    """Connection pool usage statistics"""
+    return get_pool().stats()
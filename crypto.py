@@ -1,31 +1,13 @@
 from flask import request, jsonify
 from flask_restful import Resource
 from config import get_db_connection
-import jwt
+from auth_middleware import get_user_from_token
+from idempotency import idempotent
 from decimal import Decimal
 from services.crypto_service import crypto_service
+from services.ledger_service import ledger_service
 import datetime
 
-def verify_token(token):
-    """Verify JWT token and return user data"""
-    try:
-        payload = jwt.decode(token, 'your-secret-key-here-change-in-production', algorithms=['HS256'])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
-
-def get_user_from_token():
-    """Extract user from authorization token"""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    
-    token = auth_header.split(' ')[1]
-    user_data = verify_token(token)
-    return user_data
-
 def serialize_datetime(obj):
     """Convert datetime objects to ISO format strings for JSON serialization"""
     if isinstance(obj, datetime.datetime):
@@ -46,52 +28,61 @@ class CryptoWallets(Resource):
         try:
             cursor = conn.cursor(dictionary=True)
             
-            # Get or create wallets for user
-            wallets = []
-            for currency in crypto_service.config.SUPPORTED_CRYPTO:
-                cursor.execute("""
-                    SELECT * FROM crypto_wallets 
-                    WHERE user_id = %s AND currency = %s
-                """, (user_data['user_id'], currency))
-                
-                wallet = cursor.fetchone()
+            user_id = user_data['user_id']
+            supported = crypto_service.config.SUPPORTED_CRYPTO
+            
+            # Get all of the user's wallets in one query
+            wallet_query = """
+                SELECT wallet_id, user_id, currency, address, balance, created_at
+                FROM crypto_wallets
+                WHERE user_id = %s
+            """
+            cursor.execute(wallet_query, (user_id,))
+            wallets_by_currency = {wallet['currency']: wallet for wallet in cursor.fetchall()}
+            
+            # Create any missing wallets with a single multi-row insert
+            missing = [currency for currency in supported if currency not in wallets_by_currency]
+            if missing:
+                rows = []
+                params = []
+                for currency in missing:
+                    rows.append("(%s, %s, %s, %s)")
+                    params.extend([
+                        user_id,
+                        currency,
+                        crypto_service.generate_mock_address(user_id, currency),
+                        0.00000000
+                    ])
+                # unique_user_currency makes a concurrent request's insert a no-op
+                cursor.execute(f"""
+                    INSERT INTO crypto_wallets (user_id, currency, address, balance)
+                    VALUES {', '.join(rows)}
+                    ON DUPLICATE KEY UPDATE wallet_id = wallet_id
+                """, params)
+                conn.commit()
                 
+                cursor.execute(wallet_query, (user_id,))
+                wallets_by_currency = {wallet['currency']: wallet for wallet in cursor.fetchall()}
+            
+            # Value every wallet from one price snapshot
+            live_prices = crypto_service.get_live_prices()
+            
+            wallets = []
+            for currency in supported:
+                wallet = wallets_by_currency.get(currency)
                 if not wallet:
-                    # Create new wallet if doesn't exist
-                    address = crypto_service.generate_mock_address(user_data['user_id'], currency)
-                    cursor.execute("""
-                        INSERT INTO crypto_wallets (user_id, currency, address, balance)
-                        VALUES (%s, %s, %s, %s)
-                    """, (user_data['user_id'], currency, address, 0.00000000))
-                    
-                    wallet_id = cursor.lastrowid
-                    wallet = {
-                        'wallet_id': wallet_id,
-                        'currency': currency,
-                        'address': address,
-                        'balance': 0.00000000,
-                        'created_at': datetime.datetime.now()
-                    }
-                else:
-                    wallet = dict(wallet)
+                    continue
                 
-                # Convert balance to float for JSON
-                wallet['balance'] = float(wallet['balance'])
-                wallet['balance_usd'] = float(
-                    crypto_service.convert_crypto_to_usd(wallet['balance'], currency)
-                )
+                balance = Decimal(str(wallet['balance']))
+                wallet['balance'] = float(balance)
+                wallet['balance_usd'] = float(balance * live_prices.get(currency, Decimal('0')))
                 
                 # Convert datetime to string
-                if 'created_at' in wallet and wallet['created_at']:
-                    wallet['created_at'] = wallet['created_at'].isoformat() if hasattr(wallet['created_at'], 'isoformat') else str(wallet['created_at'])
+                if wallet['created_at']:
+                    wallet['created_at'] = wallet['created_at'].isoformat()
                 
                 wallets.append(wallet)
             
-            conn.commit()
-            
-            # Get live prices
-            live_prices = crypto_service.get_live_prices()
-            
             return {
                 'wallets': wallets,
                 'live_prices': {k: float(v) for k, v in live_prices.items()}
@@ -199,10 +190,11 @@ class CryptoWithdraw(Resource):
         try:
             cursor = conn.cursor(dictionary=True)
             
-            # Get wallet balance
+            # Get and lock wallet balance
             cursor.execute("""
                 SELECT wallet_id, balance FROM crypto_wallets 
                 WHERE user_id = %s AND currency = %s
+                FOR UPDATE
             """, (user_data['user_id'], currency))
             
             wallet = cursor.fetchone()
@@ -220,8 +212,8 @@ class CryptoWithdraw(Resource):
             # Update wallet balance
             new_balance = Decimal(str(wallet['balance'])) - total_amount
             cursor.execute(
-                "UPDATE crypto_wallets SET balance = %s WHERE wallet_id = %s",
-                (float(new_balance), wallet['wallet_id'])
+                "UPDATE crypto_wallets SET balance = balance - %s WHERE wallet_id = %s",
+                (total_amount, wallet['wallet_id'])
             )
             
             # Record withdrawal transaction
@@ -259,6 +251,7 @@ class CryptoWithdraw(Resource):
             conn.close()
 
 class CryptoSell(Resource):
+    @idempotent('crypto_sell')
     def post(self):
         """Sell cryptocurrency for USD (deposit to bank account)"""
         user_data = get_user_from_token()
@@ -287,10 +280,18 @@ class CryptoSell(Resource):
         try:
             cursor = conn.cursor(dictionary=True)
             
-            # Get wallet balance
+            # Lock the bank account before the wallet, the same order as funding approval
+            bank_account = ledger_service.lock_account(
+                cursor, "user_id = %s", (user_data['user_id'],), order_by='created_at'
+            )
+            if not bank_account:
+                return {'error': 'Bank account not found'}, 404
+            
+            # Get and lock wallet balance
             cursor.execute("""
                 SELECT wallet_id, balance FROM crypto_wallets 
                 WHERE user_id = %s AND currency = %s
+                FOR UPDATE
             """, (user_data['user_id'], currency))
             
             wallet = cursor.fetchone()
@@ -304,30 +305,11 @@ class CryptoSell(Resource):
             # Convert to USD
             usd_amount = crypto_service.convert_crypto_to_usd(crypto_amount, currency)
             
-            # Get user's primary bank account
-            cursor.execute("""
-                SELECT account_id, balance FROM accounts 
-                WHERE user_id = %s 
-                ORDER BY created_at 
-                LIMIT 1
-            """, (user_data['user_id'],))
-            
-            bank_account = cursor.fetchone()
-            if not bank_account:
-                return {'error': 'Bank account not found'}, 404
-            
             # Update crypto wallet balance
             new_crypto_balance = Decimal(str(wallet['balance'])) - crypto_amount
             cursor.execute(
-                "UPDATE crypto_wallets SET balance = %s WHERE wallet_id = %s",
-                (float(new_crypto_balance), wallet['wallet_id'])
-            )
-            
-            # Update bank account balance
-            new_bank_balance = Decimal(str(bank_account['balance'])) + usd_amount
-            cursor.execute(
-                "UPDATE accounts SET balance = %s WHERE account_id = %s",
-                (float(new_bank_balance), bank_account['account_id'])
+                "UPDATE crypto_wallets SET balance = balance - %s WHERE wallet_id = %s",
+                (crypto_amount, wallet['wallet_id'])
             )
             
             # Record crypto transaction
@@ -343,18 +325,10 @@ class CryptoSell(Resource):
                 'confirmed'
             ))
             
-            # Record bank deposit transaction
-            cursor.execute("""
-                INSERT INTO transactions 
-                (account_id, type, amount, balance_after, description)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                bank_account['account_id'],
-                'deposit',
-                float(usd_amount),
-                float(new_bank_balance),
-                f'Crypto sale: {crypto_amount} {currency}'
-            ))
+            # Update bank balance and record bank deposit transaction
+            _, new_bank_balance = ledger_service.post(
+                cursor, bank_account, 'deposit', usd_amount, f'Crypto sale: {crypto_amount} {currency}'
+            )
             
             conn.commit()
             
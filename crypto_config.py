@@ -7,6 +7,21 @@ class CryptoConfig:
     # API endpoints for live prices (using CoinGecko free API)
     COINGECKO_API = 'https://api.coingecko.com/api/v3/simple/price'
     
+    # Price cache: serve cached prices for PRICE_CACHE_TTL seconds, serve stale
+    # prices (while refreshing in the background) up to PRICE_MAX_STALE seconds
+    PRICE_CACHE_TTL = int(os.getenv('CRYPTO_PRICE_CACHE_TTL', 30))
+    PRICE_MAX_STALE = int(os.getenv('CRYPTO_PRICE_MAX_STALE', 300))
+    PRICE_REFRESH_INTERVAL = int(os.getenv('CRYPTO_PRICE_REFRESH_INTERVAL', 25))
+    
+    # CoinGecko request limits (market_data_client)
+    PRICE_REQUEST_TIMEOUT = float(os.getenv('CRYPTO_PRICE_REQUEST_TIMEOUT', 5))
+    PRICE_CONCURRENCY = int(os.getenv('CRYPTO_PRICE_CONCURRENCY', 2))
+    PRICE_CIRCUIT_FAILURES = int(os.getenv('CRYPTO_PRICE_CIRCUIT_FAILURES', 3))   # consecutive failures before the circuit opens
+    PRICE_CIRCUIT_RESET = int(os.getenv('CRYPTO_PRICE_CIRCUIT_RESET', 30))        # seconds before retrying an open circuit
+    
+    # Requests per /api/admin/crypto-funding-requests/batch call
+    MAX_FUNDING_BATCH = int(os.getenv('CRYPTO_MAX_FUNDING_BATCH', 500))
+    
     # Crypto symbols for API
     CRYPTO_IDS = {
         'BTC': 'bitcoin',
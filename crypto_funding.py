@@ -1,29 +1,11 @@
 from flask import request, jsonify
 from flask_restful import Resource
 from config import get_db_connection
-import jwt
+from auth_middleware import get_user_from_token
 from decimal import Decimal
 from services.crypto_service import crypto_service
-
-def verify_token(token):
-    """Verify JWT token and return user data"""
-    try:
-        payload = jwt.decode(token, 'your-secret-key-here-change-in-production', algorithms=['HS256'])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
-
-def get_user_from_token():
-    """Extract user from authorization token"""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    
-    token = auth_header.split(' ')[1]
-    user_data = verify_token(token)
-    return user_data
+from services.ledger_service import ledger_service
+from services.metrics_service import metrics_service
 
 class CryptoToBankDeposit(Resource):
     def post(self):
@@ -147,13 +129,10 @@ class BankToCryptoWithdraw(Resource):
         try:
             cursor = conn.cursor(dictionary=True)
             
-            # Get source bank account
-            cursor.execute("""
-                SELECT account_id, account_number, balance FROM accounts 
-                WHERE user_id = %s AND account_type = %s
-            """, (user_data['user_id'], source_account_type))
-            
-            bank_account = cursor.fetchone()
+            # Get and lock source bank account
+            bank_account = ledger_service.lock_account(
+                cursor, "user_id = %s AND account_type = %s", (user_data['user_id'], source_account_type)
+            )
             if not bank_account:
                 return {'error': f'{source_account_type.title()} account not found'}, 404
             
@@ -168,43 +147,29 @@ class BankToCryptoWithdraw(Resource):
             elif source_account_type == 'checking' and new_bank_balance < Decimal('5'):
                 return {'error': 'Checking account must maintain minimum balance of $5'}, 400
             
-            # Get crypto wallet
+            # Get and lock crypto wallet
             cursor.execute("""
-                SELECT wallet_id, address FROM crypto_wallets 
+                SELECT wallet_id, address, balance FROM crypto_wallets 
                 WHERE user_id = %s AND currency = %s
+                FOR UPDATE
             """, (user_data['user_id'], currency))
             
             crypto_wallet = cursor.fetchone()
             if not crypto_wallet:
                 return {'error': 'Crypto wallet not found'}, 404
             
-            # Update bank account balance
-            cursor.execute(
-                "UPDATE accounts SET balance = %s WHERE account_id = %s",
-                (float(new_bank_balance), bank_account['account_id'])
+            # Update bank balance and record bank withdrawal transaction
+            _, new_bank_balance = ledger_service.post(
+                cursor, bank_account, 'withdraw', usd_amount, f'Crypto purchase: {crypto_amount:.8f} {currency}'
             )
             
             # Update crypto wallet balance
-            current_crypto_balance = Decimal(str(crypto_wallet.get('balance', 0)))
-            new_crypto_balance = current_crypto_balance + crypto_amount
+            new_crypto_balance = Decimal(str(crypto_wallet['balance'])) + crypto_amount
             cursor.execute(
-                "UPDATE crypto_wallets SET balance = %s WHERE wallet_id = %s",
-                (float(new_crypto_balance), crypto_wallet['wallet_id'])
+                "UPDATE crypto_wallets SET balance = balance + %s WHERE wallet_id = %s",
+                (crypto_amount, crypto_wallet['wallet_id'])
             )
             
-            # Record bank withdrawal transaction
-            cursor.execute("""
-                INSERT INTO transactions 
-                (account_id, type, amount, balance_after, description)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                bank_account['account_id'],
-                'withdraw',
-                float(usd_amount),
-                float(new_bank_balance),
-                f'Crypto purchase: {crypto_amount:.8f} {currency}'
-            ))
-            
             # Record crypto deposit transaction
             cursor.execute("""
                 INSERT INTO crypto_transactions 
@@ -276,54 +241,36 @@ class SimulateCryptoDeposit(Resource):
         try:
             cursor = conn.cursor(dictionary=True)
             
-            # Get target bank account
-            cursor.execute("""
-                SELECT account_id, account_number, balance FROM accounts 
-                WHERE user_id = %s AND account_type = %s
-            """, (user_data['user_id'], target_account_type))
-            
-            bank_account = cursor.fetchone()
+            # Get and lock target bank account
+            bank_account = ledger_service.lock_account(
+                cursor, "user_id = %s AND account_type = %s", (user_data['user_id'], target_account_type)
+            )
             if not bank_account:
                 return {'error': f'{target_account_type.title()} account not found'}, 404
             
-            # Get crypto wallet
+            # Get and lock crypto wallet
             cursor.execute("""
                 SELECT wallet_id, balance FROM crypto_wallets 
                 WHERE user_id = %s AND currency = %s
+                FOR UPDATE
             """, (user_data['user_id'], currency))
             
             crypto_wallet = cursor.fetchone()
             if not crypto_wallet:
                 return {'error': 'Crypto wallet not found'}, 404
             
-            # Update bank account balance
-            new_bank_balance = Decimal(str(bank_account['balance'])) + usd_amount
-            cursor.execute(
-                "UPDATE accounts SET balance = %s WHERE account_id = %s",
-                (float(new_bank_balance), bank_account['account_id'])
+            # Update bank balance and record bank deposit transaction
+            _, new_bank_balance = ledger_service.post(
+                cursor, bank_account, 'deposit', usd_amount, f'Crypto funding: {crypto_amount:.8f} {currency}'
             )
             
             # Update crypto wallet balance (simulate receiving crypto)
-            current_crypto_balance = Decimal(str(crypto_wallet.get('balance', 0)))
-            new_crypto_balance = current_crypto_balance + crypto_amount
+            new_crypto_balance = Decimal(str(crypto_wallet['balance'])) + crypto_amount
             cursor.execute(
-                "UPDATE crypto_wallets SET balance = %s WHERE wallet_id = %s",
-                (float(new_crypto_balance), crypto_wallet['wallet_id'])
+                "UPDATE crypto_wallets SET balance = balance + %s WHERE wallet_id = %s",
+                (crypto_amount, crypto_wallet['wallet_id'])
             )
             
-            # Record bank deposit transaction
-            cursor.execute("""
-                INSERT INTO transactions 
-                (account_id, type, amount, balance_after, description)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                bank_account['account_id'],
-                'deposit',
-                float(usd_amount),
-                float(new_bank_balance),
-                f'Crypto funding: {crypto_amount:.8f} {currency}'
-            ))
-            
             # Record crypto deposit transaction
             cursor.execute("""
                 INSERT INTO crypto_transactions 
@@ -402,6 +349,7 @@ class RequestCryptoFunding(Resource):
             """, (user_data['user_id'], currency, float(crypto_amount), float(usd_amount), 'pending', account_type))
             
             request_id = cursor.lastrowid
+            metrics_service.record_funding(cursor, 'requested', [(currency, usd_amount)])
             conn.commit()
             
             return {
@@ -0,0 +1,155 @@
+from decimal import Decimal
+
+# Import from root
+from services.ledger_service import ledger_service
+from services.metrics_service import metrics_service
+
+FUNDING_ACTIONS = ('approve', 'reject')
+
+class CryptoFundingService:
+    """Approves or rejects many crypto funding requests in one DB transaction.
+
+    Every step is one set-based statement or executemany over the whole batch,
+    so the number of round trips does not grow with the number of requests.
+    Requests that cannot be processed get an error in the results and are
+    left pending; the rest are applied. The caller commits or rolls back.
+    """
+
+    def lock_pending(self, cursor, request_ids):
+        """Lock the pending requests among `request_ids`; returns {request_id: row}"""
+        placeholders = ', '.join(['%s'] * len(request_ids))
+        cursor.execute(f"""
+            SELECT request_id, user_id, currency, crypto_amount, usd_amount
+            FROM crypto_funding_requests
+            WHERE request_id IN ({placeholders}) AND status = 'pending'
+            ORDER BY request_id
+            FOR UPDATE
+        """, list(request_ids))
+        return {row['request_id']: row for row in cursor.fetchall()}
+
+    def set_status(self, cursor, request_ids, status, admin_notes):
+        placeholders = ', '.join(['%s'] * len(request_ids))
+        cursor.execute(f"""
+            UPDATE crypto_funding_requests
+            SET status = %s, admin_notes = %s, updated_at = CURRENT_TIMESTAMP
+            WHERE request_id IN ({placeholders})
+        """, [status, admin_notes] + list(request_ids))
+
+    def process_batch(self, cursor, action, request_ids, admin_notes, account_type='checking'):
+        """Approve or reject `request_ids`; returns one result dict per id, in request order"""
+        request_ids = list(dict.fromkeys(request_ids))
+        pending = self.lock_pending(cursor, request_ids)
+        errors = {
+            request_id: 'Pending funding request not found'
+            for request_id in request_ids if request_id not in pending
+        }
+
+        if action == 'approve':
+            applied = self.approve(cursor, pending, admin_notes, account_type, errors)
+        else:
+            applied = {request_id: {} for request_id in pending}
+
+        if applied:
+            status = 'approved' if action == 'approve' else 'rejected'
+            self.set_status(cursor, sorted(applied), status, admin_notes)
+            metrics_service.record_funding(cursor, status, [
+                (pending[request_id]['currency'], pending[request_id]['usd_amount']) for request_id in sorted(applied)
+            ])
+
+        results = []
+        for request_id in request_ids:
+            if request_id in errors:
+                results.append({'request_id': request_id, 'status': 'error', 'error': errors[request_id]})
+                continue
+            funding_request = pending[request_id]
+            result = {
+                'request_id': request_id,
+                'status': 'approved' if action == 'approve' else 'rejected',
+                'user_id': funding_request['user_id'],
+                'currency': funding_request['currency'],
+                'crypto_amount': float(funding_request['crypto_amount']),
+                'usd_amount': float(funding_request['usd_amount'])
+            }
+            result.update(applied[request_id])
+            results.append(result)
+        return results
+
+    def approve(self, cursor, pending, admin_notes, account_type, errors):
+        """Credit bank accounts and wallets for the pending requests; returns {request_id: details}"""
+        if not pending:
+            return {}
+        user_ids = sorted({row['user_id'] for row in pending.values()})
+        placeholders = ', '.join(['%s'] * len(user_ids))
+
+        cursor.execute(f"""
+            SELECT account_id, user_id
+            FROM accounts
+            WHERE user_id IN ({placeholders}) AND account_type = %s
+            ORDER BY account_id
+        """, user_ids + [account_type])
+        account_by_user = {}
+        for row in cursor.fetchall():
+            account_by_user.setdefault(row['user_id'], row['account_id'])
+        accounts = ledger_service.lock_accounts(cursor, account_by_user.values())
+
+        cursor.execute(f"""
+            SELECT wallet_id, user_id, currency, balance
+            FROM crypto_wallets
+            WHERE user_id IN ({placeholders})
+            ORDER BY wallet_id
+            FOR UPDATE
+        """, user_ids)
+        wallets = {(row['user_id'], row['currency']): row for row in cursor.fetchall()}
+
+        postings = []
+        wallet_deltas = {}
+        crypto_rows = []
+        approved = []
+        for request_id, funding_request in sorted(pending.items()):
+            user_id, currency = funding_request['user_id'], funding_request['currency']
+            account = accounts.get(account_by_user.get(user_id))
+            wallet = wallets.get((user_id, currency))
+            if not account:
+                errors[request_id] = f'User {account_type} account not found'
+                continue
+            if not wallet:
+                errors[request_id] = f'User crypto wallet for {currency} not found'
+                continue
+
+            crypto_amount = Decimal(str(funding_request['crypto_amount']))
+            usd_amount = Decimal(str(funding_request['usd_amount']))
+            postings.append((
+                account, 'deposit', usd_amount,
+                f'Crypto funding approved: {crypto_amount:.8f} {currency} ({admin_notes})'
+            ))
+            wallet_deltas[wallet['wallet_id']] = wallet_deltas.get(wallet['wallet_id'], Decimal('0')) + crypto_amount
+            wallet_balance = Decimal(str(wallet['balance'])) + wallet_deltas[wallet['wallet_id']]
+            crypto_rows.append((wallet['wallet_id'], 'deposit', crypto_amount, usd_amount, 'confirmed'))
+            approved.append((request_id, account, wallet_balance))
+
+        if not approved:
+            return {}
+
+        posted = ledger_service.post_many(cursor, postings)
+        cursor.executemany(
+            "UPDATE crypto_wallets SET balance = balance + %s WHERE wallet_id = %s",
+            [(delta, wallet_id) for wallet_id, delta in sorted(wallet_deltas.items())]
+        )
+        cursor.executemany("""
+            INSERT INTO crypto_transactions
+            (wallet_id, type, amount, usd_value, status)
+            VALUES (%s, %s, %s, %s, %s)
+        """, crypto_rows)
+
+        return {
+            request_id: {
+                'account_number': account['account_number'],
+                'account_type': account_type,
+                'new_bank_balance': float(balance),
+                'new_crypto_balance': float(wallet_balance)
+            }
+            for (request_id, account, wallet_balance), (_, balance) in zip(approved, posted)
+        }
+
+# Global crypto funding service instance
+crypto_funding_service = CryptoFundingService()
@@ -1,48 +1,64 @@
-import requests
 import time
 from decimal import Decimal
 import logging
 
 # Import from root
 from crypto_config import CryptoConfig
+from services.price_cache import PriceCache
+from services.market_data_client import market_data_client
 
 class CryptoService:
     def __init__(self):
         self.config = CryptoConfig()
+        market_data_client.register(
+            'coingecko',
+            concurrency=self.config.PRICE_CONCURRENCY,
+            timeout=self.config.PRICE_REQUEST_TIMEOUT,
+            failure_threshold=self.config.PRICE_CIRCUIT_FAILURES,
+            reset_timeout=self.config.PRICE_CIRCUIT_RESET
+        )
+        self.price_cache = PriceCache(
+            self.fetch_live_prices,
+            ttl=self.config.PRICE_CACHE_TTL,
+            max_stale=self.config.PRICE_MAX_STALE,
+            refresh_interval=self.config.PRICE_REFRESH_INTERVAL,
+            name='crypto prices'
+        )
     
-    def get_live_prices(self):
-        """Get live cryptocurrency prices from CoinGecko API"""
-        try:
-            # Prepare cryptocurrency IDs for API
-            ids = ','.join([self.config.CRYPTO_IDS[currency] for currency in self.config.SUPPORTED_CRYPTO])
-            
-            # Make API request
-            response = requests.get(
-                f'{self.config.COINGECKO_API}?ids={ids}&vs_currencies=usd',
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                rates = {}
-                
-                for currency in self.config.SUPPORTED_CRYPTO:
-                    crypto_id = self.config.CRYPTO_IDS[currency]
-                    if crypto_id in data and 'usd' in data[crypto_id]:
-                        rates[currency] = Decimal(str(data[crypto_id]['usd']))
-                    else:
-                        # Fallback to mock rates
-                        rates[currency] = Decimal(str(self.config.MOCK_RATES[currency]))
-                
-                return rates
+    def fetch_live_prices(self):
+        """Fetch live cryptocurrency prices from CoinGecko API (raises on failure)"""
+        # Prepare cryptocurrency IDs for API
+        ids = ','.join([self.config.CRYPTO_IDS[currency] for currency in self.config.SUPPORTED_CRYPTO])
+        
+        # Make API request over the shared connection pool
+        data = market_data_client.get_json(
+            'coingecko',
+            self.config.COINGECKO_API,
+            params={'ids': ids, 'vs_currencies': 'usd'}
+        )
+        rates = {}
+        
+        for currency in self.config.SUPPORTED_CRYPTO:
+            crypto_id = self.config.CRYPTO_IDS[currency]
+            if crypto_id in data and 'usd' in data[crypto_id]:
+                rates[currency] = Decimal(str(data[crypto_id]['usd']))
             else:
-                # Fallback to mock rates if API fails
-                return {currency: Decimal(str(rate)) for currency, rate in self.config.MOCK_RATES.items()}
-                
-        except Exception as e:
-            logging.error(f"Failed to fetch crypto prices: {e}")
+                # Fallback to mock rates
+                rates[currency] = Decimal(str(self.config.MOCK_RATES[currency]))
+        
+        return rates
+    
+    def get_mock_prices(self):
+        """Fallback prices when no live quote has ever been fetched"""
+        return {currency: Decimal(str(rate)) for currency, rate in self.config.MOCK_RATES.items()}
+    
+    def get_live_prices(self):
+        """Get cryptocurrency prices from the shared cache (refreshed from CoinGecko)"""
+        rates = self.price_cache.get()
+        if rates is None:
             # Fallback to mock rates
-            return {currency: Decimal(str(rate)) for currency, rate in self.config.MOCK_RATES.items()}
+            return self.get_mock_prices()
+        return dict(rates)
     
     def convert_crypto_to_usd(self, crypto_amount, currency):
         """Convert cryptocurrency amount to USD"""
@@ -0,0 +1,242 @@
+import threading
+import time
+import logging
+from collections import deque
+
+import mysql.connector
+
+# Upper bounds (in milliseconds) for the checkout wait-time histogram
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the pool timeout"""
+    pass
+
+class PooledConnection:
+    """Wrapper around a MySQL connection that returns itself to the pool on close()"""
+
+    def __init__(self, pool, raw_conn):
+        self._pool = pool
+        self._conn = raw_conn
+        self._checked_out = False
+        self._transaction_state = {}
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def __getattr__(self, name):
+        # Delegate execute helpers, ping(), ... to the real connection
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        """Open a cursor on the real connection; cursor.pooled_connection points back here"""
+        cursor = self._conn.cursor(*args, **kwargs)
+        cursor.pooled_connection = self
+        return cursor
+
+    def transaction_state(self, name, factory, flush):
+        """State kept under `name` until the current transaction ends.
+
+        The first call creates it with factory(); commit() runs
+        flush(cursor, state) just before committing, rollback() drops it.
+        """
+        entry = self._transaction_state.get(name)
+        if entry is None:
+            entry = self._transaction_state[name] = (factory(), flush)
+        return entry[0]
+
+    def commit(self):
+        pending, self._transaction_state = self._transaction_state, {}
+        if pending:
+            cursor = self._conn.cursor()
+            try:
+                for state, flush in pending.values():
+                    flush(cursor, state)
+            finally:
+                cursor.close()
+        self._conn.commit()
+
+    def rollback(self):
+        self._transaction_state = {}
+        self._conn.rollback()
+
+    def close(self):
+        """Return the connection to the pool instead of closing the socket"""
+        if not self._checked_out:
+            return
+        self._checked_out = False
+        self._transaction_state = {}
+        self._pool._release(self)
+
+    def _close_raw(self):
+        """Really close the underlying connection"""
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of MySQL connections"""
+
+    def __init__(self, connect_args, size=5, max_overflow=10, timeout=30,
+                 idle_timeout=300, recycle=1800):
+        self.connect_args = connect_args
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.recycle = recycle
+
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._total = 0
+
+        # Stats
+        self._checked_out = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._timeouts = 0
+        self._wait_histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._wait_total_ms = 0.0
+
+    def _create(self):
+        raw_conn = mysql.connector.connect(**self.connect_args)
+        logging.info("✅ Opened new pooled MySQL connection")
+        with self._lock:
+            self._created += 1
+        return PooledConnection(self, raw_conn)
+
+    def _is_usable(self, conn):
+        """Check age, idle time and liveness of an idle connection"""
+        now = time.monotonic()
+        if self.recycle and now - conn.created_at > self.recycle:
+            return False
+        if self.idle_timeout and now - conn.last_used > self.idle_timeout:
+            return False
+        try:
+            conn._conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        conn._close_raw()
+        with self._lock:
+            self._total -= 1
+            self._discarded += 1
+            self._available.notify()
+
+    def _record_wait(self, waited_ms):
+        for i, bound in enumerate(WAIT_BUCKETS_MS):
+            if waited_ms <= bound:
+                self._wait_histogram[i] += 1
+                break
+        else:
+            self._wait_histogram[-1] += 1
+        self._wait_total_ms += waited_ms
+
+    def get_connection(self):
+        """Check out a connection, waiting up to `timeout` seconds"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        while True:
+            conn = None
+            create = False
+
+            with self._lock:
+                self._waiting += 1
+                try:
+                    while not self._idle and self._total >= self.size + self.max_overflow:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeout(
+                                f'No database connection available after {self.timeout}s '
+                                f'({self._checked_out} checked out)'
+                            )
+                        self._available.wait(remaining)
+
+                    if self._idle:
+                        conn = self._idle.pop()
+                    else:
+                        self._total += 1
+                        create = True
+                finally:
+                    self._waiting -= 1
+
+            if create:
+                try:
+                    conn = self._create()
+                except Exception:
+                    with self._lock:
+                        self._total -= 1
+                        self._available.notify()
+                    raise
+            elif not self._is_usable(conn):
+                # Stale or dead connection; drop it and try again
+                self._discard(conn)
+                continue
+
+            waited_ms = (time.monotonic() - started) * 1000
+            with self._lock:
+                self._checked_out += 1
+                self._checkouts += 1
+                self._record_wait(waited_ms)
+
+            conn._checked_out = True
+            return conn
+
+    def _release(self, conn):
+        """Reset and return a connection to the idle queue"""
+        try:
+            # Drop any open transaction so the next borrower gets a clean session
+            conn._conn.rollback()
+            reusable = True
+        except Exception:
+            reusable = False
+
+        conn.last_used = time.monotonic()
+
+        with self._lock:
+            self._checked_out -= 1
+            # Overflow connections are closed instead of kept idle
+            if reusable and self._total <= self.size:
+                self._idle.append(conn)
+                self._available.notify()
+                return
+
+        self._discard(conn)
+
+    def dispose(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Current pool usage, for sizing size/max_overflow"""
+        with self._lock:
+            histogram = {}
+            for i, bound in enumerate(WAIT_BUCKETS_MS):
+                histogram[f'<={bound}ms'] = self._wait_histogram[i]
+            histogram[f'>{WAIT_BUCKETS_MS[-1]}ms'] = self._wait_histogram[-1]
+
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'total': self._total,
+                'idle': len(self._idle),
+                'checked_out': self._checked_out,
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'created': self._created,
+                'discarded': self._discarded,
+                'timeouts': self._timeouts,
+                'avg_wait_ms': (self._wait_total_ms / self._checkouts) if self._checkouts else 0.0,
+                'wait_histogram': histogram
+            }
@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+from flask import Response
+
+EXPORT_FETCH_SIZE = 500
+
+def fetch_batches(cursor, size=EXPORT_FETCH_SIZE):
+    """Yield lists of rows from an unbuffered cursor until it is exhausted"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+def csv_chunks(cursor, columns, format_row):
+    """CSV body: a header row, then one chunk per fetched batch of formatted rows"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    yield buffer.getvalue()
+
+    for rows in fetch_batches(cursor):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            formatted = format_row(row)
+            writer.writerow(['' if formatted[column] is None else formatted[column] for column in columns])
+        yield buffer.getvalue()
+
+def ndjson_chunks(cursor, format_row):
+    """NDJSON body: one chunk per fetched batch of formatted rows"""
+    for rows in fetch_batches(cursor):
+        yield ''.join(json.dumps(format_row(row)) + '\n' for row in rows)
+
+def streaming_response(conn, cursor, body, mimetype, filename):
+    """Stream `body` (a generator reading `cursor`) as a download.
+
+    The cursor and pooled connection are released when the server closes the
+    response, which happens whether the body was fully sent, abandoned
+    mid-stream, or never iterated because the client went away first.
+    """
+    released = []
+
+    def release():
+        if released:
+            return
+        released.append(True)
+        try:
+            cursor.close()
+        except Exception:
+            # Unread rows left when the client disconnects mid-stream
+            pass
+        conn.close()
+
+    response = Response(body, mimetype=mimetype, headers={'Content-Disposition': f'attachment; filename={filename}'})
+    response.call_on_close(release)
+    return response
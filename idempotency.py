@@ -0,0 +1,215 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request
+
+from config import get_db_connection, Config
+from auth_middleware import get_user_from_token
+
+MAX_KEY_LENGTH = 255
+
+class IdempotencyCache:
+    """In-process LRU of completed responses, in front of the idempotency_keys table"""
+
+    def __init__(self, max_size=2048, ttl=86400):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, key):
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None:
+                return None
+            stored_at, response = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[(user_id, key)]
+                return None
+            self._entries.move_to_end((user_id, key))
+            return response
+
+    def put(self, user_id, key, response):
+        with self._lock:
+            self._entries[(user_id, key)] = (time.monotonic(), response)
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+idempotency_cache = IdempotencyCache(Config.IDEMPOTENCY_CACHE_SIZE, Config.IDEMPOTENCY_KEY_TTL_HOURS * 3600)
+
+def split_response(result):
+    """Normalize a flask-restful return value to (body, status)"""
+    if isinstance(result, tuple):
+        return result[0], (result[1] if len(result) > 1 else 200)
+    return result, 200
+
+def replay(entry):
+    return entry['body'], entry['status'], {'Idempotent-Replayed': 'true'}
+
+def load_key(cursor, user_id, key):
+    """Read a stored key that has not expired (dictionary cursor)"""
+    cursor.execute("""
+        SELECT endpoint, request_hash, status, response_code, response_body
+        FROM idempotency_keys
+        WHERE user_id = %s AND idempotency_key = %s
+          AND created_at >= NOW() - INTERVAL %s HOUR
+    """, (user_id, key, Config.IDEMPOTENCY_KEY_TTL_HOURS))
+    return cursor.fetchone()
+
+def claim_key(user_id, key, endpoint, request_hash):
+    """Reserve a key before executing the request.
+
+    Returns (None, None) once claimed, otherwise (stored_row, error) where
+    stored_row is a completed response to replay. A claim is a lease of
+    IDEMPOTENCY_LEASE_SECONDS: when it has run out without a stored response
+    (the worker died), a retry of the same request takes it over.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None, ({'error': 'Database connection failed'}, 500)
+
+    cursor = None
+    try:
+        cursor = conn.cursor(dictionary=True, buffered=True)
+
+        # Drop an expired row so the key can be reused
+        cursor.execute("""
+            DELETE FROM idempotency_keys
+            WHERE user_id = %s AND idempotency_key = %s
+              AND created_at < NOW() - INTERVAL %s HOUR
+        """, (user_id, key, Config.IDEMPOTENCY_KEY_TTL_HOURS))
+
+        cursor.execute("""
+            INSERT IGNORE INTO idempotency_keys
+            (user_id, idempotency_key, endpoint, request_hash, status, locked_until)
+            VALUES (%s, %s, %s, %s, 'in_progress', NOW() + INTERVAL %s SECOND)
+        """, (user_id, key, endpoint, request_hash, Config.IDEMPOTENCY_LEASE_SECONDS))
+        claimed = cursor.rowcount == 1
+
+        if not claimed:
+            # Take over a claim whose lease ran out without a stored response
+            cursor.execute("""
+                UPDATE idempotency_keys
+                SET locked_until = NOW() + INTERVAL %s SECOND
+                WHERE user_id = %s AND idempotency_key = %s
+                  AND endpoint = %s AND request_hash = %s
+                  AND status = 'in_progress'
+                  AND (locked_until IS NULL OR locked_until < NOW())
+            """, (Config.IDEMPOTENCY_LEASE_SECONDS, user_id, key, endpoint, request_hash))
+            claimed = cursor.rowcount == 1
+        conn.commit()
+
+        if claimed:
+            return None, None
+
+        stored = load_key(cursor, user_id, key)
+        if not stored or stored['status'] != 'completed':
+            return None, ({'error': 'A request with this Idempotency-Key is already in progress'}, 409)
+        return stored, None
+
+    except Exception as e:
+        conn.rollback()
+        return None, ({'error': f'Idempotency check failed: {str(e)}'}, 500)
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+def finish_key(user_id, key, body, status):
+    """Store the response for a claimed key, or release the claim on server errors"""
+    conn = get_db_connection()
+    if not conn:
+        logging.error(f"Could not record Idempotency-Key {key}: database connection failed")
+        return
+
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        if status >= 500:
+            # Let the client retry a request that failed on our side
+            cursor.execute(
+                "DELETE FROM idempotency_keys WHERE user_id = %s AND idempotency_key = %s",
+                (user_id, key)
+            )
+        else:
+            cursor.execute("""
+                UPDATE idempotency_keys
+                SET status = 'completed', response_code = %s, response_body = %s, locked_until = NULL
+                WHERE user_id = %s AND idempotency_key = %s
+            """, (status, json.dumps(body), user_id, key))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logging.error(f"Could not record Idempotency-Key {key}: {e}")
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+def idempotent(endpoint):
+    """Honour an `Idempotency-Key` header on a money-moving POST handler.
+
+    The first request with a key runs normally and its response is stored;
+    repeats with the same key return the stored response without running the
+    handler again. Reusing a key for a different endpoint or body is a 422.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if not key:
+                return handler(*args, **kwargs)
+
+            user_data = get_user_from_token()
+            if not user_data:
+                # Let the handler produce its usual 401
+                return handler(*args, **kwargs)
+
+            if len(key) > MAX_KEY_LENGTH:
+                return {'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}, 400
+
+            user_id = user_data['user_id']
+            request_hash = hashlib.sha256(request.get_data()).hexdigest()
+
+            entry = idempotency_cache.get(user_id, key)
+            if entry is None:
+                stored, error = claim_key(user_id, key, endpoint, request_hash)
+                if error:
+                    return error
+                if stored:
+                    entry = {
+                        'endpoint': stored['endpoint'],
+                        'request_hash': stored['request_hash'],
+                        'status': stored['response_code'],
+                        'body': json.loads(stored['response_body'])
+                    }
+                    idempotency_cache.put(user_id, key, entry)
+
+            if entry is not None:
+                if entry['endpoint'] != endpoint or entry['request_hash'] != request_hash:
+                    return {'error': 'Idempotency-Key was already used for a different request'}, 422
+                return replay(entry)
+
+            try:
+                result = handler(*args, **kwargs)
+            except Exception:
+                finish_key(user_id, key, None, 500)
+                raise
+            body, status = split_response(result)
+            finish_key(user_id, key, body, status)
+            if status < 500:
+                idempotency_cache.put(user_id, key, {
+                    'endpoint': endpoint,
+                    'request_hash': request_hash,
+                    'status': status,
+                    'body': body
+                })
+            return result
+        return wrapper
+    return decorator
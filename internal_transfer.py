@@ -1,29 +1,10 @@
 from flask import request, jsonify
 from flask_restful import Resource
 from config import get_db_connection
-import jwt
+from auth_middleware import get_user_from_token
+from services.ledger_service import ledger_service
 from decimal import Decimal
 
-def verify_token(token):
-    """Verify JWT token and return user data"""
-    try:
-        payload = jwt.decode(token, 'your-secret-key-here-change-in-production', algorithms=['HS256'])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
-
-def get_user_from_token():
-    """Extract user from authorization token"""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    
-    token = auth_header.split(' ')[1]
-    user_data = verify_token(token)
-    return user_data
-
 class InternalTransfer(Resource):
     def post(self):
         user_data = get_user_from_token()
@@ -79,6 +60,11 @@ class InternalTransfer(Resource):
             if from_account['account_id'] == to_account['account_id']:
                 return {'error': 'Cannot transfer to the same account'}, 400
             
+            # Lock both accounts (in account_id order) and re-read their balances
+            locked = ledger_service.lock_accounts(cursor, [from_account['account_id'], to_account['account_id']])
+            from_account = locked[from_account['account_id']]
+            to_account = locked[to_account['account_id']]
+            
             # Check sufficient funds in source account
             from_balance = Decimal(str(from_account['balance']))
             if from_balance < amount:
@@ -91,36 +77,14 @@ class InternalTransfer(Resource):
             elif from_account_type == 'checking' and new_from_balance < Decimal('5'):
                 return {'error': 'Checking account must maintain minimum balance of $5'}, 400
             
-            # Update source account balance
-            cursor.execute(
-                "UPDATE accounts SET balance = %s WHERE account_id = %s",
-                (float(new_from_balance), from_account['account_id'])
-            )
-            
-            # Record withdrawal transaction for source account
-            cursor.execute(
-                """INSERT INTO transactions 
-                (account_id, type, amount, balance_after, description) 
-                VALUES (%s, %s, %s, %s, %s)""",
-                (from_account['account_id'], 'withdraw', float(amount), 
-                 float(new_from_balance), f'Transfer to {to_account_type}: {description}')
-            )
-            
-            # Update destination account balance
-            to_balance = Decimal(str(to_account['balance']))
-            new_to_balance = to_balance + amount
-            cursor.execute(
-                "UPDATE accounts SET balance = %s WHERE account_id = %s",
-                (float(new_to_balance), to_account['account_id'])
+            # Debit source account and record withdrawal transaction
+            _, new_from_balance = ledger_service.post(
+                cursor, from_account, 'withdraw', amount, f'Transfer to {to_account_type}: {description}'
             )
             
-            # Record deposit transaction for destination account
-            cursor.execute(
-                """INSERT INTO transactions 
-                (account_id, type, amount, balance_after, description) 
-                VALUES (%s, %s, %s, %s, %s)""",
-                (to_account['account_id'], 'deposit', float(amount), 
-                 float(new_to_balance), f'Transfer from {from_account_type}: {description}')
+            # Credit destination account and record deposit transaction
+            _, new_to_balance = ledger_service.post(
+                cursor, to_account, 'deposit', amount, f'Transfer from {from_account_type}: {description}'
             )
             
             conn.commit()
@@ -0,0 +1,116 @@
+from decimal import Decimal
+
+# Import from root
+from services.metrics_service import metrics_service
+
+ACCOUNT_COLUMNS = "account_id, user_id, account_number, account_type, balance"
+
+class LedgerService:
+    """Balance postings that are safe under concurrent requests.
+
+    Every balance change happens on a row locked with SELECT ... FOR UPDATE
+    (or through a relative `balance = balance + delta` update), inside the
+    caller's transaction. The caller commits or rolls back.
+    """
+
+    def lock_account(self, cursor, where, params, order_by='account_id'):
+        """Lock and return one account row matching `where` (dictionary cursor)"""
+        cursor.execute(f"""
+            SELECT {ACCOUNT_COLUMNS}
+            FROM accounts
+            WHERE {where}
+            ORDER BY {order_by}
+            LIMIT 1
+            FOR UPDATE
+        """, params)
+        return cursor.fetchone()
+
+    def lock_accounts(self, cursor, account_ids):
+        """Lock several accounts in ascending account_id order; returns {account_id: row}
+
+        Always locking in the same order means two transfers between the same
+        pair of accounts cannot deadlock each other.
+        """
+        account_ids = sorted(set(account_ids))
+        if not account_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(account_ids))
+        cursor.execute(f"""
+            SELECT {ACCOUNT_COLUMNS}
+            FROM accounts
+            WHERE account_id IN ({placeholders})
+            ORDER BY account_id
+            FOR UPDATE
+        """, account_ids)
+        return {row['account_id']: row for row in cursor.fetchall()}
+
+    def post(self, cursor, account, tx_type, amount, description):
+        """Credit (deposit) or debit (withdraw) a locked account and record the transaction.
+
+        `account` must come from lock_account/lock_accounts in the same
+        transaction; its balance is updated in place. Returns
+        (transaction_id, new_balance).
+        """
+        amount = Decimal(str(amount))
+        delta = amount if tx_type == 'deposit' else -amount
+
+        cursor.execute(
+            "UPDATE accounts SET balance = balance + %s WHERE account_id = %s",
+            (delta, account['account_id'])
+        )
+
+        new_balance = Decimal(str(account['balance'])) + delta
+        account['balance'] = new_balance
+
+        cursor.execute(
+            """INSERT INTO transactions
+            (account_id, type, amount, balance_after, description)
+            VALUES (%s, %s, %s, %s, %s)""",
+            (account['account_id'], tx_type, amount, new_balance, description)
+        )
+        transaction_id = cursor.lastrowid
+
+        metrics_service.record_posting(cursor, tx_type, amount)
+        return transaction_id, new_balance
+
+    def post_many(self, cursor, postings):
+        """Apply several postings with one balance UPDATE per account and one batched INSERT.
+
+        `postings` is a list of (account, tx_type, amount, description) with
+        accounts locked in this transaction; rows get running balance_after
+        values in list order. Returns (transaction_id, new_balance) per
+        posting, like post(); the rows go in as one multi-row INSERT, whose
+        auto-increment ids are consecutive from lastrowid.
+        """
+        deltas = {}
+        rows = []
+        balances = []
+        for account, tx_type, amount, description in postings:
+            amount = Decimal(str(amount))
+            delta = amount if tx_type == 'deposit' else -amount
+
+            new_balance = Decimal(str(account['balance'])) + delta
+            account['balance'] = new_balance
+            deltas[account['account_id']] = deltas.get(account['account_id'], Decimal('0')) + delta
+
+            rows.append((account['account_id'], tx_type, amount, new_balance, description))
+            balances.append(new_balance)
+
+        if deltas:
+            cursor.executemany(
+                "UPDATE accounts SET balance = balance + %s WHERE account_id = %s",
+                [(delta, account_id) for account_id, delta in sorted(deltas.items())]
+            )
+            cursor.executemany(
+                """INSERT INTO transactions
+                (account_id, type, amount, balance_after, description)
+                VALUES (%s, %s, %s, %s, %s)""",
+                rows
+            )
+            first_id = cursor.lastrowid
+            metrics_service.record_postings(cursor, [(row[1], row[2]) for row in rows])
+            return [(first_id + offset, balance) for offset, balance in enumerate(balances)]
+        return []
+
+# Global ledger service instance
+ledger_service = LedgerService()
@@ -0,0 +1,320 @@
+import asyncio
+import threading
+import time
+import logging
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import aiohttp
+
+from config import Config
+
+class ProviderError(Exception):
+    """Raised when an upstream market data request fails"""
+    pass
+
+class CircuitOpenError(ProviderError):
+    """Raised without contacting the provider while its circuit is open"""
+    pass
+
+class AsyncRateLimiter:
+    """Token bucket limiting requests per second to one provider (event loop only)"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    async def acquire(self, deadline):
+        """Wait for a token; False if the deadline passes first"""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            delay = (1 - self.tokens) / self.rate
+            if now + delay > deadline:
+                return False
+            await asyncio.sleep(delay)
+
+class CircuitBreaker:
+    """Per-provider circuit breaker.
+
+    closed     requests flow; `failure_threshold` consecutive failures open it
+    open       requests fail immediately for `reset_timeout` seconds
+    half_open  up to `half_open_probes` trial requests are let through; a
+               success closes the circuit, a failure re-opens it
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, half_open_probes=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probes = 0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.transitions = {}
+        self.last_transition_at = None
+        self.fast_failures = 0
+        self.total_failures = 0
+
+    def _transition(self, state):
+        # Caller holds self._lock
+        key = f'{self.state}->{state}'
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        self.last_transition_at = time.time()
+        logging.warning(f"Circuit for {self.name}: {self.state} -> {state}")
+        self.state = state
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+            self._probes = 0
+        elif state == self.CLOSED:
+            self.opened_at = None
+            self.failures = 0
+
+    def allow(self):
+        """Whether a request may be sent now (claims a probe slot when half-open)"""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._transition(self.HALF_OPEN)
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            self.fast_failures += 1
+            return False
+
+    def is_open(self):
+        """True while requests are being rejected outright (counts as a fast failure)"""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout:
+                self.fast_failures += 1
+                return True
+            return False
+
+    def release_probe(self):
+        """Return a half-open probe slot whose request never reached the provider"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.total_failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                self._transition(self.OPEN)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'total_failures': self.total_failures,
+                'fast_failures': self.fast_failures,
+                'transitions': dict(self.transitions),
+                'last_transition_at': self.last_transition_at
+            }
+
+class Provider:
+    """Limits for one upstream API: concurrency, request rate, timeout and breaker"""
+
+    def __init__(self, name, concurrency=4, rate=None, burst=1, timeout=5,
+                 failure_threshold=5, reset_timeout=30, half_open_probes=1):
+        self.name = name
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.limiter = AsyncRateLimiter(rate, burst) if rate else None
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout, half_open_probes)
+        self._semaphore = None      # created on the client's event loop
+
+    @property
+    def semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+class MarketDataClient:
+    """Shared async HTTP client for price providers.
+
+    Requests run on one background event loop over a keep-alive connection
+    pool, so callers never pay DNS/TLS setup per quote. The get_json* methods
+    are a blocking facade for the Flask resources.
+    """
+
+    def __init__(self, pool_size=20, keepalive_timeout=30):
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.providers = {}
+
+        self._loop = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    def register(self, name, **limits):
+        """Register (or replace) a provider and its limits"""
+        provider = Provider(name, **limits)
+        self.providers[name] = provider
+        return provider
+
+    def _ensure_loop(self):
+        """Start the background event loop on first use"""
+        if self._loop is not None:
+            return self._loop
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name='market-data-loop', daemon=True
+                ).start()
+                self._loop = loop
+        return self._loop
+
+    def _get_session(self):
+        # Only called on the event loop, so no locking is needed
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def fetch_json(self, name, url, params=None, deadline=None):
+        """GET a JSON document from a provider, honouring its limits"""
+        provider = self.providers[name]
+        breaker = provider.breaker
+        if not breaker.allow():
+            raise CircuitOpenError(f'{name} circuit is open')
+        if deadline is None:
+            deadline = time.monotonic() + provider.timeout
+
+        recorded = False
+        try:
+            async with provider.semaphore:
+                if provider.limiter and not await provider.limiter.acquire(deadline):
+                    raise ProviderError(f'{name} rate limit: no slot before deadline')
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ProviderError(f'{name} request deadline passed while queued')
+
+                try:
+                    timeout = aiohttp.ClientTimeout(total=min(provider.timeout, remaining))
+                    async with self._get_session().get(url, params=params, timeout=timeout) as response:
+                        if response.status != 200:
+                            raise ProviderError(f'{name} returned HTTP {response.status}')
+                        data = await response.json(content_type=None)
+                except ProviderError:
+                    recorded = True
+                    breaker.record_failure()
+                    raise
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    recorded = True
+                    breaker.record_failure()
+                    raise ProviderError(f'{name} request failed: {e!r}') from e
+
+            recorded = True
+            breaker.record_success()
+            return data
+        finally:
+            if not recorded:
+                # Never reached the provider (queued past the deadline or
+                # cancelled); give back a half-open probe slot
+                breaker.release_probe()
+
+    def get_json(self, name, url, params=None):
+        """Blocking GET through the shared event loop (raises ProviderError)"""
+        provider = self.providers[name]
+        if provider.breaker.is_open():
+            # Fail fast without a round trip to the event loop
+            raise CircuitOpenError(f'{name} circuit is open')
+
+        future = asyncio.run_coroutine_threadsafe(
+            self.fetch_json(name, url, params), self._ensure_loop()
+        )
+        try:
+            return future.result(timeout=provider.timeout + 1)
+        except FutureTimeout:
+            future.cancel()
+            raise ProviderError(f'{name} request timed out')
+
+    def get_json_many(self, name, requests, timeout):
+        """Run many (url, params) GETs concurrently within one deadline.
+
+        Returns a list aligned with `requests` holding either the decoded JSON
+        or the exception that request failed with.
+        """
+        if not requests:
+            return []
+        deadline = time.monotonic() + timeout
+
+        async def run_all():
+            tasks = [
+                asyncio.ensure_future(self.fetch_json(name, url, params, deadline))
+                for url, params in requests
+            ]
+            await asyncio.wait(tasks, timeout=max(0, deadline - time.monotonic()))
+            results = []
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                    results.append(ProviderError(f'{name} request timed out'))
+                elif task.exception() is not None:
+                    results.append(task.exception())
+                else:
+                    results.append(task.result())
+            return results
+
+        future = asyncio.run_coroutine_threadsafe(run_all(), self._ensure_loop())
+        try:
+            return future.result(timeout=timeout + 1)
+        except FutureTimeout:
+            future.cancel()
+            return [ProviderError(f'{name} batch timed out') for _ in requests]
+
+    def stats(self):
+        """Circuit breaker state and transition counts per provider"""
+        return {name: provider.breaker.stats() for name, provider in self.providers.items()}
+
+    def close(self):
+        """Close pooled connections and stop the event loop"""
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            if self._session is not None:
+                await self._session.close()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+        self._session = None
+
+# Global market data client, shared by the crypto and stock services
+market_data_client = MarketDataClient(
+    pool_size=Config.MARKET_DATA_POOL_SIZE,
+    keepalive_timeout=Config.MARKET_DATA_KEEPALIVE
+)
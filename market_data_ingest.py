@@ -0,0 +1,69 @@
+"""Market data ingestion job.
+
+Periodically fetches quotes for all supported stocks and writes them to the
+`stocks` table, so API requests only ever read prices. After each refresh the
+limit/stop order matching engine fills any resting orders the new prices cross.
+
+    python market_data_ingest.py            # run forever
+    python market_data_ingest.py --once     # single refresh (e.g. from cron)
+"""
+import argparse
+import logging
+import time
+
+from config import get_db_connection
+from services.stock_service import stock_service
+from services.order_book import order_engine
+
+def match_orders():
+    """Fill resting limit/stop orders crossed by the current prices"""
+    conn = get_db_connection()
+    if not conn:
+        logging.error("❌ Order matching skipped: database connection failed")
+        return 0
+    try:
+        return order_engine.run_cycle(conn)
+    finally:
+        conn.close()
+
+def run_once():
+    """Refresh the stocks table once, then match resting orders"""
+    started = time.monotonic()
+    ok = stock_service.initialize_stocks()
+    elapsed = time.monotonic() - started
+    if ok:
+        logging.info(f"✅ Refreshed stock prices in {elapsed:.2f}s")
+    else:
+        logging.error(f"❌ Stock price refresh failed after {elapsed:.2f}s")
+
+    # Admin price updates land in `stocks` too, so match even if this refresh failed
+    try:
+        filled = match_orders()
+        if filled:
+            logging.info(f"✅ Filled {filled} resting order(s)")
+    except Exception as e:
+        logging.error(f"Order matching error: {e}")
+    return ok
+
+def run_forever(interval):
+    """Refresh the stocks table every `interval` seconds"""
+    while True:
+        started = time.monotonic()
+        try:
+            run_once()
+        except Exception as e:
+            logging.error(f"Market data ingestion error: {e}")
+        time.sleep(max(0, interval - (time.monotonic() - started)))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='NexaBank market data ingestion')
+    parser.add_argument('--once', action='store_true', help='run a single refresh and exit')
+    parser.add_argument('--interval', type=int, default=stock_service.config.MARKET_DATA_REFRESH_INTERVAL,
+                        help='seconds between refreshes')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    if args.once:
+        raise SystemExit(0 if run_once() else 1)
+    run_forever(args.interval)
@@ -0,0 +1,173 @@
+import datetime
+from decimal import Decimal
+
+# Import from root
+from config import Config
+
+FUNDING_EVENTS = ('requested', 'approved', 'rejected')
+
+class MetricsService:
+    """Daily rollups and running totals behind the admin dashboard.
+
+    Writers record an event in the same transaction as the row it describes,
+    so rolled-back work is never counted and the dashboard never has to scan
+    transactions, stock_transactions or crypto_funding_requests. On a pooled
+    connection the deltas are merged per transaction and upserted once, just
+    before commit, so a transaction with many postings costs one statement
+    per table and holds the counter row locks only while committing.
+
+    Each counter is spread over METRICS_COUNTER_SLOTS rows; a writer always
+    uses the slot of its connection id, so one transaction never locks two
+    slots of the same counter (no lock-order deadlocks) while concurrent
+    connections mostly land on different rows. Readers sum the slots. Dates
+    come from the database clock (CURDATE()) on both the write and the read
+    side.
+    """
+
+    def __init__(self):
+        self.slots = max(1, Config.METRICS_COUNTER_SLOTS)
+
+    def record(self, cursor, daily=(), totals=()):
+        """Add (metric, dimension, count, amount) entries to today's rollups and the running totals"""
+        conn = getattr(cursor, 'pooled_connection', None)
+        if conn is not None:
+            pending = conn.transaction_state('metrics', self._pending, self._flush)
+        else:
+            pending = self._pending()
+
+        for table, entries in (('metrics_daily', daily), ('metrics_totals', totals)):
+            merged = pending[table]
+            for metric, dimension, count, amount in entries:
+                key = (metric, dimension or '')
+                previous_count, previous_amount = merged.get(key, (0, Decimal('0')))
+                merged[key] = (previous_count + count, previous_amount + Decimal(str(amount)))
+
+        if conn is None:
+            self._flush(cursor, pending)
+
+    @staticmethod
+    def _pending():
+        return {'metrics_daily': {}, 'metrics_totals': {}}
+
+    def _flush(self, cursor, pending):
+        """Upsert the merged deltas, one statement per table, in key order"""
+        for table, merged in pending.items():
+            if not merged:
+                continue
+
+            date_column, date_value = ('metric_date, ', 'CURDATE(), ') if table == 'metrics_daily' else ('', '')
+            cursor.executemany(f"""
+                INSERT INTO {table} ({date_column}metric, dimension, slot, event_count, amount)
+                VALUES ({date_value}%s, %s, MOD(CONNECTION_ID(), %s), %s, %s)
+                ON DUPLICATE KEY UPDATE
+                event_count = event_count + VALUES(event_count),
+                amount = amount + VALUES(amount)
+            """, [
+                (metric, dimension, self.slots, count, amount)
+                for (metric, dimension), (count, amount) in sorted(merged.items())
+            ])
+
+    def record_postings(self, cursor, postings):
+        """Count ledger postings, a list of (tx_type, amount), and move the AUM total"""
+        balance_delta = Decimal('0')
+        for tx_type, amount in postings:
+            amount = Decimal(str(amount))
+            balance_delta += amount if tx_type == 'deposit' else -amount
+        self.record(
+            cursor,
+            daily=[(tx_type, '', 1, amount) for tx_type, amount in postings],
+            totals=[('bank_balances', '', 0, balance_delta)] if postings else ()
+        )
+
+    def record_posting(self, cursor, tx_type, amount):
+        self.record_postings(cursor, [(tx_type, amount)])
+
+    def record_trades(self, cursor, trades):
+        """Count stock trades, a list of (side, symbol, total_amount)"""
+        self.record(cursor, daily=[(f'stock_{side}', symbol, 1, amount) for side, symbol, amount in trades])
+
+    def record_funding(self, cursor, event, requests):
+        """Count crypto funding requests, a list of (currency, usd_amount), that were requested/approved/rejected"""
+        direction = 1 if event == 'requested' else -1
+        self.record(
+            cursor,
+            daily=[(f'crypto_funding_{event}', currency, 1, usd_amount) for currency, usd_amount in requests],
+            totals=[
+                ('crypto_funding_pending', currency, direction, Decimal(str(usd_amount)) * direction)
+                for currency, usd_amount in requests
+            ]
+        )
+
+    def get_dashboard(self, cursor, days):
+        """Summaries for the last `days` days, read from the rollup tables only (dictionary cursor)"""
+        cursor.execute("SELECT CURDATE() AS today")
+        today = cursor.fetchone()['today']
+        since = today - datetime.timedelta(days=days - 1)
+
+        cursor.execute("""
+            SELECT metric_date, metric, dimension,
+                   SUM(event_count) AS event_count, SUM(amount) AS amount
+            FROM metrics_daily
+            WHERE metric_date >= %s
+            GROUP BY metric_date, metric, dimension
+            ORDER BY metric_date
+        """, (since,))
+        daily_rows = cursor.fetchall()
+
+        cursor.execute("""
+            SELECT metric, dimension, SUM(event_count) AS event_count, SUM(amount) AS amount
+            FROM metrics_totals
+            GROUP BY metric, dimension
+        """)
+        total_rows = cursor.fetchall()
+
+        def bucket():
+            return {'count': 0, 'amount': 0.0}
+
+        def add(target, row):
+            target['count'] += int(row['event_count'])
+            target['amount'] = round(target['amount'] + float(row['amount']), 2)
+
+        daily = {}
+        trade_volume = {}
+        for row in daily_rows:
+            day = daily.setdefault(row['metric_date'].isoformat(), {})
+            metric = row['metric']
+            if metric.startswith('stock_'):
+                add(day.setdefault('stock_trades', bucket()), row)
+                add(day.setdefault(metric, bucket()), row)
+                volume = trade_volume.setdefault(row['dimension'], {'count': 0, 'amount': 0.0, 'buy_amount': 0.0, 'sell_amount': 0.0})
+                add(volume, row)
+                side_key = f"{metric[len('stock_'):]}_amount"
+                volume[side_key] = round(volume[side_key] + float(row['amount']), 2)
+            else:
+                add(day.setdefault(metric, bucket()), row)
+
+        pending = {'count': 0, 'amount': 0.0, 'by_currency': {}}
+        aum = 0.0
+        for row in total_rows:
+            if row['metric'] == 'bank_balances':
+                aum = float(row['amount'])
+            elif row['metric'] == 'crypto_funding_pending':
+                add(pending, row)
+                pending['by_currency'][row['dimension']] = {
+                    'count': int(row['event_count']),
+                    'amount': float(row['amount'])
+                }
+
+        return {
+            'as_of': today.isoformat(),
+            'days': days,
+            'today': daily.get(today.isoformat(), {}),
+            'totals': {
+                'assets_under_management': aum,
+                'pending_crypto_funding': pending
+            },
+            'trade_volume_by_symbol': dict(
+                sorted(trade_volume.items(), key=lambda item: item[1]['amount'], reverse=True)
+            ),
+            'daily': [{'date': date, 'metrics': metrics} for date, metrics in daily.items()]
+        }
+
+# Global metrics service instance
+metrics_service = MetricsService()
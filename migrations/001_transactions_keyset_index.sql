@@ -0,0 +1,8 @@
+-- Keyset pagination for /api/transactions
+--
+-- Lets `WHERE account_id IN (...) AND (created_at, transaction_id) < (...)
+-- ORDER BY created_at DESC, transaction_id DESC` run as an index range scan
+-- instead of a filesort over all of a user's transactions.
+
+ALTER TABLE `transactions`
+  ADD KEY `idx_account_created_txn` (`account_id`, `created_at`, `transaction_id`);
@@ -0,0 +1,21 @@
+-- Idempotency-Key storage for money-moving endpoints
+--
+-- One row per (user, key). A row is inserted as 'in_progress' before the
+-- request runs and updated with the response once it completes, so a retry
+-- with the same key replays the stored response instead of moving money twice.
+
+CREATE TABLE `idempotency_keys` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `user_id` int(11) NOT NULL,
+  `idempotency_key` varchar(255) NOT NULL,
+  `endpoint` varchar(100) NOT NULL,
+  `request_hash` char(64) NOT NULL,
+  `status` enum('in_progress','completed') NOT NULL DEFAULT 'in_progress',
+  `response_code` int(11) DEFAULT NULL,
+  `response_body` longtext DEFAULT NULL,
+  `created_at` timestamp NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `unique_user_key` (`user_id`, `idempotency_key`),
+  KEY `created_at` (`created_at`),
+  CONSTRAINT `idempotency_keys_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`user_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,40 @@
+-- Stock price history: raw ticks plus 1m/1h/1d OHLC bars
+--
+-- `stocks` only holds the latest price. Every price written by the ingestion
+-- job (and AdminUpdateStockPrice) is appended to `stock_price_ticks`, and the
+-- matching 1m/1h/1d bars in `stock_price_bars` are upserted in the same
+-- transaction. Times are UTC.
+--
+-- Ticks are append-only and range-partitioned on `recorded_at`, so old data
+-- can be dropped a partition at a time. Split `p_future` into monthly
+-- partitions as needed, e.g.
+--   ALTER TABLE `stock_price_ticks` REORGANIZE PARTITION `p_future` INTO (
+--     PARTITION `p202611` VALUES LESS THAN ('2026-12-01'),
+--     PARTITION `p_future` VALUES LESS THAN (MAXVALUE));
+-- (Partitioned InnoDB tables cannot have foreign keys, hence none on `symbol`.)
+
+CREATE TABLE `stock_price_ticks` (
+  `tick_id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `symbol` varchar(10) NOT NULL,
+  `price` decimal(10,2) NOT NULL,
+  `source` varchar(20) NOT NULL DEFAULT 'ingest',
+  `recorded_at` datetime NOT NULL,
+  PRIMARY KEY (`symbol`, `recorded_at`, `tick_id`),
+  KEY `tick_id` (`tick_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci
+PARTITION BY RANGE COLUMNS (`recorded_at`) (
+  PARTITION `p_future` VALUES LESS THAN (MAXVALUE)
+);
+
+CREATE TABLE `stock_price_bars` (
+  `symbol` varchar(10) NOT NULL,
+  `interval` enum('1m','1h','1d') NOT NULL,
+  `bucket_start` datetime NOT NULL,
+  `open` decimal(10,2) NOT NULL,
+  `high` decimal(10,2) NOT NULL,
+  `low` decimal(10,2) NOT NULL,
+  `close` decimal(10,2) NOT NULL,
+  `tick_count` int(11) NOT NULL DEFAULT 1,
+  `updated_at` timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`symbol`, `interval`, `bucket_start`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
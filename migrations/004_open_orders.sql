@@ -0,0 +1,37 @@
+-- Limit and stop orders
+--
+-- Resting orders live in `open_orders` until the matching engine (run by
+-- market_data_ingest.py) sees a price that crosses them, then they are filled
+-- through the normal trading path and recorded in `stock_transactions` with
+-- their order type.
+--
+--   buy  limit  fills when price <= trigger_price
+--   sell limit  fills when price >= trigger_price
+--   buy  stop   fills when price >= trigger_price
+--   sell stop   fills when price <= trigger_price
+
+CREATE TABLE `open_orders` (
+  `order_id` int(11) NOT NULL AUTO_INCREMENT,
+  `user_id` int(11) NOT NULL,
+  `symbol` varchar(10) NOT NULL,
+  `side` enum('buy','sell') NOT NULL,
+  `order_type` enum('limit','stop') NOT NULL,
+  `quantity` decimal(10,2) NOT NULL,
+  `trigger_price` decimal(10,2) NOT NULL,
+  `account_type` varchar(20) NOT NULL DEFAULT 'savings',
+  `status` enum('open','filled','cancelled','rejected') NOT NULL DEFAULT 'open',
+  `fill_price` decimal(10,2) DEFAULT NULL,
+  `status_reason` varchar(255) DEFAULT NULL,
+  `created_at` timestamp NOT NULL DEFAULT current_timestamp(),
+  `updated_at` timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`order_id`),
+  KEY `idx_status_order` (`status`, `order_id`),
+  KEY `idx_status_updated` (`status`, `updated_at`),
+  KEY `idx_user_status` (`user_id`, `status`),
+  KEY `symbol` (`symbol`),
+  CONSTRAINT `open_orders_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`user_id`),
+  CONSTRAINT `open_orders_ibfk_2` FOREIGN KEY (`symbol`) REFERENCES `stocks` (`symbol`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+ALTER TABLE `stock_transactions`
+  MODIFY `order_type` enum('market','limit','stop') DEFAULT 'market';
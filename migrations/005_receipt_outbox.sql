@@ -0,0 +1,16 @@
+-- Outbox for write-behind receipt generation
+--
+-- Money-moving endpoints insert the receipt here in the same transaction as
+-- the ledger change, then hand it to receipt_service's background writer,
+-- which batch-inserts `transaction_receipts` and deletes the outbox rows.
+-- Rows still here after a crash are replayed by the writer's periodic sweep.
+
+CREATE TABLE `receipt_outbox` (
+  `outbox_id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `receipt_number` varchar(50) NOT NULL,
+  `payload` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL CHECK (json_valid(`payload`)),
+  `created_at` timestamp NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`outbox_id`),
+  UNIQUE KEY `receipt_number` (`receipt_number`),
+  KEY `created_at` (`created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
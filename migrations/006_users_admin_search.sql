@@ -0,0 +1,12 @@
+-- Paging and prefix search for /api/admin/users
+--
+-- Each sort key gets an index ending in user_id so keyset pages
+-- (`(sort_key, user_id) < (...) ORDER BY sort_key DESC, user_id DESC`) are
+-- index range scans. `email` is already covered by its unique key. Prefix
+-- searches (`LIKE 'abc%'`) on email, full_name and phone use the same
+-- indexes, merged when searching all three.
+
+ALTER TABLE `users`
+  ADD KEY `idx_created_user` (`created_at`, `user_id`),
+  ADD KEY `idx_full_name_user` (`full_name`, `user_id`),
+  ADD KEY `idx_phone` (`phone`);
@@ -0,0 +1,70 @@
+-- Rollups for /api/admin/metrics
+--
+-- `metrics_daily` holds per-day counters (ledger postings by type, stock
+-- trades by symbol, crypto funding requests by currency) and `metrics_totals`
+-- running totals (bank balances / AUM, pending crypto funding). Both are
+-- updated by metrics_service in the same transaction as the row they count.
+-- Each counter is split across `slot` rows to spread lock contention; read
+-- with SUM(...) GROUP BY everything but `slot`.
+--
+-- The INSERT ... SELECT statements backfill the history once. Writers count
+-- a row when they write it, so the backfill must see exactly the rows no
+-- writer will count. Required order:
+--   1. stop every process that writes transactions, stock trades or crypto
+--      funding requests (app servers, the order matching engine, workers);
+--   2. apply this migration;
+--   3. start the code that maintains the rollups.
+-- Rows written by old code after the backfill are never counted, and rows
+-- written by new code before it are counted twice; `bank_balances` is a
+-- snapshot of accounts and needs balances to be still for the same reason.
+
+CREATE TABLE `metrics_daily` (
+  `metric_date` date NOT NULL,
+  `metric` varchar(40) NOT NULL,
+  `dimension` varchar(20) NOT NULL DEFAULT '',
+  `slot` tinyint(3) UNSIGNED NOT NULL DEFAULT 0,
+  `event_count` bigint(20) NOT NULL DEFAULT 0,
+  `amount` decimal(20,2) NOT NULL DEFAULT 0.00,
+  PRIMARY KEY (`metric_date`, `metric`, `dimension`, `slot`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+CREATE TABLE `metrics_totals` (
+  `metric` varchar(40) NOT NULL,
+  `dimension` varchar(20) NOT NULL DEFAULT '',
+  `slot` tinyint(3) UNSIGNED NOT NULL DEFAULT 0,
+  `event_count` bigint(20) NOT NULL DEFAULT 0,
+  `amount` decimal(20,2) NOT NULL DEFAULT 0.00,
+  PRIMARY KEY (`metric`, `dimension`, `slot`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+INSERT INTO `metrics_daily` (`metric_date`, `metric`, `dimension`, `event_count`, `amount`)
+SELECT DATE(`created_at`), `type`, '', COUNT(*), SUM(`amount`)
+FROM `transactions`
+GROUP BY DATE(`created_at`), `type`;
+
+INSERT INTO `metrics_daily` (`metric_date`, `metric`, `dimension`, `event_count`, `amount`)
+SELECT DATE(`created_at`), CONCAT('stock_', `type`), `symbol`, COUNT(*), SUM(`total_amount`)
+FROM `stock_transactions`
+WHERE `status` = 'completed'
+GROUP BY DATE(`created_at`), `type`, `symbol`;
+
+INSERT INTO `metrics_daily` (`metric_date`, `metric`, `dimension`, `event_count`, `amount`)
+SELECT DATE(`created_at`), 'crypto_funding_requested', `currency`, COUNT(*), SUM(`usd_amount`)
+FROM `crypto_funding_requests`
+GROUP BY DATE(`created_at`), `currency`;
+
+INSERT INTO `metrics_daily` (`metric_date`, `metric`, `dimension`, `event_count`, `amount`)
+SELECT DATE(`updated_at`), CONCAT('crypto_funding_', `status`), `currency`, COUNT(*), SUM(`usd_amount`)
+FROM `crypto_funding_requests`
+WHERE `status` IN ('approved', 'rejected')
+GROUP BY DATE(`updated_at`), `status`, `currency`;
+
+INSERT INTO `metrics_totals` (`metric`, `dimension`, `event_count`, `amount`)
+SELECT 'bank_balances', '', 0, COALESCE(SUM(`balance`), 0)
+FROM `accounts`;
+
+INSERT INTO `metrics_totals` (`metric`, `dimension`, `event_count`, `amount`)
+SELECT 'crypto_funding_pending', `currency`, COUNT(*), SUM(`usd_amount`)
+FROM `crypto_funding_requests`
+WHERE `status` = 'pending'
+GROUP BY `currency`;
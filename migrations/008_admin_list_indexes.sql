@@ -0,0 +1,18 @@
+-- Keyset pagination and filters for the admin stock transaction and crypto
+-- funding request lists
+--
+-- Both lists page newest first on (created_at, id). Each filter gets an index
+-- that starts with the filtered column and ends with (created_at, id), so a
+-- filtered page is still an index range scan read in order with no filesort.
+
+ALTER TABLE `stock_transactions`
+  ADD KEY `idx_created_txn` (`created_at`, `transaction_id`),
+  ADD KEY `idx_status_created_txn` (`status`, `created_at`, `transaction_id`),
+  ADD KEY `idx_symbol_created_txn` (`symbol`, `created_at`, `transaction_id`),
+  ADD KEY `idx_user_created_txn` (`user_id`, `created_at`, `transaction_id`);
+
+ALTER TABLE `crypto_funding_requests`
+  ADD KEY `idx_created_request` (`created_at`, `request_id`),
+  ADD KEY `idx_status_created_request` (`status`, `created_at`, `request_id`),
+  ADD KEY `idx_currency_created_request` (`currency`, `created_at`, `request_id`),
+  ADD KEY `idx_user_created_request` (`user_id`, `created_at`, `request_id`);
@@ -0,0 +1,10 @@
+-- Lease on in-progress Idempotency-Key claims
+--
+-- A claim is written as 'in_progress' with locked_until set a lease ahead.
+-- If the worker that claimed it dies before storing the response, a retry
+-- of the same request takes the claim over once the lease has passed instead
+-- of getting 409 until the key expires. Rows claimed before this migration
+-- have no lease and can be taken over immediately.
+
+ALTER TABLE `idempotency_keys`
+  ADD COLUMN `locked_until` timestamp NULL DEFAULT NULL AFTER `response_body`;
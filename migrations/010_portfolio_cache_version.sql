@@ -0,0 +1,14 @@
+-- Shared invalidation signal for cached portfolio valuations
+--
+-- Web workers cache /api/stocks/portfolio per process. Revaluations and
+-- order fills run in other processes (market_data_ingest.py), so they bump
+-- this counter in their own transaction and readers drop any entry cached
+-- under an older version.
+
+CREATE TABLE `cache_versions` (
+  `name` varchar(50) NOT NULL,
+  `version` bigint(20) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+INSERT INTO `cache_versions` (`name`, `version`) VALUES ('portfolio', 0);
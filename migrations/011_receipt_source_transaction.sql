@@ -0,0 +1,9 @@
+-- One receipt per ledger transaction
+--
+-- Receipt numbers are derived from the `transactions` row a receipt belongs
+-- to, and the write-behind worker relies on this key to drop a receipt that
+-- is delivered twice (queue and outbox sweep) instead of the random number
+-- receipts used to carry. NULL transaction ids (older receipts) are allowed.
+
+ALTER TABLE `transaction_receipts`
+  ADD UNIQUE KEY `unique_source_transaction` (`transaction_id`);
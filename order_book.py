@@ -0,0 +1,233 @@
+import heapq
+import logging
+import threading
+from decimal import Decimal
+
+# Import from root
+from services.trading_service import trading_service, BatchOrderError
+from services.portfolio_valuation import portfolio_valuation
+from services.receipt_service import receipt_service
+
+ORDER_TYPES = ('limit', 'stop')
+MAX_TRIGGER_PRICE = Decimal('99999999.99')  # open_orders.trigger_price is DECIMAL(10,2)
+
+# Rebuild a symbol's heaps once this many entries, and at least this share of them, are dead
+COMPACT_MIN_DEAD = 64
+COMPACT_DEAD_RATIO = 0.5
+
+def triggers_at_or_below(side, order_type):
+    """True if the order fires when the price falls to its trigger (buy limit, sell stop)"""
+    return (side == 'buy') == (order_type == 'limit')
+
+class OrderBook:
+    """Per-symbol resting orders kept in two heaps keyed by trigger price.
+
+    `below` holds orders that fire when the price drops to their trigger
+    (highest trigger on top), `above` those that fire when it rises to it
+    (lowest trigger on top). A price update only pops the orders it crosses;
+    everything else in the heaps is left untouched. Removed orders are
+    dropped lazily when they reach the top of their heap, and a symbol's
+    heaps are rebuilt once too many of their entries are dead, so orders
+    cancelled far from the price do not accumulate.
+    """
+
+    def __init__(self):
+        self._below = {}
+        self._above = {}
+        self._orders = {}
+        self._dead = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __contains__(self, order_id):
+        return order_id in self._orders
+
+    def symbols(self):
+        with self._lock:
+            return {order['symbol'] for order in self._orders.values()}
+
+    def add(self, order):
+        """Add an order dict with order_id, symbol, side, order_type and trigger_price"""
+        trigger = Decimal(str(order['trigger_price']))
+        with self._lock:
+            if order['order_id'] in self._orders:
+                return
+            self._orders[order['order_id']] = order
+            if triggers_at_or_below(order['side'], order['order_type']):
+                heapq.heappush(self._below.setdefault(order['symbol'], []), (-trigger, order['order_id']))
+            else:
+                heapq.heappush(self._above.setdefault(order['symbol'], []), (trigger, order['order_id']))
+
+    def remove(self, order_id):
+        with self._lock:
+            order = self._orders.pop(order_id, None)
+            if order:
+                symbol = order['symbol']
+                self._dead[symbol] = self._dead.get(symbol, 0) + 1
+                self._compact_if_needed(symbol)
+            return order
+
+    def heap_size(self, symbol):
+        """Live and dead heap entries held for `symbol`"""
+        with self._lock:
+            return len(self._below.get(symbol, ())) + len(self._above.get(symbol, ()))
+
+    def _compact_if_needed(self, symbol):
+        dead = self._dead.get(symbol, 0)
+        size = len(self._below.get(symbol, ())) + len(self._above.get(symbol, ()))
+        if dead < COMPACT_MIN_DEAD or dead < size * COMPACT_DEAD_RATIO:
+            return
+        for heaps in (self._below, self._above):
+            entries = [entry for entry in heaps.get(symbol, ()) if entry[1] in self._orders]
+            if entries:
+                heapq.heapify(entries)
+                heaps[symbol] = entries
+            else:
+                heaps.pop(symbol, None)
+        self._dead.pop(symbol, None)
+
+    def crossing(self, symbol, price):
+        """Pop and return every order on `symbol` that `price` triggers, best trigger first"""
+        price = Decimal(str(price))
+        triggered = []
+        with self._lock:
+            dead = self._dead.get(symbol, 0)
+            below = self._below.get(symbol, [])
+            while below and -below[0][0] >= price:
+                order = self._orders.pop(heapq.heappop(below)[1], None)
+                if order:
+                    triggered.append(order)
+                else:
+                    dead -= 1
+
+            above = self._above.get(symbol, [])
+            while above and above[0][0] <= price:
+                order = self._orders.pop(heapq.heappop(above)[1], None)
+                if order:
+                    triggered.append(order)
+                else:
+                    dead -= 1
+            self._dead[symbol] = max(dead, 0)
+        return triggered
+
+class OrderMatchingEngine:
+    """Matches resting limit/stop orders against the latest prices in `stocks`.
+
+    run_cycle() is called by the market data ingestion job after each price
+    refresh: it pulls orders placed or closed since the last cycle into the
+    in-memory book, then fills only the orders the current prices cross.
+    """
+
+    def __init__(self):
+        self.book = OrderBook()
+        self.last_order_id = 0
+        self.last_sync = None
+
+    def sync(self, cursor):
+        """Load newly placed orders and drop ones cancelled elsewhere (dictionary cursor)"""
+        cursor.execute("SELECT NOW() AS now")
+        now = cursor.fetchone()['now']
+
+        # Orders created shortly before the last sync are re-read in case their
+        # insert committed after a higher order_id did; add() ignores duplicates
+        cursor.execute("""
+            SELECT order_id, user_id, symbol, side, order_type, quantity, trigger_price, account_type
+            FROM open_orders
+            WHERE status = 'open'
+              AND (order_id > %s OR created_at >= %s - INTERVAL 1 MINUTE)
+            ORDER BY order_id
+        """, (self.last_order_id, self.last_sync or now))
+        for order in cursor.fetchall():
+            self.book.add(order)
+            self.last_order_id = max(self.last_order_id, order['order_id'])
+
+        if self.last_sync is not None:
+            cursor.execute("""
+                SELECT order_id FROM open_orders
+                WHERE status <> 'open' AND updated_at >= %s
+            """, (self.last_sync,))
+            for row in cursor.fetchall():
+                self.book.remove(row['order_id'])
+        self.last_sync = now
+
+    def run_cycle(self, conn):
+        """Sync the book and fill every order crossed by the current prices; returns fills"""
+        cursor = conn.cursor(dictionary=True, buffered=True)
+        try:
+            self.sync(cursor)
+            conn.commit()
+
+            symbols = sorted(self.book.symbols())
+            if not symbols:
+                return 0
+
+            placeholders = ', '.join(['%s'] * len(symbols))
+            cursor.execute(f"""
+                SELECT symbol, current_price FROM stocks
+                WHERE symbol IN ({placeholders}) AND current_price IS NOT NULL
+            """, symbols)
+            prices = {row['symbol']: Decimal(str(row['current_price'])) for row in cursor.fetchall()}
+            conn.commit()
+
+            filled = 0
+            for symbol, price in prices.items():
+                for order in self.book.crossing(symbol, price):
+                    if self.fill(conn, cursor, order, price):
+                        filled += 1
+            return filled
+        finally:
+            cursor.close()
+
+    def fill(self, conn, cursor, order, price):
+        """Execute one triggered order in its own transaction; True if it filled"""
+        try:
+            cursor.execute(
+                "SELECT status FROM open_orders WHERE order_id = %s FOR UPDATE",
+                (order['order_id'],)
+            )
+            row = cursor.fetchone()
+            if not row or row['status'] != 'open':
+                conn.rollback()
+                return False
+
+            _, receipts = trading_service.execute_batch(cursor, order['user_id'], [{
+                'index': 0,
+                'symbol': order['symbol'],
+                'side': order['side'],
+                'quantity': Decimal(str(order['quantity'])),
+                'account_type': order['account_type'],
+                'order_type': order['order_type']
+            }], {order['symbol']: {'price': price, 'source': 'stocks_table'}})
+
+            cursor.execute("""
+                UPDATE open_orders SET status = 'filled', fill_price = %s
+                WHERE order_id = %s
+            """, (float(price), order['order_id']))
+            # Fills run in the ingest process; the shared version reaches the web workers' caches
+            portfolio_valuation.bump_version(cursor)
+            conn.commit()
+            portfolio_valuation.invalidate(order['user_id'])
+            receipt_service.publish(*receipts)
+            return True
+
+        except BatchOrderError as e:
+            conn.rollback()
+            reason = next(iter(e.errors.values()))
+            cursor.execute("""
+                UPDATE open_orders SET status = 'rejected', status_reason = %s
+                WHERE order_id = %s AND status = 'open'
+            """, (reason[:255], order['order_id']))
+            conn.commit()
+            logging.warning(f"Order {order['order_id']} rejected at {price}: {reason}")
+            return False
+        except Exception as e:
+            conn.rollback()
+            # Leave it open and retry on the next cycle
+            self.book.add(order)
+            logging.error(f"Failed to fill order {order['order_id']}: {e}")
+            return False
+
+# Global order matching engine instance
+order_engine = OrderMatchingEngine()
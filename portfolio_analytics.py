@@ -0,0 +1,184 @@
+import datetime
+
+import numpy as np
+
+from services.price_history import price_history
+
+TRADING_DAYS_PER_YEAR = 252
+
+class PortfolioAnalyticsService:
+    """Portfolio performance metrics computed with NumPy over whole trade histories.
+
+    Trades and price observations are loaded as column arrays and turned into
+    a (business day x symbol) position and price matrix in bulk, so the cost
+    is a handful of array operations rather than a Python loop per trade/day.
+    """
+
+    def load_trades(self, cursor, user_id):
+        """A user's completed trades as column arrays (plain, non-dictionary cursor)"""
+        cursor.execute("""
+            SELECT symbol, type, quantity, price, total_amount, created_at
+            FROM stock_transactions
+            WHERE user_id = %s AND status = 'completed'
+            ORDER BY created_at, transaction_id
+        """, (user_id,))
+        rows = cursor.fetchall()
+        if not rows:
+            return None
+
+        symbol, tx_type, quantity, price, total_amount, created_at = zip(*rows)
+        sign = np.where(np.array(tx_type) == 'buy', 1.0, -1.0)
+        return {
+            'day': np.array(created_at, dtype='datetime64[D]'),
+            'symbol': np.array(symbol),
+            'quantity': np.array(quantity, dtype=float) * sign,
+            'price': np.array(price, dtype=float),
+            'flow': np.array(total_amount, dtype=float) * sign
+        }
+
+    def load_prices(self, cursor, symbols, since):
+        """Daily price observations for `symbols` since `since` (plain cursor).
+
+        Uses the 1d close from the price history bars plus the latest price
+        in `stocks`.
+        """
+        symbols = [str(s) for s in symbols]
+        rows = price_history.get_daily_closes(cursor, symbols, since)
+
+        placeholders = ', '.join(['%s'] * len(symbols))
+        cursor.execute(f"""
+            SELECT symbol, last_updated, current_price
+            FROM stocks
+            WHERE symbol IN ({placeholders}) AND current_price IS NOT NULL AND last_updated IS NOT NULL
+        """, symbols)
+        rows = list(rows) + cursor.fetchall()
+
+        if not rows:
+            return {'day': np.array([], dtype='datetime64[D]'), 'symbol': np.array([], dtype=str),
+                    'price': np.array([], dtype=float)}
+
+        symbol, day, price = zip(*rows)
+        return {
+            'day': np.array(day, dtype='datetime64[D]'),
+            'symbol': np.array(symbol),
+            'price': np.array(price, dtype=float)
+        }
+
+    def compute(self, trades, prices, as_of=None):
+        """Daily returns, volatility, max drawdown and allocation for one trade history.
+
+        `trades` holds day/symbol/quantity (signed)/price/flow (signed cash)
+        arrays and `prices` day/symbol/price observations. Prices are
+        forward-filled across business days; returns are time-weighted so
+        buys and sells are not counted as performance.
+        """
+        as_of = np.datetime64(as_of or datetime.date.today(), 'D')
+        symbols, trade_sym = np.unique(trades['symbol'], return_inverse=True)
+
+        # Business-day axis from the first trade to as_of
+        start = np.busday_offset(trades['day'].min(), 0, roll='forward')
+        end = np.busday_offset(as_of, 0, roll='backward')
+        days = np.arange(start, max(start, end) + 1, dtype='datetime64[D]')
+        days = days[np.is_busday(days)]
+        n_days, n_symbols = len(days), len(symbols)
+
+        def day_index(values):
+            rolled = np.busday_offset(values, 0, roll='forward')
+            return np.clip(np.searchsorted(days, rolled), 0, n_days - 1)
+
+        trade_day = day_index(trades['day'])
+
+        # Positions and external cash flows per day
+        deltas = np.zeros((n_days, n_symbols))
+        np.add.at(deltas, (trade_day, trade_sym), trades['quantity'])
+        positions = np.cumsum(deltas, axis=0)
+        positions[np.abs(positions) < 1e-9] = 0.0
+
+        flows = np.zeros(n_days)
+        np.add.at(flows, trade_day, trades['flow'])
+
+        # Price matrix from trade prices and the extra observations, oldest first so newer wins
+        obs_day = np.concatenate([trades['day'], prices['day']])
+        obs_symbol = np.concatenate([trades['symbol'], prices['symbol'].astype(trades['symbol'].dtype)])
+        obs_price = np.concatenate([trades['price'], prices['price']])
+        # Undated or unpriced observations (NaT / NaN) would turn every metric into NaN
+        known = np.isin(obs_symbol, symbols) & ~np.isnat(obs_day) & ~np.isnan(obs_price)
+        obs_day, obs_symbol, obs_price = obs_day[known], obs_symbol[known], obs_price[known]
+        order = np.argsort(obs_day, kind='stable')
+
+        price_matrix = np.full((n_days, n_symbols), np.nan)
+        price_matrix[day_index(obs_day[order]), np.searchsorted(symbols, obs_symbol[order])] = obs_price[order]
+        price_matrix = self.forward_fill(price_matrix)
+
+        holding_values = np.where(positions != 0, positions * np.nan_to_num(price_matrix), 0.0)
+        values = holding_values.sum(axis=1)
+
+        # Time-weighted daily returns: r_t = (V_t - flow_t) / V_{t-1} - 1
+        previous = values[:-1]
+        valid = previous > 0
+        returns = np.zeros(n_days - 1)
+        np.divide(values[1:] - flows[1:], previous, out=returns, where=valid)
+        returns = np.where(valid, returns - 1, 0.0)
+
+        growth = np.concatenate([[1.0], np.cumprod(1 + returns)])
+        drawdowns = growth / np.maximum.accumulate(growth) - 1
+        trough = int(np.argmin(drawdowns))
+        peak = int(np.argmax(growth[:trough + 1]))
+
+        active_returns = returns[valid]
+        volatility = float(np.std(active_returns, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR)) if len(active_returns) > 1 else 0.0
+
+        current = holding_values[-1]
+        total_value = current.sum()
+        weights = current / total_value if total_value > 0 else np.zeros(n_symbols)
+        held = current != 0
+
+        return {
+            'as_of': str(days[-1]),
+            'trade_count': int(len(trade_day)),
+            'current_value': float(total_value),
+            'net_invested': float(flows.sum()),
+            'total_return': float(growth[-1] - 1),
+            'mean_daily_return': float(active_returns.mean()) if len(active_returns) else 0.0,
+            'annualized_volatility': volatility,
+            'max_drawdown': float(drawdowns[trough]),
+            'max_drawdown_peak': str(days[peak]),
+            'max_drawdown_trough': str(days[trough]),
+            'allocation': {
+                str(symbol): float(weight) for symbol, weight in zip(symbols[held], weights[held])
+            },
+            'series': {
+                'dates': days[1:],
+                'daily_returns': returns,
+                'values': values[1:]
+            }
+        }
+
+    @staticmethod
+    def forward_fill(matrix):
+        """Carry the last non-NaN value down each column"""
+        rows = np.where(~np.isnan(matrix), np.arange(matrix.shape[0])[:, None], 0)
+        np.maximum.accumulate(rows, axis=0, out=rows)
+        return matrix[rows, np.arange(matrix.shape[1])]
+
+    def get_analytics(self, cursor, user_id, series_days=90):
+        """Load a user's history and compute analytics; None if they have never traded"""
+        trades = self.load_trades(cursor, user_id)
+        if trades is None:
+            return None
+
+        since = trades['day'].min().astype(object)
+        prices = self.load_prices(cursor, np.unique(trades['symbol']), since)
+        result = self.compute(trades, prices)
+
+        # Compact array-encoded series for the last `series_days` business days
+        series = result['series']
+        result['series'] = {
+            'dates': [str(day) for day in series['dates'][-series_days:]],
+            'daily_returns': np.round(series['daily_returns'][-series_days:], 6).tolist(),
+            'values': np.round(series['values'][-series_days:], 2).tolist()
+        }
+        return result
+
+# Global portfolio analytics instance
+portfolio_analytics = PortfolioAnalyticsService()
@@ -0,0 +1,75 @@
+"""Throughput benchmark for the vectorized portfolio analytics engine.
+
+Generates synthetic trade histories (no database needed) and times
+PortfolioAnalyticsService.compute on them.
+
+    python portfolio_analytics_benchmark.py                  # 10k trades
+    python portfolio_analytics_benchmark.py --trades 50000 --symbols 40
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.portfolio_analytics import portfolio_analytics
+
+def make_history(n_trades, n_symbols, years, seed=42):
+    """Random buy/sell history over `years` of business days with random-walk prices"""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2015-01-01')
+    days = np.arange(start, start + int(years * 365), dtype='datetime64[D]')
+    days = days[np.is_busday(days)]
+    symbols = np.array([f'SYM{i:03d}' for i in range(n_symbols)])
+
+    # Daily close per symbol
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, (len(days), n_symbols)), axis=0))
+
+    trade_day = np.sort(rng.integers(0, len(days), n_trades))
+    trade_sym = rng.integers(0, n_symbols, n_trades)
+    quantity = rng.integers(1, 50, n_trades).astype(float)
+    # Mostly buys, so sells never exceed the position on average
+    quantity[rng.random(n_trades) < 0.3] *= -0.5
+    price = closes[trade_day, trade_sym]
+
+    trades = {
+        'day': days[trade_day],
+        'symbol': symbols[trade_sym],
+        'quantity': quantity,
+        'price': price,
+        'flow': quantity * price
+    }
+    prices = {
+        'day': np.repeat(days, n_symbols),
+        'symbol': np.tile(symbols, len(days)),
+        'price': closes.ravel()
+    }
+    return trades, prices, days[-1]
+
+def run(n_trades, n_symbols, years, repeat):
+    trades, prices, as_of = make_history(n_trades, n_symbols, years)
+    portfolio_analytics.compute(trades, prices, as_of)  # warm up
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = portfolio_analytics.compute(trades, prices, as_of)
+        timings.append(time.perf_counter() - started)
+
+    best = min(timings)
+    print(f"{n_trades} trades, {n_symbols} symbols, {len(prices['price'])} price points, "
+          f"{len(result['series']['dates']) + 1} business days")
+    print(f"best {best * 1000:.1f} ms, median {np.median(timings) * 1000:.1f} ms "
+          f"({n_trades / best:,.0f} trades/s)")
+    print(f"total_return={result['total_return']:.4f} "
+          f"volatility={result['annualized_volatility']:.4f} "
+          f"max_drawdown={result['max_drawdown']:.4f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='NexaBank portfolio analytics benchmark')
+    parser.add_argument('--trades', type=int, default=10000, help='trades in the synthetic history')
+    parser.add_argument('--symbols', type=int, default=20, help='distinct symbols traded')
+    parser.add_argument('--years', type=float, default=5, help='length of the history in years')
+    parser.add_argument('--repeat', type=int, default=10, help='timed runs')
+    args = parser.parse_args()
+
+    run(args.trades, args.symbols, args.years, args.repeat)
@@ -0,0 +1,144 @@
+import threading
+import time
+from decimal import Decimal
+
+# Import from root
+from stock_config import StockConfig
+
+class PortfolioCache:
+    """Short-lived per-user cache of the formatted portfolio and its summary.
+
+    Each entry remembers the cache_versions value it was loaded under and is
+    only served while that version is current, so a revaluation or fill
+    committed by any process drops it. Trades invalidate the user's entry in
+    the process that ran them; the TTL bounds staleness in the others.
+    """
+
+    def __init__(self, ttl=10):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            value, entry_version, expires_at = entry
+            if entry_version != version or expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            return value
+
+    def put(self, user_id, value, version):
+        with self._lock:
+            self._entries[user_id] = (value, version, time.monotonic() + self.ttl)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+class PortfolioValuationService:
+    """Keeps stock_portfolios.current_value / unrealized_pnl in line with stocks.current_price"""
+
+    def __init__(self):
+        self.config = StockConfig()
+        self.cache = PortfolioCache(self.config.PORTFOLIO_CACHE_TTL)
+
+    def revalue_symbols(self, cursor, symbols):
+        """Revalue every holding of `symbols` in one set-based UPDATE ... JOIN.
+
+        Runs in the caller's transaction; rows whose value did not change are
+        not touched. Any revaluation bumps the shared cache version, and the
+        caller should also invalidate() its own process once committed.
+        Returns the number of holdings revalued.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return 0
+        placeholders = ', '.join(['%s'] * len(symbols))
+        cursor.execute(f"""
+            UPDATE stock_portfolios sp
+            JOIN stocks s ON s.symbol = sp.symbol
+            SET sp.current_value = ROUND(sp.quantity * s.current_price, 2),
+                sp.unrealized_pnl = ROUND(sp.quantity * s.current_price, 2) - sp.total_invested,
+                sp.updated_at = sp.updated_at
+            WHERE sp.symbol IN ({placeholders})
+              AND s.current_price IS NOT NULL
+              AND (sp.current_value IS NULL
+                   OR sp.current_value <> ROUND(sp.quantity * s.current_price, 2))
+        """, symbols)
+        revalued = cursor.rowcount
+        if revalued:
+            self.bump_version(cursor)
+        return revalued
+
+    def bump_version(self, cursor):
+        """Make every process drop its cached portfolios once the caller commits"""
+        cursor.execute("UPDATE cache_versions SET version = version + 1 WHERE name = 'portfolio'")
+
+    def current_version(self, cursor):
+        """The shared cache version cached portfolios are checked against (dictionary cursor)"""
+        cursor.execute("SELECT version FROM cache_versions WHERE name = 'portfolio'")
+        row = cursor.fetchone()
+        return row['version'] if row else None
+
+    def invalidate(self, user_id=None):
+        """Drop cached portfolios after a trade (one user) or a revaluation (everyone)"""
+        self.cache.invalidate(user_id)
+
+    def load_portfolio(self, cursor, user_id):
+        """Read a user's materialized holdings and summarize them (dictionary cursor)"""
+        cursor.execute("""
+            SELECT sp.portfolio_id, sp.user_id, sp.symbol, s.company_name,
+                   sp.quantity, sp.average_price, sp.total_invested,
+                   sp.current_value, sp.unrealized_pnl, sp.created_at, sp.updated_at,
+                   s.last_updated AS valued_at
+            FROM stock_portfolios sp
+            JOIN stocks s ON sp.symbol = s.symbol
+            WHERE sp.user_id = %s
+        """, (user_id,))
+
+        formatted_portfolio = []
+        total_invested = Decimal('0')
+        total_current_value = Decimal('0')
+
+        for item in cursor.fetchall():
+            current_value = Decimal(str(item['current_value'] or 0))
+            total_invested += Decimal(str(item['total_invested']))
+            total_current_value += current_value
+
+            formatted_portfolio.append({
+                'portfolio_id': item['portfolio_id'],
+                'user_id': item['user_id'],
+                'symbol': item['symbol'],
+                'company_name': item['company_name'],
+                'quantity': float(item['quantity']),
+                'average_price': float(item['average_price']),
+                'total_invested': float(item['total_invested']),
+                'current_value': float(current_value),
+                'unrealized_pnl': float(item['unrealized_pnl'] or 0),
+                'created_at': item['created_at'].isoformat() if item['created_at'] else None,
+                'updated_at': item['updated_at'].isoformat() if item['updated_at'] else None,
+                'valued_at': item['valued_at'].isoformat() if item['valued_at'] else None
+            })
+
+        total_pnl = total_current_value - total_invested
+        total_pnl_percent = (total_pnl / total_invested * 100) if total_invested > 0 else 0
+
+        return {
+            'portfolio': formatted_portfolio,
+            'summary': {
+                'total_invested': float(total_invested),
+                'total_current_value': float(total_current_value),
+                'total_unrealized_pnl': float(total_pnl),
+                'total_pnl_percent': float(total_pnl_percent),
+                'stock_count': len(formatted_portfolio)
+            }
+        }
+
+# Global portfolio valuation instance
+portfolio_valuation = PortfolioValuationService()
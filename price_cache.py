@@ -0,0 +1,98 @@
+import threading
+import time
+import logging
+
+class PriceCache:
+    """Process-wide cache for a single price snapshot.
+
+    - Fresh values (younger than `ttl`) are served directly.
+    - Stale values (younger than `max_stale`) are served immediately while a
+      refresh runs in the background (stale-while-revalidate).
+    - Concurrent callers share one in-flight fetch instead of each fetching.
+    - An optional background thread keeps the snapshot warm.
+    """
+
+    def __init__(self, fetch_fn, ttl=30, max_stale=300, refresh_interval=None, name='prices'):
+        self.fetch_fn = fetch_fn
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.refresh_interval = refresh_interval
+        self.name = name
+
+        self._value = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._inflight = None        # threading.Event for the fetch in progress
+        self._refresher = None
+
+    def _age(self):
+        return time.monotonic() - self._fetched_at
+
+    def _fetch(self):
+        """Run fetch_fn, coalescing concurrent callers onto a single request"""
+        with self._lock:
+            inflight = self._inflight
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight = threading.Event()
+
+        if not leader:
+            inflight.wait()
+            return self._value
+
+        try:
+            value = self.fetch_fn()
+            with self._lock:
+                self._value = value
+                self._fetched_at = time.monotonic()
+        except Exception as e:
+            logging.error(f"Failed to refresh {self.name}: {e}")
+        finally:
+            with self._lock:
+                self._inflight = None
+            inflight.set()
+
+        return self._value
+
+    def _refresh_async(self):
+        with self._lock:
+            if self._inflight is not None:
+                return
+        threading.Thread(target=self._fetch, daemon=True).start()
+
+    def get(self):
+        """Get the cached value, fetching or revalidating as needed"""
+        self.start_refresher()
+
+        value = self._value
+        if value is not None:
+            age = self._age()
+            if age < self.ttl:
+                return value
+            if age < self.max_stale:
+                self._refresh_async()
+                return value
+
+        return self._fetch()
+
+    def invalidate(self):
+        with self._lock:
+            self._fetched_at = 0.0
+
+    def start_refresher(self):
+        """Start the single background refresh thread (no-op if running or disabled)"""
+        if not self.refresh_interval or self._refresher is not None:
+            return
+        with self._lock:
+            if self._refresher is not None:
+                return
+            self._refresher = threading.Thread(
+                target=self._refresh_loop, name=f'{self.name}-refresher', daemon=True
+            )
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            if self._age() >= self.refresh_interval:
+                self._fetch()
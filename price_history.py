@@ -0,0 +1,114 @@
+import calendar
+import datetime
+
+# Bar intervals and their length in seconds
+INTERVALS = {
+    '1m': 60,
+    '1h': 3600,
+    '1d': 86400
+}
+
+def utc_now():
+    """Naive UTC timestamp, as stored in the price history tables"""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+def bucket_start(at, interval):
+    """Start of the `interval` bar containing `at`"""
+    seconds = INTERVALS[interval]
+    epoch = calendar.timegm(at.timetuple())
+    return at.replace(microsecond=0) - datetime.timedelta(seconds=epoch % seconds)
+
+class PriceHistoryService:
+    """Append-only price ticks plus incrementally maintained OHLC bars"""
+
+    def record_ticks(self, cursor, ticks, source='ingest', recorded_at=None):
+        """Append ticks and fold them into the 1m/1h/1d bars, in the caller's transaction.
+
+        `ticks` is a list of (symbol, price). Bars are upserted assuming ticks
+        arrive in time order: the first tick of a bucket sets `open`, later
+        ones move `high`/`low` and replace `close`.
+        """
+        if not ticks:
+            return
+        recorded_at = recorded_at or utc_now()
+
+        tick_rows = []
+        tick_params = []
+        for symbol, price in ticks:
+            tick_rows.append("(%s, %s, %s, %s)")
+            tick_params.extend([symbol, float(price), source, recorded_at])
+
+        cursor.execute(f"""
+            INSERT INTO stock_price_ticks (symbol, price, source, recorded_at)
+            VALUES {', '.join(tick_rows)}
+        """, tick_params)
+
+        bar_rows = []
+        bar_params = []
+        for interval in INTERVALS:
+            start = bucket_start(recorded_at, interval)
+            for symbol, price in ticks:
+                bar_rows.append("(%s, %s, %s, %s, %s, %s, %s, 1)")
+                bar_params.extend([symbol, interval, start] + [float(price)] * 4)
+
+        cursor.execute(f"""
+            INSERT INTO stock_price_bars
+            (symbol, `interval`, bucket_start, open, high, low, close, tick_count)
+            VALUES {', '.join(bar_rows)}
+            ON DUPLICATE KEY UPDATE
+            high = GREATEST(high, VALUES(high)),
+            low = LEAST(low, VALUES(low)),
+            close = VALUES(close),
+            tick_count = tick_count + 1
+        """, bar_params)
+
+    def get_bars(self, cursor, symbol, interval, limit, since=None, until=None):
+        """Latest `limit` bars (oldest first) as array-encoded columns (plain cursor).
+
+        Returns {'t': [...epoch seconds], 'o': [...], 'h': [...], 'l': [...],
+        'c': [...], 'n': [...tick counts]}.
+        """
+        where = ["symbol = %s", "`interval` = %s"]
+        params = [symbol, interval]
+        if since:
+            where.append("bucket_start >= %s")
+            params.append(since)
+        if until:
+            where.append("bucket_start < %s")
+            params.append(until)
+        params.append(limit)
+
+        cursor.execute(f"""
+            SELECT bucket_start, open, high, low, close, tick_count
+            FROM stock_price_bars
+            WHERE {' AND '.join(where)}
+            ORDER BY bucket_start DESC
+            LIMIT %s
+        """, params)
+        rows = cursor.fetchall()
+        rows.reverse()
+
+        return {
+            't': [calendar.timegm(row[0].timetuple()) for row in rows],
+            'o': [float(row[1]) for row in rows],
+            'h': [float(row[2]) for row in rows],
+            'l': [float(row[3]) for row in rows],
+            'c': [float(row[4]) for row in rows],
+            'n': [row[5] for row in rows]
+        }
+
+    def get_daily_closes(self, cursor, symbols, since):
+        """(symbol, day, close) rows from the 1d bars (plain cursor)"""
+        symbols = list(symbols)
+        if not symbols:
+            return []
+        placeholders = ', '.join(['%s'] * len(symbols))
+        cursor.execute(f"""
+            SELECT symbol, bucket_start, close
+            FROM stock_price_bars
+            WHERE symbol IN ({placeholders}) AND `interval` = '1d' AND bucket_start >= %s
+        """, symbols + [since])
+        return cursor.fetchall()
+
+# Global price history instance
+price_history = PriceHistoryService()
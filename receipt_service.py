@@ -1,239 +1,232 @@
-import random
-import string
+import json
+import logging
+import queue
+import threading
+import time
 from datetime import datetime
-from config import get_db_connection
+from config import Config, get_db_connection
+
+RECEIPT_COLUMNS = (
+    'transaction_id', 'user_id', 'receipt_type', 'receipt_number', 'amount', 'currency',
+    'description', 'from_account', 'to_account', 'transaction_date', 'metadata'
+)
 
 class ReceiptService:
+    """Write-behind receipt generation.
+
+    Money-moving endpoints stage a receipt in `receipt_outbox` inside their own
+    transaction and hand it to publish() after committing. A background worker
+    drains the in-process queue and batch-inserts `transaction_receipts`;
+    outbox rows it never got to (crash, DB error) are replayed by its sweep.
+    Every receipt belongs to one ledger `transactions` row and its number is
+    derived from that id, so numbers never collide and a receipt delivered
+    twice is written once.
+    """
+
     def __init__(self):
-        pass
-    
-    def generate_receipt_number(self, prefix='RCP'):
-        """Generate unique receipt number"""
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        random_str = ''.join(random.choices(string.digits, k=6))
-        return f"{prefix}{timestamp}{random_str}"
-    
-    def create_deposit_receipt(self, user_id, amount, account_number, description, transaction_id=None):
-        """Create receipt for deposit transaction"""
-        conn = get_db_connection()
-        if not conn:
-            return None
-            
-        try:
-            cursor = conn.cursor(dictionary=True, buffered=True)
-            
-            receipt_number = self.generate_receipt_number('DEP')
-            
-            cursor.execute("""
-                INSERT INTO transaction_receipts 
-                (transaction_id, user_id, receipt_type, receipt_number, amount, description, to_account, metadata)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                transaction_id,
-                user_id,
-                'deposit',
-                receipt_number,
-                float(amount),
-                description,
-                account_number,
-                '{"type": "cash_deposit", "status": "completed"}'
-            ))
-            
-            receipt_id = cursor.lastrowid
-            conn.commit()
-            
-            return self.get_receipt_by_id(receipt_id)
-            
-        except Exception as e:
-            conn.rollback()
-            print(f"Failed to create deposit receipt: {e}")
-            return None
-        finally:
-            cursor.close()
-            conn.close()
-    
-    def create_withdrawal_receipt(self, user_id, amount, account_number, description, transaction_id=None):
-        """Create receipt for withdrawal transaction"""
-        conn = get_db_connection()
-        if not conn:
-            return None
-            
-        try:
-            cursor = conn.cursor(dictionary=True, buffered=True)
-            
-            receipt_number = self.generate_receipt_number('WDL')
-            
-            cursor.execute("""
-                INSERT INTO transaction_receipts 
-                (transaction_id, user_id, receipt_type, receipt_number, amount, description, from_account, metadata)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                transaction_id,
-                user_id,
-                'withdrawal',
-                receipt_number,
-                float(amount),
-                description,
-                account_number,
-                '{"type": "cash_withdrawal", "status": "completed"}'
-            ))
-            
-            receipt_id = cursor.lastrowid
-            conn.commit()
-            
-            return self.get_receipt_by_id(receipt_id)
-            
-        except Exception as e:
-            conn.rollback()
-            print(f"Failed to create withdrawal receipt: {e}")
-            return None
-        finally:
-            cursor.close()
-            conn.close()
-    
-    def create_transfer_receipt(self, user_id, amount, from_account, to_account, description, transaction_id=None):
-        """Create receipt for transfer transaction"""
-        conn = get_db_connection()
-        if not conn:
-            return None
-            
-        try:
-            cursor = conn.cursor(dictionary=True, buffered=True)
-            
-            receipt_number = self.generate_receipt_number('TRF')
-            
-            cursor.execute("""
-                INSERT INTO transaction_receipts 
-                (transaction_id, user_id, receipt_type, receipt_number, amount, description, from_account, to_account, metadata)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                transaction_id,
-                user_id,
-                'transfer',
-                receipt_number,
-                float(amount),
-                description,
-                from_account,
-                to_account,
-                '{"type": "account_transfer", "status": "completed"}'
-            ))
-            
-            receipt_id = cursor.lastrowid
-            conn.commit()
-            
-            return self.get_receipt_by_id(receipt_id)
-            
-        except Exception as e:
-            conn.rollback()
-            print(f"Failed to create transfer receipt: {e}")
-            return None
-        finally:
-            cursor.close()
-            conn.close()
-    
-    def create_crypto_funding_receipt(self, user_id, crypto_amount, usd_amount, currency, account_number, request_id=None):
-        """Create receipt for crypto funding"""
-        conn = get_db_connection()
-        if not conn:
-            return None
-            
-        try:
-            cursor = conn.cursor(dictionary=True, buffered=True)
-            
-            receipt_number = self.generate_receipt_number('CRP')
-            
-            cursor.execute("""
-                INSERT INTO transaction_receipts 
-                (user_id, receipt_type, receipt_number, amount, currency, description, to_account, metadata)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                user_id,
-                'crypto_funding',
-                receipt_number,
-                float(usd_amount),
-                'USD',
-                f'Crypto funding: {crypto_amount} {currency}',
-                account_number,
-                f'{{"type": "crypto_funding", "crypto_amount": {crypto_amount}, "currency": "{currency}", "request_id": {request_id}, "status": "completed"}}'
-            ))
-            
-            receipt_id = cursor.lastrowid
-            conn.commit()
-            
-            return self.get_receipt_by_id(receipt_id)
-            
-        except Exception as e:
-            conn.rollback()
-            print(f"Failed to create crypto funding receipt: {e}")
-            return None
-        finally:
-            cursor.close()
-            conn.close()
-    
-    def create_stock_trade_receipt(self, user_id, symbol, quantity, price, total_amount, trade_type, transaction_id=None):
-        """Create receipt for stock trade"""
+        self.batch_size = Config.RECEIPT_BATCH_SIZE
+        self.sweep_interval = Config.RECEIPT_SWEEP_INTERVAL
+        self.outbox_grace = Config.RECEIPT_OUTBOX_GRACE
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def generate_receipt_number(self, prefix, transaction_id):
+        """Receipt number for the ledger transaction a receipt belongs to"""
+        return f"{prefix}{int(transaction_id):010d}"
+
+    def build_receipt(self, receipt_type, prefix, user_id, amount, description, metadata,
+                      transaction_id, from_account=None, to_account=None, currency='USD'):
+        """Receipt row for ledger transaction `transaction_id` (not yet staged)"""
+        return {
+            'transaction_id': transaction_id,
+            'user_id': user_id,
+            'receipt_type': receipt_type,
+            'receipt_number': self.generate_receipt_number(prefix, transaction_id),
+            'amount': float(amount),
+            'currency': currency,
+            'description': description,
+            'from_account': from_account,
+            'to_account': to_account,
+            'transaction_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'metadata': json.dumps(dict(metadata, status='completed'))
+        }
+
+    def stage(self, cursor, receipts):
+        """Write built receipts to the outbox in the caller's transaction; returns them with outbox ids"""
+        if not receipts:
+            return receipts
+        cursor.executemany("""
+            INSERT INTO receipt_outbox (receipt_number, payload)
+            VALUES (%s, %s)
+        """, [(receipt['receipt_number'], json.dumps(receipt)) for receipt in receipts])
+
+        # One multi-row INSERT gets consecutive ids starting at lastrowid
+        for offset, receipt in enumerate(receipts):
+            receipt['outbox_id'] = cursor.lastrowid + offset
+        return receipts
+
+    def stage_receipt(self, cursor, *args, **kwargs):
+        """Build and stage a single receipt; takes build_receipt's arguments"""
+        return self.stage(cursor, [self.build_receipt(*args, **kwargs)])[0]
+
+    def create_deposit_receipt(self, cursor, user_id, amount, account_number, description, transaction_id):
+        """Stage receipt for deposit transaction"""
+        return self.stage_receipt(
+            cursor, 'deposit', 'DEP', user_id, amount, description,
+            {'type': 'cash_deposit'},
+            transaction_id, to_account=account_number
+        )
+
+    def create_withdrawal_receipt(self, cursor, user_id, amount, account_number, description, transaction_id):
+        """Stage receipt for withdrawal transaction"""
+        return self.stage_receipt(
+            cursor, 'withdrawal', 'WDL', user_id, amount, description,
+            {'type': 'cash_withdrawal'},
+            transaction_id, from_account=account_number
+        )
+
+    def create_transfer_receipt(self, cursor, user_id, amount, from_account, to_account, description, transaction_id):
+        """Stage receipt for transfer transaction (keyed on the sender's ledger row)"""
+        return self.stage_receipt(
+            cursor, 'transfer', 'TRF', user_id, amount, description,
+            {'type': 'account_transfer'},
+            transaction_id, from_account=from_account, to_account=to_account
+        )
+
+    def create_crypto_funding_receipt(self, cursor, user_id, crypto_amount, usd_amount, currency, account_number,
+                                      transaction_id, request_id=None):
+        """Stage receipt for crypto funding"""
+        return self.stage_receipt(
+            cursor, 'crypto_funding', 'CRP', user_id, usd_amount,
+            f'Crypto funding: {crypto_amount} {currency}',
+            {'type': 'crypto_funding', 'crypto_amount': float(crypto_amount), 'currency': currency, 'request_id': request_id},
+            transaction_id, to_account=account_number
+        )
+
+    def stock_trade_receipt(self, user_id, symbol, quantity, price, total_amount, trade_type, transaction_id):
+        """Build (not stage) the receipt for a stock trade's bank leg"""
+        return self.build_receipt(
+            'stock_trade', 'STK', user_id, total_amount,
+            f'Stock {trade_type}: {quantity} shares of {symbol}',
+            {'type': 'stock_trade', 'symbol': symbol, 'quantity': float(quantity),
+             'price_per_share': float(price), 'trade_type': trade_type},
+            transaction_id
+        )
+
+    def create_stock_trade_receipt(self, cursor, user_id, symbol, quantity, price, total_amount, trade_type, transaction_id):
+        """Stage receipt for stock trade"""
+        return self.stage(cursor, [
+            self.stock_trade_receipt(user_id, symbol, quantity, price, total_amount, trade_type, transaction_id)
+        ])[0]
+
+    def publish(self, *receipts):
+        """Queue staged receipts for the worker; call only after the staging transaction committed"""
+        self.start_worker()
+        for receipt in receipts:
+            self._queue.put(receipt)
+
+    def start_worker(self):
+        """Start the single background writer thread (no-op if running)"""
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is not None:
+                return
+            self._worker = threading.Thread(target=self._run, name='receipt-writer', daemon=True)
+        self._worker.start()
+
+    def _run(self):
+        # Replay whatever a previous process left in the outbox before taking new work
+        next_sweep = time.monotonic()
+        while True:
+            if time.monotonic() >= next_sweep:
+                self.sweep_outbox()
+                next_sweep = time.monotonic() + self.sweep_interval
+
+            try:
+                batch = [self._queue.get(timeout=max(0.0, next_sweep - time.monotonic()))]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # A failed batch stays in the outbox and is picked up by the next sweep
+            self.write_receipts(batch)
+
+    def write_receipts(self, receipts):
+        """Insert a batch of receipts and clear their outbox rows in one transaction"""
         conn = get_db_connection()
         if not conn:
-            return None
-            
+            logging.error(f"Receipt writer could not get a connection; {len(receipts)} receipts left in outbox")
+            return False
+
         try:
-            cursor = conn.cursor(dictionary=True, buffered=True)
-            
-            receipt_number = self.generate_receipt_number('STK')
-            
-            cursor.execute("""
-                INSERT INTO transaction_receipts 
-                (transaction_id, user_id, receipt_type, receipt_number, amount, description, metadata)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (
-                transaction_id,
-                user_id,
-                'stock_trade',
-                receipt_number,
-                float(total_amount),
-                f'Stock {trade_type}: {quantity} shares of {symbol}',
-                f'{{"type": "stock_trade", "symbol": "{symbol}", "quantity": {quantity}, "price_per_share": {price}, "trade_type": "{trade_type}", "status": "completed"}}'
-            ))
-            
-            receipt_id = cursor.lastrowid
+            cursor = conn.cursor()
+
+            # transaction_id is unique, so a receipt delivered twice (queue and sweep) is written once
+            cursor.executemany(f"""
+                INSERT INTO transaction_receipts ({', '.join(RECEIPT_COLUMNS)})
+                VALUES ({', '.join(['%s'] * len(RECEIPT_COLUMNS))})
+                ON DUPLICATE KEY UPDATE transaction_id = transaction_id
+            """, [tuple(receipt[column] for column in RECEIPT_COLUMNS) for receipt in receipts])
+
+            outbox_ids = [receipt['outbox_id'] for receipt in receipts]
+            cursor.execute(f"""
+                DELETE FROM receipt_outbox
+                WHERE outbox_id IN ({', '.join(['%s'] * len(outbox_ids))})
+            """, outbox_ids)
+
             conn.commit()
-            
-            return self.get_receipt_by_id(receipt_id)
-            
+            return True
+
         except Exception as e:
             conn.rollback()
-            print(f"Failed to create stock trade receipt: {e}")
-            return None
+            logging.error(f"Failed to write {len(receipts)} receipts: {e}")
+            return False
         finally:
             cursor.close()
             conn.close()
-    
-    def get_receipt_by_id(self, receipt_id):
-        """Get receipt details by ID"""
-        conn = get_db_connection()
-        if not conn:
-            return None
-            
-        try:
-            cursor = conn.cursor(dictionary=True, buffered=True)
-            
-            cursor.execute("""
-                SELECT r.*, u.email, u.full_name 
-                FROM transaction_receipts r
-                JOIN users u ON r.user_id = u.user_id
-                WHERE r.receipt_id = %s
-            """, (receipt_id,))
-            
-            receipt = cursor.fetchone()
-            return receipt
-            
-        except Exception as e:
-            print(f"Failed to get receipt: {e}")
-            return None
-        finally:
-            cursor.close()
-            conn.close()
-    
+
+    def sweep_outbox(self):
+        """Deliver outbox rows older than the grace period; returns the number written"""
+        written = 0
+        while True:
+            conn = get_db_connection()
+            if not conn:
+                return written
+
+            try:
+                cursor = conn.cursor(dictionary=True, buffered=True)
+                cursor.execute("""
+                    SELECT outbox_id, payload
+                    FROM receipt_outbox
+                    WHERE created_at < NOW() - INTERVAL %s SECOND
+                    ORDER BY outbox_id
+                    LIMIT %s
+                """, (self.outbox_grace, self.batch_size))
+                rows = cursor.fetchall()
+                conn.commit()
+            except Exception as e:
+                logging.error(f"Failed to read receipt outbox: {e}")
+                return written
+            finally:
+                cursor.close()
+                conn.close()
+
+            if not rows:
+                return written
+
+            receipts = [dict(json.loads(row['payload']), outbox_id=row['outbox_id']) for row in rows]
+            if not self.write_receipts(receipts):
+                return written
+            written += len(receipts)
+            if len(rows) < self.batch_size:
+                return written
+
     def get_user_receipts(self, user_id, limit=50):
         """Get all receipts for a user"""
         conn = get_db_connection()
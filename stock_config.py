@@ -37,6 +37,20 @@ class StockConfig:
     ALPHA_VANTAGE_API_KEY = 'demo'  # Free demo key
     ALPHA_VANTAGE_BASE_URL = 'https://www.alphavantage.co/query'
     
+    # Batch quote fetching
+    QUOTE_CONCURRENCY = int(os.getenv('STOCK_QUOTE_CONCURRENCY', 8))         # max parallel upstream requests
+    QUOTE_RATE_LIMIT = float(os.getenv('STOCK_QUOTE_RATE_LIMIT', 5))         # requests per second to Alpha Vantage
+    QUOTE_RATE_BURST = int(os.getenv('STOCK_QUOTE_RATE_BURST', 5))
+    QUOTE_BATCH_TIMEOUT = float(os.getenv('STOCK_QUOTE_BATCH_TIMEOUT', 12))  # seconds before falling back per symbol
+    QUOTE_REQUEST_TIMEOUT = float(os.getenv('STOCK_QUOTE_REQUEST_TIMEOUT', 5))  # per upstream request
+    QUOTE_CIRCUIT_FAILURES = int(os.getenv('STOCK_QUOTE_CIRCUIT_FAILURES', 5))   # consecutive failures before the circuit opens
+    QUOTE_CIRCUIT_RESET = int(os.getenv('STOCK_QUOTE_CIRCUIT_RESET', 30))        # seconds before retrying an open circuit
+    
+    # Market data ingestion (market_data_ingest.py) and read-side snapshot
+    MARKET_DATA_REFRESH_INTERVAL = int(os.getenv('MARKET_DATA_REFRESH_INTERVAL', 60))  # seconds between ingestion runs
+    MARKET_SNAPSHOT_TTL = int(os.getenv('MARKET_SNAPSHOT_TTL', 5))                     # seconds /api/stocks/market caches the stocks table
+    PORTFOLIO_CACHE_TTL = int(os.getenv('PORTFOLIO_CACHE_TTL', 10))                    # seconds /api/stocks/portfolio caches a user's holdings
+    
     # Mock prices for demo (fallback)
     MOCK_STOCK_PRICES = {
         'AAPL': 185.50, 'MSFT': 375.85, 'GOOGL': 138.20, 'AMZN': 155.75,
@@ -48,6 +62,7 @@ class StockConfig:
     
     # Trading rules
     MINIMUM_TRADE_AMOUNT = 10.00  # $10 minimum trade
+    MAX_BATCH_ORDERS = int(os.getenv('STOCK_MAX_BATCH_ORDERS', 100))  # orders per /api/stocks/orders/batch call
     TRADING_HOURS = {
         'start': '09:30',  # EST
         'end': '16:00'     # EST
@@ -1,49 +1,139 @@
-import requests
+import datetime
 import random
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 import logging
 
 # Import from root
 from stock_config import StockConfig
+from services.price_cache import PriceCache
+from services.portfolio_valuation import portfolio_valuation
+from services.price_history import price_history, utc_now
+from services.market_data_client import market_data_client, ProviderError, CircuitOpenError
+
+class OrderPrice:
+    """The single quote an order is filled at.
+    
+    Captured once per order and threaded through validation, the bank
+    debit/credit and the portfolio update, so every step uses the same price.
+    """
+    
+    def __init__(self, symbol, price_data):
+        self.symbol = symbol
+        self.price = price_data['price']
+        self.source = price_data.get('source', 'unknown')
+        self.quoted_at = price_data.get('quoted_at')
+    
+    def total(self, quantity):
+        """Order value for `quantity` shares at this price"""
+        return Decimal(str(quantity)) * self.price
+    
+    def to_dict(self):
+        return {
+            'symbol': self.symbol,
+            'price': float(self.price),
+            'source': self.source,
+            'quoted_at': self.quoted_at.isoformat() if self.quoted_at else None
+        }
 
 class StockService:
     def __init__(self):
         self.config = StockConfig()
+        market_data_client.register(
+            'alpha_vantage',
+            concurrency=self.config.QUOTE_CONCURRENCY,
+            rate=self.config.QUOTE_RATE_LIMIT,
+            burst=self.config.QUOTE_RATE_BURST,
+            timeout=self.config.QUOTE_REQUEST_TIMEOUT,
+            failure_threshold=self.config.QUOTE_CIRCUIT_FAILURES,
+            reset_timeout=self.config.QUOTE_CIRCUIT_RESET
+        )
+        self.market_snapshot = PriceCache(
+            self.load_market_snapshot,
+            ttl=self.config.MARKET_SNAPSHOT_TTL,
+            max_stale=self.config.MARKET_SNAPSHOT_TTL * 6,
+            name='market snapshot'
+        )
+        # Last successfully fetched quote per symbol, served while Alpha Vantage is failing
+        self.last_good_quotes = {}
+    
+    def quote_params(self, symbol):
+        """Alpha Vantage GLOBAL_QUOTE query parameters"""
+        return {
+            'function': 'GLOBAL_QUOTE',
+            'symbol': symbol,
+            'apikey': self.config.ALPHA_VANTAGE_API_KEY
+        }
+    
+    def parse_quote(self, data, symbol=None):
+        """Extract price data from a GLOBAL_QUOTE response, or None if it has no usable quote
+        
+        A malformed quote is logged and treated like a missing one, so callers
+        fall back for that symbol only.
+        """
+        try:
+            if 'Global Quote' in data and data['Global Quote']:
+                quote = data['Global Quote']
+                price = Decimal(str(quote.get('05. price', 0)))
+                change = Decimal(str(quote.get('09. change', 0)))
+                change_percent = Decimal(str(quote.get('10. change percent', '0%')).rstrip('%'))
+                if not price.is_finite() or price <= 0:
+                    raise ValueError(f"invalid price {quote.get('05. price')!r}")
+                
+                return {
+                    'price': price,
+                    'change': change,
+                    'change_percent': change_percent,
+                    'source': 'alpha_vantage',
+                    'quoted_at': utc_now()
+                }
+        except (InvalidOperation, KeyError, ValueError, TypeError, AttributeError) as e:
+            logging.error(f"Malformed quote for {symbol}: {e}")
+        return None
     
     def get_stock_price(self, symbol):
         """Get real-time stock price from Alpha Vantage API"""
         try:
-            # Using Alpha Vantage free API
-            response = requests.get(
-                f'{self.config.ALPHA_VANTAGE_BASE_URL}',
-                params={
-                    'function': 'GLOBAL_QUOTE',
-                    'symbol': symbol,
-                    'apikey': self.config.ALPHA_VANTAGE_API_KEY
-                },
-                timeout=10
+            data = market_data_client.get_json(
+                'alpha_vantage',
+                self.config.ALPHA_VANTAGE_BASE_URL,
+                params=self.quote_params(symbol)
             )
+            price_data = self.parse_quote(data, symbol)
+            if price_data:
+                self.last_good_quotes[symbol] = price_data
+                return price_data
             
-            if response.status_code == 200:
-                data = response.json()
-                if 'Global Quote' in data and data['Global Quote']:
-                    quote = data['Global Quote']
-                    price = Decimal(str(quote.get('05. price', 0)))
-                    change = Decimal(str(quote.get('09. change', 0)))
-                    change_percent = Decimal(str(quote.get('10. change percent', '0%')).rstrip('%'))
-                    
-                    return {
-                        'price': price,
-                        'change': change,
-                        'change_percent': change_percent
-                    }
-            
-            # Fallback to mock data if API fails
-            return self.get_mock_stock_price(symbol)
+            # Fallback to the last known price if API fails
+            return self.get_fallback_price(symbol)
             
-        except Exception as e:
+        except CircuitOpenError:
+            return self.get_fallback_price(symbol)
+        except ProviderError as e:
             logging.error(f"Failed to fetch stock price for {symbol}: {e}")
-            return self.get_mock_stock_price(symbol)
+            return self.get_fallback_price(symbol)
+    
+    def get_fallback_price(self, symbol):
+        """Last known good price: last live quote, then the stocks table, then mock data"""
+        price_data = self.last_good_quotes.get(symbol)
+        if price_data:
+            return dict(price_data, source='last_known')
+        
+        try:
+            snapshot = self.get_market_snapshot()
+        except Exception as e:
+            logging.error(f"Failed to read market snapshot for {symbol}: {e}")
+            snapshot = []
+        for stock in snapshot:
+            if stock['symbol'] == symbol and stock['price'] > 0:
+                return {
+                    'price': Decimal(str(stock['price'])),
+                    'change': Decimal(str(stock['change'])),
+                    'change_percent': Decimal(str(stock['change_percent'])),
+                    'source': 'stocks_table',
+                    'quoted_at': datetime.datetime.fromisoformat(stock['last_updated']) if stock['last_updated'] else None
+                }
+        
+        return self.get_mock_stock_price(symbol)
     
     def get_mock_stock_price(self, symbol):
         """Generate mock stock price data for demo"""
@@ -57,15 +147,55 @@ class StockService:
         return {
             'price': price,
             'change': change,
-            'change_percent': change_percent
+            'change_percent': change_percent,
+            'source': 'mock',
+            'quoted_at': utc_now()
         }
     
+    def get_quotes(self, symbols):
+        """Get quotes for many symbols concurrently.
+        
+        Returns {symbol: price_data} for every requested symbol; symbols whose
+        upstream request fails or does not finish in time fall back to their
+        last known good price.
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        if not symbols:
+            return {}
+        
+        results = market_data_client.get_json_many(
+            'alpha_vantage',
+            [(self.config.ALPHA_VANTAGE_BASE_URL, self.quote_params(symbol)) for symbol in symbols],
+            timeout=self.config.QUOTE_BATCH_TIMEOUT
+        )
+        
+        quotes = {}
+        for symbol, result in zip(symbols, results):
+            price_data = None
+            if isinstance(result, Exception):
+                if not isinstance(result, CircuitOpenError):
+                    logging.error(f"Failed to fetch stock price for {symbol}: {result}")
+            else:
+                price_data = self.parse_quote(result, symbol)
+            if price_data:
+                self.last_good_quotes[symbol] = price_data
+            else:
+                price_data = self.get_fallback_price(symbol)
+            quotes[symbol] = price_data
+        return quotes
+    
+    def get_quote(self, symbol):
+        """Get a single quote through the shared batch path"""
+        symbol = symbol.upper()
+        return self.get_quotes([symbol])[symbol]
+    
     def get_all_stock_prices(self):
         """Get prices for all supported stocks"""
+        quotes = self.get_quotes([stock['symbol'] for stock in self.config.POPULAR_STOCKS])
         stock_prices = {}
         for stock in self.config.POPULAR_STOCKS:
             symbol = stock['symbol']
-            price_data = self.get_stock_price(symbol)
+            price_data = quotes[symbol]
             stock_prices[symbol] = {
                 'symbol': symbol,
                 'name': stock['name'],
@@ -75,39 +205,57 @@ class StockService:
             }
         return stock_prices
     
+    def price_order(self, symbol):
+        """Capture the one quote an order will be validated and filled at"""
+        symbol = symbol.upper()
+        return OrderPrice(symbol, self.get_quote(symbol))
+    
     def calculate_order_total(self, symbol, quantity):
         """Calculate total cost for a stock order"""
-        price_data = self.get_stock_price(symbol)
-        total = Decimal(str(quantity)) * price_data['price']
-        return float(total)
+        return float(self.price_order(symbol).total(quantity))
     
     def initialize_stocks(self):
-        """Initialize stock data in database"""
+        """Refresh prices for all supported stocks with a single multi-row upsert and revalue holdings"""
         from config import get_db_connection
+        quotes = self.get_quotes([stock['symbol'] for stock in self.config.POPULAR_STOCKS])
+        
         conn = get_db_connection()
         if not conn:
             return False
             
         try:
             cursor = conn.cursor()
+            rows = []
+            params = []
             for stock in self.config.POPULAR_STOCKS:
-                price_data = self.get_stock_price(stock['symbol'])
-                cursor.execute("""
-                    INSERT INTO stocks (symbol, company_name, current_price, daily_change, daily_change_percent)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                    current_price = VALUES(current_price),
-                    daily_change = VALUES(daily_change),
-                    daily_change_percent = VALUES(daily_change_percent),
-                    last_updated = CURRENT_TIMESTAMP
-                """, (
+                price_data = quotes[stock['symbol']]
+                rows.append("(%s, %s, %s, %s, %s)")
+                params.extend([
                     stock['symbol'],
                     stock['name'],
                     float(price_data['price']),
                     float(price_data['change']),
                     float(price_data['change_percent'])
-                ))
+                ])
+            
+            cursor.execute(f"""
+                INSERT INTO stocks (symbol, company_name, current_price, daily_change, daily_change_percent)
+                VALUES {', '.join(rows)}
+                ON DUPLICATE KEY UPDATE
+                current_price = VALUES(current_price),
+                daily_change = VALUES(daily_change),
+                daily_change_percent = VALUES(daily_change_percent),
+                last_updated = CURRENT_TIMESTAMP
+            """, params)
+            
+            # Append to price history and revalue holdings in the same transaction
+            symbols = [stock['symbol'] for stock in self.config.POPULAR_STOCKS]
+            price_history.record_ticks(cursor, [(symbol, quotes[symbol]['price']) for symbol in symbols])
+            portfolio_valuation.revalue_symbols(cursor, symbols)
+            
             conn.commit()
+            self.market_snapshot.invalidate()
+            portfolio_valuation.invalidate()
             return True
         except Exception as e:
             logging.error(f"Failed to initialize stocks: {e}")
@@ -116,6 +264,40 @@ class StockService:
         finally:
             cursor.close()
             conn.close()
+    
+    def load_market_snapshot(self):
+        """Read the latest ingested prices from the stocks table"""
+        from config import get_db_connection
+        conn = get_db_connection()
+        if not conn:
+            raise RuntimeError('Database connection failed')
+            
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT symbol, company_name, current_price, daily_change, daily_change_percent, last_updated
+                FROM stocks
+                ORDER BY symbol
+            """)
+            
+            stocks = []
+            for stock in cursor.fetchall():
+                stocks.append({
+                    'symbol': stock['symbol'],
+                    'name': stock['company_name'],
+                    'price': float(stock['current_price'] or 0),
+                    'change': float(stock['daily_change'] or 0),
+                    'change_percent': float(stock['daily_change_percent'] or 0),
+                    'last_updated': stock['last_updated'].isoformat() if stock['last_updated'] else None
+                })
+            return stocks
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def get_market_snapshot(self):
+        """Get market prices from the in-memory snapshot of the stocks table"""
+        return self.market_snapshot.get() or []
 
 # Global stock service instance
 stock_service = StockService()
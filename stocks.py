@@ -1,8 +1,9 @@
 from flask import request, jsonify
 from flask_restful import Resource
 from config import get_db_connection
-import jwt
-from decimal import Decimal
+from auth_middleware import get_user_from_token
+from idempotency import idempotent
+from decimal import Decimal, InvalidOperation
 import sys
 import os
 
@@ -11,26 +12,36 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import from services
 from services.stock_service import stock_service
+from services.ledger_service import ledger_service
+from services.metrics_service import metrics_service
+from services.receipt_service import receipt_service
+from services.portfolio_valuation import portfolio_valuation
+from services.portfolio_analytics import portfolio_analytics
+from services.price_history import price_history, INTERVALS
+from services.trading_service import trading_service, BatchOrderError
+from services.order_book import ORDER_TYPES, MAX_TRIGGER_PRICE
+import datetime
 
-def verify_token(token):
-    """Verify JWT token and return user data"""
-    try:
-        payload = jwt.decode(token, 'your-secret-key-here-change-in-production', algorithms=['HS256'])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
+MAX_ANALYTICS_SERIES_DAYS = 2520  # ~10 years of business days
+MAX_HISTORY_POINTS = 5000
+ORDER_STATUSES = ('open', 'filled', 'cancelled', 'rejected')
 
-def get_user_from_token():
-    """Extract user from authorization token"""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    
-    token = auth_header.split(' ')[1]
-    user_data = verify_token(token)
-    return user_data
+def format_open_order(order):
+    """Convert an open_orders row for JSON"""
+    return {
+        'order_id': order['order_id'],
+        'symbol': order['symbol'],
+        'side': order['side'],
+        'order_type': order['order_type'],
+        'quantity': float(order['quantity']),
+        'trigger_price': float(order['trigger_price']),
+        'account_type': order['account_type'],
+        'status': order['status'],
+        'fill_price': float(order['fill_price']) if order['fill_price'] is not None else None,
+        'status_reason': order['status_reason'],
+        'created_at': order['created_at'].isoformat() if order['created_at'] else None,
+        'updated_at': order['updated_at'].isoformat() if order['updated_at'] else None
+    }
 
 class StockMarket(Resource):
     def get(self):
@@ -39,15 +50,12 @@ class StockMarket(Resource):
         if not user_data:
             return {'error': 'Invalid or expired token'}, 401
         
-        # Initialize stocks in database
-        stock_service.initialize_stocks()
-        
-        # Get all stock prices
-        stock_prices = stock_service.get_all_stock_prices()
+        # Prices are kept current by market_data_ingest.py; only read them here
+        stocks = stock_service.get_market_snapshot()
         
         return {
-            'stocks': list(stock_prices.values()),
-            'count': len(stock_prices)
+            'stocks': stocks,
+            'count': len(stocks)
         }
 
 class StockDetail(Resource):
@@ -58,7 +66,7 @@ class StockDetail(Resource):
             return {'error': 'Invalid or expired token'}, 401
         
         symbol = symbol.upper()
-        price_data = stock_service.get_stock_price(symbol)
+        price_data = stock_service.get_quote(symbol)
         
         # Get stock info from database
         conn = get_db_connection()
@@ -88,7 +96,58 @@ class StockDetail(Resource):
             cursor.close()
             conn.close()
 
+class StockPriceHistory(Resource):
+    def get(self, symbol):
+        """Get OHLC price history for a stock as array-encoded series"""
+        user_data = get_user_from_token()
+        if not user_data:
+            return {'error': 'Invalid or expired token'}, 401
+        
+        symbol = symbol.upper()
+        interval = request.args.get('interval', '1d')
+        if interval not in INTERVALS:
+            return {'error': f'Invalid interval. Supported: {", ".join(INTERVALS)}'}, 400
+        
+        limit = min(max(request.args.get('limit', 500, type=int), 1), MAX_HISTORY_POINTS)
+        
+        # Optional UTC bounds (YYYY-MM-DD)
+        bounds = {}
+        for field in ('from', 'to'):
+            if request.args.get(field):
+                try:
+                    bounds[field] = datetime.datetime.strptime(request.args[field], '%Y-%m-%d')
+                except ValueError:
+                    return {'error': f'Invalid {field} date. Use YYYY-MM-DD'}, 400
+        if 'to' in bounds:
+            bounds['to'] += datetime.timedelta(days=1)
+        
+        conn = get_db_connection()
+        if not conn:
+            return {'error': 'Database connection failed'}, 500
+            
+        try:
+            cursor = conn.cursor()
+            
+            series = price_history.get_bars(
+                cursor, symbol, interval, limit,
+                since=bounds.get('from'), until=bounds.get('to')
+            )
+            
+            return {
+                'symbol': symbol,
+                'interval': interval,
+                'count': len(series['t']),
+                'series': series
+            }
+            
+        except Exception as e:
+            return {'error': f'Failed to get price history: {str(e)}'}, 500
+        finally:
+            cursor.close()
+            conn.close()
+
 class BuyStock(Resource):
+    @idempotent('stocks_buy')
     def post(self):
         """Buy stocks using bank account funds"""
         user_data = get_user_from_token()
@@ -109,11 +168,13 @@ class BuyStock(Resource):
         except ValueError:
             return {'error': 'Invalid quantity'}, 400
         
-        # Calculate total cost
-        total_cost = stock_service.calculate_order_total(symbol, quantity)
+        # Price the order once (before taking any row locks); every step below uses this quote
+        order_price = stock_service.price_order(symbol)
+        current_price = order_price.price
+        total_cost = order_price.total(quantity)
         
         # Check minimum trade amount
-        if total_cost < 10.00:
+        if total_cost < Decimal('10.00'):
             return {'error': 'Minimum trade amount is $10.00'}, 400
         
         conn = get_db_connection()
@@ -123,13 +184,10 @@ class BuyStock(Resource):
         try:
             cursor = conn.cursor(dictionary=True)
             
-            # Get bank account
-            cursor.execute("""
-                SELECT account_id, balance FROM accounts 
-                WHERE user_id = %s AND account_type = %s
-            """, (user_data['user_id'], account_type))
-            
-            bank_account = cursor.fetchone()
+            # Get and lock bank account
+            bank_account = ledger_service.lock_account(
+                cursor, "user_id = %s AND account_type = %s", (user_data['user_id'], account_type)
+            )
             if not bank_account:
                 return {'error': f'{account_type.title()} account not found'}, 404
             
@@ -137,21 +195,11 @@ class BuyStock(Resource):
             if Decimal(str(bank_account['balance'])) < total_cost:
                 return {'error': f'Insufficient funds in {account_type} account'}, 400
             
-            # Get current stock price
-            price_data = stock_service.get_stock_price(symbol)
-            current_price = price_data['price']
-            
-            # Update bank account balance
-            new_bank_balance = Decimal(str(bank_account['balance'])) - Decimal(str(total_cost))
-            cursor.execute(
-                "UPDATE accounts SET balance = %s WHERE account_id = %s",
-                (float(new_bank_balance), bank_account['account_id'])
-            )
-            
-            # Get or create stock portfolio entry
+            # Get or create stock portfolio entry (locked; always after the bank account)
             cursor.execute("""
                 SELECT * FROM stock_portfolios 
                 WHERE user_id = %s AND symbol = %s
+                FOR UPDATE
             """, (user_data['user_id'], symbol))
             
             portfolio = cursor.fetchone()
@@ -159,7 +207,7 @@ class BuyStock(Resource):
             if portfolio:
                 # Update existing portfolio
                 new_quantity = Decimal(str(portfolio['quantity'])) + quantity
-                new_total_invested = Decimal(str(portfolio['total_invested'])) + Decimal(str(total_cost))
+                new_total_invested = Decimal(str(portfolio['total_invested'])) + total_cost
                 new_avg_price = new_total_invested / new_quantity
                 
                 cursor.execute("""
@@ -206,21 +254,20 @@ class BuyStock(Resource):
                 'market',
                 'completed'
             ))
+            metrics_service.record_trades(cursor, [('buy', symbol, total_cost)])
             
-            # Record bank withdrawal transaction
-            cursor.execute("""
-                INSERT INTO transactions 
-                (account_id, type, amount, balance_after, description)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                bank_account['account_id'],
-                'withdraw',
-                float(total_cost),
-                float(new_bank_balance),
+            # Debit bank account and record bank withdrawal transaction
+            bank_transaction_id, new_bank_balance = ledger_service.post(
+                cursor, bank_account, 'withdraw', total_cost,
                 f'Stock purchase: {quantity} shares of {symbol}'
-            ))
+            )
+            receipt = receipt_service.create_stock_trade_receipt(
+                cursor, user_data['user_id'], symbol, quantity, current_price, total_cost, 'buy', bank_transaction_id
+            )
             
             conn.commit()
+            portfolio_valuation.invalidate(user_data['user_id'])
+            receipt_service.publish(receipt)
             
             return {
                 'message': 'Stock purchase successful',
@@ -230,7 +277,9 @@ class BuyStock(Resource):
                     'price_per_share': float(current_price),
                     'total_cost': float(total_cost),
                     'from_account': account_type,
-                    'new_bank_balance': float(new_bank_balance)
+                    'new_bank_balance': float(new_bank_balance),
+                    'quote': order_price.to_dict(),
+                    'receipt_number': receipt['receipt_number']
                 }
             }
             
@@ -262,6 +311,10 @@ class SellStock(Resource):
         except ValueError:
             return {'error': 'Invalid quantity'}, 400
         
+        # Price the order once (before taking any row locks)
+        order_price = stock_service.price_order(symbol)
+        current_price = order_price.price
+        
         conn = get_db_connection()
         if not conn:
             return {'error': 'Database connection failed'}, 500
@@ -269,10 +322,18 @@ class SellStock(Resource):
         try:
             cursor = conn.cursor(dictionary=True)
             
+            # Get and lock bank account (locked before the portfolio row, as in BuyStock)
+            bank_account = ledger_service.lock_account(
+                cursor, "user_id = %s AND account_type = %s", (user_data['user_id'], account_type)
+            )
+            if not bank_account:
+                return {'error': f'{account_type.title()} account not found'}, 404
+            
             # Check if user owns the stock
             cursor.execute("""
                 SELECT * FROM stock_portfolios 
                 WHERE user_id = %s AND symbol = %s
+                FOR UPDATE
             """, (user_data['user_id'], symbol))
             
             portfolio = cursor.fetchone()
@@ -283,32 +344,12 @@ class SellStock(Resource):
             if Decimal(str(portfolio['quantity'])) < quantity:
                 return {'error': f'Insufficient shares. You own {portfolio["quantity"]} shares of {symbol}'}, 400
             
-            # Get current stock price
-            price_data = stock_service.get_stock_price(symbol)
-            current_price = price_data['price']
-            sale_proceeds = Decimal(str(quantity)) * current_price
-            
-            # Get bank account
-            cursor.execute("""
-                SELECT account_id, balance FROM accounts 
-                WHERE user_id = %s AND account_type = %s
-            """, (user_data['user_id'], account_type))
-            
-            bank_account = cursor.fetchone()
-            if not bank_account:
-                return {'error': f'{account_type.title()} account not found'}, 404
+            sale_proceeds = order_price.total(quantity)
             
             # Calculate realized P&L
             cost_basis = (Decimal(str(portfolio['total_invested'])) / Decimal(str(portfolio['quantity']))) * quantity
             realized_pnl = sale_proceeds - cost_basis
             
-            # Update bank account balance (deposit sale proceeds)
-            new_bank_balance = Decimal(str(bank_account['balance'])) + sale_proceeds
-            cursor.execute(
-                "UPDATE accounts SET balance = %s WHERE account_id = %s",
-                (float(new_bank_balance), bank_account['account_id'])
-            )
-            
             # Update stock portfolio
             new_quantity = Decimal(str(portfolio['quantity'])) - quantity
             
@@ -349,21 +390,20 @@ class SellStock(Resource):
                 'market',
                 'completed'
             ))
+            metrics_service.record_trades(cursor, [('sell', symbol, sale_proceeds)])
             
-            # Record bank deposit transaction
-            cursor.execute("""
-                INSERT INTO transactions 
-                (account_id, type, amount, balance_after, description)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (
-                bank_account['account_id'],
-                'deposit',
-                float(sale_proceeds),
-                float(new_bank_balance),
+            # Credit sale proceeds and record bank deposit transaction
+            bank_transaction_id, new_bank_balance = ledger_service.post(
+                cursor, bank_account, 'deposit', sale_proceeds,
                 f'Stock sale: {quantity} shares of {symbol}'
-            ))
+            )
+            receipt = receipt_service.create_stock_trade_receipt(
+                cursor, user_data['user_id'], symbol, quantity, current_price, sale_proceeds, 'sell', bank_transaction_id
+            )
             
             conn.commit()
+            portfolio_valuation.invalidate(user_data['user_id'])
+            receipt_service.publish(receipt)
             
             return {
                 'message': 'Stock sale successful',
@@ -375,7 +415,9 @@ class SellStock(Resource):
                     'realized_pnl': float(realized_pnl),
                     'to_account': account_type,
                     'new_bank_balance': float(new_bank_balance),
-                    'shares_remaining': float(new_quantity) if new_quantity > 0 else 0
+                    'shares_remaining': float(new_quantity) if new_quantity > 0 else 0,
+                    'quote': order_price.to_dict(),
+                    'receipt_number': receipt['receipt_number']
                 }
             }
             
@@ -386,13 +428,32 @@ class SellStock(Resource):
             cursor.close()
             conn.close()
 
-class StockPortfolio(Resource):
-    def get(self):
-        """Get user's stock portfolio"""
+class BatchStockOrders(Resource):
+    @idempotent('stocks_orders_batch')
+    def post(self):
+        """Execute several buy/sell market orders in one transaction (all or nothing)"""
         user_data = get_user_from_token()
         if not user_data:
             return {'error': 'Invalid or expired token'}, 401
         
+        data = request.get_json()
+        if not data or not isinstance(data.get('orders'), list) or not data['orders']:
+            return {'error': 'orders must be a non-empty list'}, 400
+        
+        max_orders = stock_service.config.MAX_BATCH_ORDERS
+        if len(data['orders']) > max_orders:
+            return {'error': f'At most {max_orders} orders per batch'}, 400
+        
+        orders, errors = trading_service.parse_orders(data['orders'])
+        if errors:
+            return {
+                'error': 'Invalid orders',
+                'errors': [{'index': index, 'error': message} for index, message in sorted(errors.items())]
+            }, 400
+        
+        # One quote snapshot prices the whole batch (before taking any row locks)
+        quotes = stock_service.get_quotes([order['symbol'] for order in orders])
+        
         conn = get_db_connection()
         if not conn:
             return {'error': 'Database connection failed'}, 500
@@ -400,54 +461,208 @@ class StockPortfolio(Resource):
         try:
             cursor = conn.cursor(dictionary=True)
             
-            cursor.execute("""
-                SELECT sp.*, s.company_name 
-                FROM stock_portfolios sp
-                JOIN stocks s ON sp.symbol = s.symbol
-                WHERE sp.user_id = %s
-            """, (user_data['user_id'],))
+            results, receipts = trading_service.execute_batch(cursor, user_data['user_id'], orders, quotes)
             
-            portfolio = cursor.fetchall()
+            conn.commit()
+            portfolio_valuation.invalidate(user_data['user_id'])
+            receipt_service.publish(*receipts)
             
-            # Convert Decimal to float for JSON serialization
-            formatted_portfolio = []
-            for item in portfolio:
-                formatted_item = {
-                    'portfolio_id': item['portfolio_id'],
-                    'user_id': item['user_id'],
-                    'symbol': item['symbol'],
-                    'company_name': item['company_name'],
-                    'quantity': float(item['quantity']),
-                    'average_price': float(item['average_price']),
-                    'total_invested': float(item['total_invested']),
-                    'current_value': float(item['current_value']),
-                    'unrealized_pnl': float(item['unrealized_pnl']),
-                    'created_at': item['created_at'].isoformat() if item['created_at'] else None,
-                    'updated_at': item['updated_at'].isoformat() if item['updated_at'] else None
-                }
-                formatted_portfolio.append(formatted_item)
+            return {
+                'message': 'Batch executed successfully',
+                'orders': results,
+                'count': len(results)
+            }
+            
+        except BatchOrderError as e:
+            conn.rollback()
+            return {
+                'error': 'No orders were executed',
+                'errors': [{'index': index, 'error': message} for index, message in sorted(e.errors.items())]
+            }, 400
+        except Exception as e:
+            conn.rollback()
+            return {'error': f'Batch execution failed: {str(e)}'}, 500
+        finally:
+            cursor.close()
+            conn.close()
+
+class StockOrders(Resource):
+    def get(self):
+        """Get user's limit/stop orders (open by default)"""
+        user_data = get_user_from_token()
+        if not user_data:
+            return {'error': 'Invalid or expired token'}, 401
+        
+        status = request.args.get('status', 'open')
+        if status not in ORDER_STATUSES:
+            return {'error': f'Invalid status. Supported: {", ".join(ORDER_STATUSES)}'}, 400
+        
+        conn = get_db_connection()
+        if not conn:
+            return {'error': 'Database connection failed'}, 500
+            
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT order_id, symbol, side, order_type, quantity, trigger_price, account_type,
+                       status, fill_price, status_reason, created_at, updated_at
+                FROM open_orders
+                WHERE user_id = %s AND status = %s
+                ORDER BY order_id DESC
+                LIMIT 100
+            """, (user_data['user_id'], status))
+            
+            orders = [format_open_order(order) for order in cursor.fetchall()]
+            return {
+                'orders': orders,
+                'count': len(orders)
+            }
+            
+        except Exception as e:
+            return {'error': f'Failed to get orders: {str(e)}'}, 500
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def post(self):
+        """Place a limit or stop order; it rests until the matching engine sees a crossing price"""
+        user_data = get_user_from_token()
+        if not user_data:
+            return {'error': 'Invalid or expired token'}, 401
+        
+        data = request.get_json()
+        if not data or not data.get('price'):
+            return {'error': 'Symbol, quantity and price are required'}, 400
+        
+        order_type = data.get('order_type', 'limit')
+        if order_type not in ORDER_TYPES:
+            return {'error': f'Order type must be one of: {", ".join(ORDER_TYPES)}'}, 400
+        
+        orders, errors = trading_service.parse_orders([data])
+        if errors:
+            return {'error': errors[0]}, 400
+        order = orders[0]
+        
+        try:
+            trigger_price = Decimal(str(data['price']))
+        except InvalidOperation:
+            return {'error': 'Invalid price'}, 400
+        if not trigger_price.is_finite():
+            return {'error': 'Invalid price'}, 400
+        if trigger_price <= 0:
+            return {'error': 'Price must be positive'}, 400
+        if trigger_price > MAX_TRIGGER_PRICE:
+            return {'error': f'Price must be at most {MAX_TRIGGER_PRICE}'}, 400
+        
+        # Check minimum trade amount at the trigger price
+        if order['quantity'] * trigger_price < Decimal('10.00'):
+            return {'error': 'Minimum trade amount is $10.00'}, 400
+        
+        conn = get_db_connection()
+        if not conn:
+            return {'error': 'Database connection failed'}, 500
             
-            # Calculate totals
-            total_invested = 0
-            total_current_value = 0
+        try:
+            cursor = conn.cursor(dictionary=True)
             
-            for item in portfolio:
-                total_invested += item['total_invested']
-                total_current_value += item['current_value']
+            cursor.execute("SELECT symbol FROM stocks WHERE symbol = %s", (order['symbol'],))
+            if not cursor.fetchone():
+                return {'error': 'Stock not found'}, 404
             
-            total_pnl = total_current_value - total_invested
-            total_pnl_percent = (total_pnl / total_invested * 100) if total_invested > 0 else 0
+            # Funds and shares are checked when the order fills
+            cursor.execute("""
+                INSERT INTO open_orders
+                (user_id, symbol, side, order_type, quantity, trigger_price, account_type)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (
+                user_data['user_id'],
+                order['symbol'],
+                order['side'],
+                order_type,
+                float(order['quantity']),
+                float(trigger_price),
+                order['account_type']
+            ))
+            order_id = cursor.lastrowid
+            conn.commit()
             
             return {
-                'portfolio': formatted_portfolio,
-                'summary': {
-                    'total_invested': float(total_invested),
-                    'total_current_value': float(total_current_value),
-                    'total_unrealized_pnl': float(total_pnl),
-                    'total_pnl_percent': float(total_pnl_percent),
-                    'stock_count': len(portfolio)
+                'message': 'Order placed',
+                'order': {
+                    'order_id': order_id,
+                    'symbol': order['symbol'],
+                    'side': order['side'],
+                    'order_type': order_type,
+                    'quantity': float(order['quantity']),
+                    'trigger_price': float(trigger_price),
+                    'account_type': order['account_type'],
+                    'status': 'open'
                 }
-            }
+            }, 201
+            
+        except Exception as e:
+            conn.rollback()
+            return {'error': f'Failed to place order: {str(e)}'}, 500
+        finally:
+            cursor.close()
+            conn.close()
+
+class StockOrderDetail(Resource):
+    def delete(self, order_id):
+        """Cancel an open limit/stop order"""
+        user_data = get_user_from_token()
+        if not user_data:
+            return {'error': 'Invalid or expired token'}, 401
+        
+        conn = get_db_connection()
+        if not conn:
+            return {'error': 'Database connection failed'}, 500
+            
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                UPDATE open_orders SET status = 'cancelled'
+                WHERE order_id = %s AND user_id = %s AND status = 'open'
+            """, (order_id, user_data['user_id']))
+            cancelled = cursor.rowcount == 1
+            conn.commit()
+            
+            if not cancelled:
+                return {'error': 'Open order not found'}, 404
+            
+            return {'message': 'Order cancelled', 'order_id': order_id}
+            
+        except Exception as e:
+            conn.rollback()
+            return {'error': f'Failed to cancel order: {str(e)}'}, 500
+        finally:
+            cursor.close()
+            conn.close()
+
+class StockPortfolio(Resource):
+    def get(self):
+        """Get user's stock portfolio (valued by the latest price tick)"""
+        user_data = get_user_from_token()
+        if not user_data:
+            return {'error': 'Invalid or expired token'}, 401
+        
+        conn = get_db_connection()
+        if not conn:
+            return {'error': 'Database connection failed'}, 500
+            
+        try:
+            cursor = conn.cursor(dictionary=True)
+            
+            # A revaluation or fill in any process moves the version and drops the cached copy
+            version = portfolio_valuation.current_version(cursor)
+            cached = portfolio_valuation.cache.get(user_data['user_id'], version)
+            if cached is not None:
+                return cached
+            
+            # current_value / unrealized_pnl are kept current by the price ingestion path
+            result = portfolio_valuation.load_portfolio(cursor, user_data['user_id'])
+            portfolio_valuation.cache.put(user_data['user_id'], result, version)
+            return result
             
         except Exception as e:
             return {'error': f'Failed to get portfolio: {str(e)}'}, 500
@@ -455,6 +670,35 @@ class StockPortfolio(Resource):
             cursor.close()
             conn.close()
 
+class StockPortfolioAnalytics(Resource):
+    def get(self):
+        """Get performance analytics (returns, volatility, drawdown, allocation) for the user's trades"""
+        user_data = get_user_from_token()
+        if not user_data:
+            return {'error': 'Invalid or expired token'}, 401
+        
+        series_days = min(max(request.args.get('days', 90, type=int), 1), MAX_ANALYTICS_SERIES_DAYS)
+        
+        conn = get_db_connection()
+        if not conn:
+            return {'error': 'Database connection failed'}, 500
+            
+        try:
+            # Plain tuples load straight into NumPy columns
+            cursor = conn.cursor()
+            
+            analytics = portfolio_analytics.get_analytics(cursor, user_data['user_id'], series_days)
+            if analytics is None:
+                return {'error': 'No completed trades to analyze'}, 404
+            
+            return {'analytics': analytics}
+            
+        except Exception as e:
+            return {'error': f'Failed to compute portfolio analytics: {str(e)}'}, 500
+        finally:
+            cursor.close()
+            conn.close()
+
 class StockTransactions(Resource):
     def get(self):
         """Get user's stock transaction history"""
@@ -0,0 +1,19 @@
+"""Shared test setup.
+
+Route and service modules are imported as `routes.X` / `services.X` by the
+app; when those packages are not on the path, both names resolve to the
+modules in the repository root.
+"""
+import importlib.util
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+for package in ('services', 'routes'):
+    if importlib.util.find_spec(package) is None:
+        module = types.ModuleType(package)
+        module.__path__ = [ROOT]
+        sys.modules[package] = module
@@ -0,0 +1,49 @@
+import datetime
+
+import pytest
+
+from admin import decode_page_cursor, encode_page_cursor, keyset_condition, nullable_keyset_condition
+
+
+def test_page_cursor_round_trip():
+    created_at = datetime.datetime(2024, 5, 1, 12, 30, 15)
+
+    cursor = encode_page_cursor(created_at, 42)
+
+    assert '=' not in cursor
+    assert decode_page_cursor(cursor, 2) == [created_at.isoformat(), 42]
+
+
+def test_page_cursor_keeps_null_sort_value():
+    assert decode_page_cursor(encode_page_cursor(None, 5), 2) == [None, 5]
+
+
+@pytest.mark.parametrize('value', ['not base64!', 'e30', encode_page_cursor(1, 2, 3), ''])
+def test_invalid_page_cursor_is_rejected(value):
+    with pytest.raises(ValueError):
+        decode_page_cursor(value, 2)
+
+
+def test_keyset_condition():
+    assert keyset_condition('user_id', 'user_id', True) == ('user_id < %s', 1)
+    assert keyset_condition('email', 'user_id', False) == (
+        '(email > %s OR (email = %s AND user_id > %s))', 3
+    )
+
+
+def test_nullable_keyset_condition_descending_puts_nulls_last():
+    assert nullable_keyset_condition('full_name', 'user_id', True, 'Bo', 4) == (
+        '(full_name < %s OR (full_name = %s AND user_id < %s) OR full_name IS NULL)', ['Bo', 'Bo', 4]
+    )
+    assert nullable_keyset_condition('full_name', 'user_id', True, None, 4) == (
+        '(full_name IS NULL AND user_id < %s)', [4]
+    )
+
+
+def test_nullable_keyset_condition_ascending_puts_nulls_first():
+    assert nullable_keyset_condition('full_name', 'user_id', False, 'Bo', 4) == (
+        '(full_name > %s OR (full_name = %s AND user_id > %s))', ['Bo', 'Bo', 4]
+    )
+    assert nullable_keyset_condition('full_name', 'user_id', False, None, 4) == (
+        '(full_name IS NOT NULL OR user_id > %s)', [4]
+    )
@@ -0,0 +1,90 @@
+import pytest
+
+import db_pool
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeRawConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise OSError('gone away')
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def raw_connections(monkeypatch):
+    created = []
+
+    def connect(**kwargs):
+        created.append(FakeRawConnection())
+        return created[-1]
+
+    monkeypatch.setattr(db_pool.mysql.connector, 'connect', connect)
+    return created
+
+
+def test_released_connection_is_reused(raw_connections):
+    pool = ConnectionPool({}, size=2, max_overflow=0)
+
+    first = pool.get_connection()
+    first.close()
+    second = pool.get_connection()
+
+    assert second is first
+    assert len(raw_connections) == 1
+    assert raw_connections[0].rollbacks == 1
+
+
+def test_close_twice_releases_once(raw_connections):
+    pool = ConnectionPool({}, size=1, max_overflow=0)
+
+    conn = pool.get_connection()
+    conn.close()
+    conn.close()
+
+    assert pool.stats()['idle'] == 1
+    assert pool.stats()['checked_out'] == 0
+
+
+def test_overflow_connections_are_closed_on_release(raw_connections):
+    pool = ConnectionPool({}, size=1, max_overflow=1)
+
+    first = pool.get_connection()
+    overflow = pool.get_connection()
+    overflow.close()
+    first.close()
+
+    assert raw_connections[1].closed
+    assert not raw_connections[0].closed
+    assert pool.stats()['total'] == 1
+
+
+def test_checkout_times_out_when_exhausted(raw_connections):
+    pool = ConnectionPool({}, size=1, max_overflow=0, timeout=0.05)
+    pool.get_connection()
+
+    with pytest.raises(PoolTimeout):
+        pool.get_connection()
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_dead_idle_connection_is_replaced(raw_connections):
+    pool = ConnectionPool({}, size=1, max_overflow=0)
+    pool.get_connection().close()
+    raw_connections[0].alive = False
+
+    conn = pool.get_connection()
+
+    assert conn._conn is raw_connections[1]
+    assert raw_connections[0].closed
+    assert pool.stats()['discarded'] == 1
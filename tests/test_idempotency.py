@@ -0,0 +1,186 @@
+import json
+
+import pytest
+from flask import Flask
+
+import idempotency
+from idempotency import claim_key, finish_key, idempotent, idempotency_cache
+
+
+class ScriptedCursor:
+    """Answers each statement by its leading keyword from `results`"""
+
+    def __init__(self, results):
+        self.results = results
+        self.executed = []
+        self.rowcount = 0
+        self.row = None
+
+    def execute(self, sql, params=None):
+        sql = ' '.join(sql.split())
+        self.executed.append((sql, params))
+        verb = sql.split()[0]
+        if verb == 'SELECT':
+            self.row = self.results.get('SELECT')
+        else:
+            self.rowcount = self.results.get(verb, 0)
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+
+    def cursor(self, *args, **kwargs):
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def database(monkeypatch):
+    def connect(**results):
+        conn = FakeConnection(ScriptedCursor(results))
+        monkeypatch.setattr(idempotency, 'get_db_connection', lambda: conn)
+        return conn
+    return connect
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    idempotency_cache._entries.clear()
+    yield
+    idempotency_cache._entries.clear()
+
+
+def test_claim_inserts_new_key(database):
+    conn = database(INSERT=1)
+
+    assert claim_key(1, 'k', 'transfer', 'hash') == (None, None)
+    assert conn.commits == 1
+    assert conn.closed
+    assert not any(sql.startswith('UPDATE') for sql, _ in conn._cursor.executed)
+
+
+def test_claim_takes_over_expired_lease(database):
+    conn = database(INSERT=0, UPDATE=1)
+
+    assert claim_key(1, 'k', 'transfer', 'hash') == (None, None)
+    update_sql, update_params = conn._cursor.executed[-1]
+    assert 'locked_until < NOW()' in update_sql
+    assert update_params[1:] == (1, 'k', 'transfer', 'hash')
+
+
+def test_claim_of_live_in_progress_key_is_conflict(database):
+    database(INSERT=0, UPDATE=0, SELECT={'status': 'in_progress'})
+
+    stored, error = claim_key(1, 'k', 'transfer', 'hash')
+
+    assert stored is None
+    assert error[1] == 409
+
+
+def test_claim_of_completed_key_returns_stored_response(database):
+    row = {
+        'endpoint': 'transfer', 'request_hash': 'hash', 'status': 'completed',
+        'response_code': 201, 'response_body': '{"ok": true}'
+    }
+    database(INSERT=0, UPDATE=0, SELECT=row)
+
+    assert claim_key(1, 'k', 'transfer', 'hash') == (row, None)
+
+
+def test_claim_failure_rolls_back(database, monkeypatch):
+    conn = database()
+
+    def execute(sql, params=None):
+        raise RuntimeError('connection lost')
+
+    monkeypatch.setattr(conn._cursor, 'execute', execute)
+
+    stored, error = claim_key(1, 'k', 'transfer', 'hash')
+
+    assert error[1] == 500
+    assert conn.rollbacks == 1
+    assert conn.closed
+
+
+def test_finish_stores_response_and_clears_lease(database):
+    conn = database(UPDATE=1)
+
+    finish_key(1, 'k', {'ok': True}, 201)
+
+    [(sql, params)] = conn._cursor.executed
+    assert sql.startswith('UPDATE idempotency_keys SET status = \'completed\'')
+    assert 'locked_until = NULL' in sql
+    assert params == (201, json.dumps({'ok': True}), 1, 'k')
+    assert conn.commits == 1
+
+
+def test_finish_releases_key_on_server_error(database):
+    conn = database(DELETE=1)
+
+    finish_key(1, 'k', None, 500)
+
+    [(sql, params)] = conn._cursor.executed
+    assert sql.startswith('DELETE FROM idempotency_keys')
+    assert params == (1, 'k')
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(idempotency, 'get_user_from_token', lambda: {'user_id': 1})
+    return Flask(__name__)
+
+
+def test_repeat_request_replays_without_running_handler(app, monkeypatch):
+    claims = []
+    monkeypatch.setattr(idempotency, 'claim_key', lambda *args: claims.append(args) or (None, None))
+    monkeypatch.setattr(idempotency, 'finish_key', lambda *args: None)
+    calls = []
+
+    @idempotent('transfer')
+    def handler():
+        calls.append(1)
+        return {'transfer_id': 7}, 201
+
+    headers = {'Idempotency-Key': 'k'}
+    with app.test_request_context(method='POST', data='{"amount": 5}', headers=headers):
+        assert handler() == ({'transfer_id': 7}, 201)
+    with app.test_request_context(method='POST', data='{"amount": 5}', headers=headers):
+        assert handler() == ({'transfer_id': 7}, 201, {'Idempotent-Replayed': 'true'})
+
+    assert len(calls) == 1
+    assert len(claims) == 1
+
+
+def test_key_reused_for_different_body_is_rejected(app, monkeypatch):
+    monkeypatch.setattr(idempotency, 'claim_key', lambda *args: (None, None))
+    monkeypatch.setattr(idempotency, 'finish_key', lambda *args: None)
+
+    @idempotent('transfer')
+    def handler():
+        return {'transfer_id': 7}, 201
+
+    headers = {'Idempotency-Key': 'k'}
+    with app.test_request_context(method='POST', data='{"amount": 5}', headers=headers):
+        handler()
+    with app.test_request_context(method='POST', data='{"amount": 6}', headers=headers):
+        body, status = handler()
+
+    assert status == 422
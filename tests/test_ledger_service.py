@@ -0,0 +1,31 @@
+from services.ledger_service import ledger_service
+
+
+class RecordingCursor:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((' '.join(sql.split()), params))
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_lock_accounts_locks_in_ascending_id_order():
+    cursor = RecordingCursor([{'account_id': 3}, {'account_id': 7}, {'account_id': 9}])
+
+    locked = ledger_service.lock_accounts(cursor, [9, 3, 7, 3])
+
+    [(sql, params)] = cursor.executed
+    assert params == [3, 7, 9]
+    assert sql.endswith('WHERE account_id IN (%s, %s, %s) ORDER BY account_id FOR UPDATE')
+    assert list(locked) == [3, 7, 9]
+
+
+def test_lock_accounts_without_ids_runs_no_query():
+    cursor = RecordingCursor()
+
+    assert ledger_service.lock_accounts(cursor, []) == {}
+    assert cursor.executed == []
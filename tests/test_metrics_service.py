@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+from db_pool import PooledConnection
+from services.metrics_service import metrics_service
+
+
+class FakeCursor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def executemany(self, sql, rows):
+        self.statements.append((sql.split()[2], rows))
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self.statements)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def test_postings_are_upserted_once_at_commit():
+    raw = FakeConnection()
+    conn = PooledConnection(None, raw)
+    cursor = conn.cursor(dictionary=True)
+
+    metrics_service.record_posting(cursor, 'deposit', Decimal('10.00'))
+    metrics_service.record_posting(cursor, 'withdraw', Decimal('3.00'))
+    metrics_service.record_posting(cursor, 'deposit', Decimal('5.00'))
+    assert raw.statements == []
+
+    conn.commit()
+
+    slots = metrics_service.slots
+    assert raw.statements == [
+        ('metrics_daily', [
+            ('deposit', '', slots, 2, Decimal('15.00')),
+            ('withdraw', '', slots, 1, Decimal('3.00'))
+        ]),
+        ('metrics_totals', [('bank_balances', '', slots, 0, Decimal('12.00'))])
+    ]
+    assert raw.commits == 1
+
+
+def test_rollback_discards_pending_deltas():
+    raw = FakeConnection()
+    conn = PooledConnection(None, raw)
+
+    metrics_service.record_posting(conn.cursor(), 'deposit', Decimal('10.00'))
+    conn.rollback()
+    conn.commit()
+
+    assert raw.statements == []
+
+
+def test_unpooled_cursor_writes_immediately():
+    statements = []
+
+    metrics_service.record_trades(FakeCursor(statements), [('buy', 'AAPL', Decimal('50.00'))])
+
+    assert statements == [('metrics_daily', [('stock_buy', 'AAPL', metrics_service.slots, 1, Decimal('50.00'))])]
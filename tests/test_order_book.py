@@ -0,0 +1,104 @@
+from decimal import Decimal
+
+import pytest
+
+from services import order_book
+from services.order_book import OrderBook, triggers_at_or_below
+
+
+def make_order(order_id, side, order_type, trigger_price, symbol='AAPL'):
+    return {
+        'order_id': order_id,
+        'symbol': symbol,
+        'side': side,
+        'order_type': order_type,
+        'trigger_price': Decimal(trigger_price)
+    }
+
+
+@pytest.mark.parametrize('side, order_type, fires_at, holds_at', [
+    ('buy', 'limit', '99.00', '101.00'),   # buy limit: price <= trigger
+    ('sell', 'limit', '101.00', '99.00'),  # sell limit: price >= trigger
+    ('buy', 'stop', '101.00', '99.00'),    # buy stop: price >= trigger
+    ('sell', 'stop', '99.00', '101.00'),   # sell stop: price <= trigger
+])
+def test_trigger_direction(side, order_type, fires_at, holds_at):
+    book = OrderBook()
+    book.add(make_order(1, side, order_type, '100.00'))
+
+    assert book.crossing('AAPL', Decimal(holds_at)) == []
+    assert 1 in book
+
+    assert [order['order_id'] for order in book.crossing('AAPL', Decimal(fires_at))] == [1]
+    assert 1 not in book
+
+
+@pytest.mark.parametrize('side, order_type', [
+    ('buy', 'limit'), ('sell', 'limit'), ('buy', 'stop'), ('sell', 'stop')
+])
+def test_trigger_fires_at_exact_price(side, order_type):
+    book = OrderBook()
+    book.add(make_order(1, side, order_type, '100.00'))
+
+    assert [order['order_id'] for order in book.crossing('AAPL', Decimal('100.00'))] == [1]
+
+
+def test_triggers_at_or_below():
+    assert triggers_at_or_below('buy', 'limit')
+    assert triggers_at_or_below('sell', 'stop')
+    assert not triggers_at_or_below('sell', 'limit')
+    assert not triggers_at_or_below('buy', 'stop')
+
+
+def test_crossing_pops_only_crossed_orders_best_trigger_first():
+    book = OrderBook()
+    book.add(make_order(1, 'buy', 'limit', '95.00'))
+    book.add(make_order(2, 'buy', 'limit', '99.00'))
+    book.add(make_order(3, 'buy', 'limit', '90.00'))
+    book.add(make_order(4, 'sell', 'limit', '120.00'))
+
+    triggered = book.crossing('AAPL', Decimal('94.00'))
+
+    assert [order['order_id'] for order in triggered] == [2, 1]
+    assert 3 in book and 4 in book
+    assert len(book) == 2
+
+
+def test_crossing_ignores_other_symbols():
+    book = OrderBook()
+    book.add(make_order(1, 'buy', 'limit', '100.00', symbol='MSFT'))
+
+    assert book.crossing('AAPL', Decimal('1.00')) == []
+    assert 1 in book
+
+
+def test_add_ignores_duplicates():
+    book = OrderBook()
+    book.add(make_order(1, 'buy', 'limit', '100.00'))
+    book.add(make_order(1, 'buy', 'limit', '100.00'))
+
+    assert len(book) == 1
+    assert book.heap_size('AAPL') == 1
+
+
+def test_removed_order_never_fires():
+    book = OrderBook()
+    book.add(make_order(1, 'sell', 'stop', '100.00'))
+
+    assert book.remove(1)['order_id'] == 1
+    assert book.remove(1) is None
+    assert book.crossing('AAPL', Decimal('50.00')) == []
+
+
+def test_dead_entries_are_compacted(monkeypatch):
+    monkeypatch.setattr(order_book, 'COMPACT_MIN_DEAD', 4)
+    book = OrderBook()
+    for order_id in range(1, 11):
+        book.add(make_order(order_id, 'buy', 'limit', f'{order_id}.00'))
+
+    for order_id in range(1, 6):
+        book.remove(order_id)
+
+    assert book.heap_size('AAPL') == 5
+    assert len(book) == 5
+    assert [order['order_id'] for order in book.crossing('AAPL', Decimal('8.00'))] == [10, 9, 8]
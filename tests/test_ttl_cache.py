@@ -0,0 +1,53 @@
+import time
+
+from ttl_cache import TTLCache
+
+
+def test_get_returns_stored_value():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.put('a', 1)
+
+    assert cache.get('a') == 1
+    assert cache.get('missing') is None
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.put('a', 1)
+    cache.put('b', 2, ttl=5)
+
+    now[0] += 10
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+
+    now[0] += 60
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_evicts_expired_before_live_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = TTLCache(max_size=2)
+    cache.put('live', 1)
+    cache.put('short', 2, ttl=1)
+    now[0] += 5
+    cache.put('new', 3)
+
+    assert cache.get('live') == 1
+    assert cache.get('new') == 3
+    assert len(cache) == 2
@@ -0,0 +1,263 @@
+from decimal import Decimal, InvalidOperation
+
+# Import from root
+from stock_config import StockConfig
+from services.ledger_service import ledger_service
+from services.metrics_service import metrics_service
+from services.receipt_service import receipt_service
+from services.stock_service import OrderPrice
+
+ORDER_SIDES = ('buy', 'sell')
+ACCOUNT_TYPES = ('checking', 'savings')
+
+class BatchOrderError(Exception):
+    """Raised when any order in a batch cannot be executed; carries per-order errors"""
+
+    def __init__(self, errors):
+        super().__init__('One or more orders failed')
+        self.errors = errors
+
+class TradingService:
+    """Executes several orders for one user in a single DB transaction"""
+
+    def __init__(self):
+        self.config = StockConfig()
+
+    def parse_orders(self, raw_orders):
+        """Validate the request payload; returns (orders, errors) with errors keyed by index"""
+        orders = []
+        errors = {}
+        for index, raw in enumerate(raw_orders):
+            if not isinstance(raw, dict) or not raw.get('symbol') or not raw.get('quantity'):
+                errors[index] = 'Symbol and quantity are required'
+                continue
+
+            side = str(raw.get('side', 'buy')).lower()
+            if side not in ORDER_SIDES:
+                errors[index] = 'Side must be buy or sell'
+                continue
+
+            account_type = raw.get('account_type', 'savings')
+            if account_type not in ACCOUNT_TYPES:
+                errors[index] = f'Account type must be one of: {", ".join(ACCOUNT_TYPES)}'
+                continue
+
+            try:
+                quantity = Decimal(str(raw['quantity']))
+            except InvalidOperation:
+                errors[index] = 'Invalid quantity'
+                continue
+            if not quantity.is_finite():
+                errors[index] = 'Invalid quantity'
+                continue
+            if quantity <= 0:
+                errors[index] = 'Quantity must be positive'
+                continue
+
+            orders.append({
+                'index': index,
+                'symbol': str(raw['symbol']).upper(),
+                'side': side,
+                'quantity': quantity,
+                'account_type': account_type
+            })
+        return orders, errors
+
+    def lock_user_accounts(self, cursor, user_id, account_types):
+        """Lock the user's first account of each type; returns {account_type: row}"""
+        placeholders = ', '.join(['%s'] * len(account_types))
+        cursor.execute(f"""
+            SELECT account_id, account_type
+            FROM accounts
+            WHERE user_id = %s AND account_type IN ({placeholders})
+            ORDER BY account_id
+        """, [user_id] + list(account_types))
+        first_by_type = {}
+        for row in cursor.fetchall():
+            first_by_type.setdefault(row['account_type'], row['account_id'])
+
+        locked = ledger_service.lock_accounts(cursor, first_by_type.values())
+        return {account_type: locked[account_id] for account_type, account_id in first_by_type.items()}
+
+    def lock_portfolios(self, cursor, user_id, symbols):
+        """Lock the user's holdings of `symbols`; returns {symbol: row}"""
+        placeholders = ', '.join(['%s'] * len(symbols))
+        cursor.execute(f"""
+            SELECT portfolio_id, symbol, quantity, total_invested
+            FROM stock_portfolios
+            WHERE user_id = %s AND symbol IN ({placeholders})
+            ORDER BY symbol
+            FOR UPDATE
+        """, [user_id] + list(symbols))
+        return {row['symbol']: row for row in cursor.fetchall()}
+
+    def execute_batch(self, cursor, user_id, orders, quotes):
+        """Fill `orders` at the prices in `quotes` ({symbol: price_data}).
+
+        Locks accounts (ascending id) and then holdings, as BuyStock does,
+        validates every order against the locked rows, and writes all
+        holdings, stock_transactions, transactions and receipt outbox rows
+        with executemany. Raises BatchOrderError without writing anything if
+        any order fails. Returns (results, receipts); the caller commits or
+        rolls back and publishes the receipts after committing.
+        """
+        account_types = sorted({order['account_type'] for order in orders})
+        symbols = sorted({order['symbol'] for order in orders})
+
+        placeholders = ', '.join(['%s'] * len(symbols))
+        cursor.execute(f"SELECT symbol FROM stocks WHERE symbol IN ({placeholders})", symbols)
+        listed = {row['symbol'] for row in cursor.fetchall()}
+
+        accounts = self.lock_user_accounts(cursor, user_id, account_types)
+        holdings = self.lock_portfolios(cursor, user_id, symbols)
+
+        positions = {
+            symbol: {
+                'quantity': Decimal(str(row['quantity'])),
+                'total_invested': Decimal(str(row['total_invested']))
+            }
+            for symbol, row in holdings.items()
+        }
+        net_cash = {account_type: Decimal('0') for account_type in account_types}
+        errors = {}
+        fills = []
+
+        for order in orders:
+            symbol, quantity = order['symbol'], order['quantity']
+            if symbol not in listed or symbol not in quotes:
+                errors[order['index']] = 'Stock not found'
+                continue
+            price = quotes[symbol]['price']
+            amount = quantity * price
+
+            if order['account_type'] not in accounts:
+                errors[order['index']] = f'{order["account_type"].title()} account not found'
+                continue
+            if amount < Decimal(str(self.config.MINIMUM_TRADE_AMOUNT)):
+                errors[order['index']] = f'Minimum trade amount is ${self.config.MINIMUM_TRADE_AMOUNT:.2f}'
+                continue
+
+            position = positions.setdefault(symbol, {'quantity': Decimal('0'), 'total_invested': Decimal('0')})
+            realized_pnl = None
+
+            if order['side'] == 'buy':
+                position['quantity'] += quantity
+                position['total_invested'] += amount
+                net_cash[order['account_type']] -= amount
+            else:
+                if position['quantity'] < quantity:
+                    errors[order['index']] = f'Insufficient shares. You own {position["quantity"]} shares of {symbol}'
+                    continue
+                cost_basis = position['total_invested'] / position['quantity'] * quantity
+                realized_pnl = amount - cost_basis
+                position['quantity'] -= quantity
+                position['total_invested'] -= cost_basis
+                net_cash[order['account_type']] += amount
+
+            fills.append((order, price, amount, realized_pnl))
+
+        # Funds are checked once per account, on the batch's net cash flow
+        for account_type, net in net_cash.items():
+            account = accounts.get(account_type)
+            if account and Decimal(str(account['balance'])) + net < 0:
+                for order in orders:
+                    if order['account_type'] == account_type and order['index'] not in errors:
+                        errors[order['index']] = f'Insufficient funds in {account_type} account'
+
+        if errors:
+            raise BatchOrderError(errors)
+
+        self.write_positions(cursor, user_id, positions, quotes)
+
+        cursor.executemany("""
+            INSERT INTO stock_transactions
+            (user_id, symbol, type, quantity, price, total_amount, order_type, status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, 'completed')
+        """, [
+            (user_id, order['symbol'], order['side'], float(order['quantity']), float(price), float(amount),
+             order.get('order_type', 'market'))
+            for order, price, amount, _ in fills
+        ])
+        metrics_service.record_trades(cursor, [
+            (order['side'], order['symbol'], amount) for order, price, amount, _ in fills
+        ])
+
+        posted = ledger_service.post_many(cursor, [
+            (
+                accounts[order['account_type']],
+                'withdraw' if order['side'] == 'buy' else 'deposit',
+                amount,
+                f'Stock {"purchase" if order["side"] == "buy" else "sale"}: {order["quantity"]} shares of {order["symbol"]}'
+            )
+            for order, price, amount, _ in fills
+        ])
+
+        # One receipt per fill, keyed on its bank transaction, as BuyStock/SellStock issue
+        receipts = receipt_service.stage(cursor, [
+            receipt_service.stock_trade_receipt(
+                user_id, order['symbol'], order['quantity'], price, amount, order['side'], transaction_id
+            )
+            for (order, price, amount, _), (transaction_id, _) in zip(fills, posted)
+        ])
+
+        results = []
+        for (order, price, amount, realized_pnl), (_, balance), receipt in zip(fills, posted, receipts):
+            result = {
+                'index': order['index'],
+                'symbol': order['symbol'],
+                'side': order['side'],
+                'quantity': float(order['quantity']),
+                'price_per_share': float(price),
+                'total_amount': float(amount),
+                'account_type': order['account_type'],
+                'bank_balance_after': float(balance),
+                'quote_source': quotes[order['symbol']].get('source'),
+                'quote': OrderPrice(order['symbol'], quotes[order['symbol']]).to_dict(),
+                'receipt_number': receipt['receipt_number']
+            }
+            if realized_pnl is not None:
+                result['realized_pnl'] = float(realized_pnl)
+            results.append(result)
+        return results, receipts
+
+    def write_positions(self, cursor, user_id, positions, quotes):
+        """Upsert open holdings and delete closed ones, one executemany each"""
+        upserts = []
+        closed = []
+        for symbol, position in positions.items():
+            quantity = position['quantity']
+            if quantity <= 0:
+                closed.append((user_id, symbol))
+                continue
+            current_value = quantity * quotes[symbol]['price']
+            upserts.append((
+                user_id,
+                symbol,
+                float(quantity),
+                float(position['total_invested'] / quantity),
+                float(position['total_invested']),
+                float(current_value),
+                float(current_value - position['total_invested'])
+            ))
+
+        if upserts:
+            cursor.executemany("""
+                INSERT INTO stock_portfolios
+                (user_id, symbol, quantity, average_price, total_invested, current_value, unrealized_pnl)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                quantity = VALUES(quantity),
+                average_price = VALUES(average_price),
+                total_invested = VALUES(total_invested),
+                current_value = VALUES(current_value),
+                unrealized_pnl = VALUES(unrealized_pnl),
+                updated_at = CURRENT_TIMESTAMP
+            """, upserts)
+        if closed:
+            cursor.executemany(
+                "DELETE FROM stock_portfolios WHERE user_id = %s AND symbol = %s",
+                closed
+            )
+
+# Global trading service instance
+trading_service = TradingService()
@@ -1,37 +1,71 @@
 from flask import request, jsonify
 from flask_restful import Resource
 from config import get_db_connection
-import jwt
+from auth_middleware import get_user_from_token
+from export_stream import streaming_response, csv_chunks, ndjson_chunks
+import base64
+import datetime
 
-def verify_token(token):
-    """Verify JWT token and return user data"""
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(created_at, transaction_id):
+    """Encode a (created_at, transaction_id) position as an opaque cursor"""
+    raw = f"{created_at.isoformat()}|{transaction_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor_value):
+    """Decode an opaque cursor back to (created_at, transaction_id); raises ValueError"""
     try:
-        payload = jwt.decode(token, 'your-secret-key-here-change-in-production', algorithms=['HS256'])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
+        padded = cursor_value + '=' * (-len(cursor_value) % 4)
+        created_at, transaction_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.datetime.fromisoformat(created_at), int(transaction_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
 
-def get_user_from_token():
-    """Extract user from authorization token"""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
+def count_transactions(cursor, account_ids, mode):
+    """Total transactions for the accounts: exact COUNT(*), optimizer estimate, or None"""
+    if mode == 'none':
         return None
     
-    token = auth_header.split(' ')[1]
-    user_data = verify_token(token)
-    return user_data
+    placeholders = ', '.join(['%s'] * len(account_ids))
+    if mode == 'approximate':
+        # Row estimate from the (account_id, created_at, transaction_id) index, no scan
+        cursor.execute(f"EXPLAIN SELECT transaction_id FROM transactions WHERE account_id IN ({placeholders})", account_ids)
+        plan = cursor.fetchall()
+        return int(plan[0]['rows'] or 0) if plan else 0
+    
+    cursor.execute(f"SELECT COUNT(*) as total FROM transactions WHERE account_id IN ({placeholders})", account_ids)
+    return cursor.fetchone()['total']
 
 class TransactionHistory(Resource):
     def get(self):
+        """Get transaction history across all of the user's accounts.
+        
+        Pass `before` (the `next_cursor` of the previous page) for keyset
+        pagination; `offset` is still accepted for older clients. `count` is
+        one of exact, approximate or none (default: exact for offset paging,
+        none for cursor paging).
+        """
         user_data = get_user_from_token()
         if not user_data:
             return {'error': 'Invalid or expired token'}, 401
         
         # Get query parameters for pagination/filtering
-        limit = request.args.get('limit', 10, type=int)
+        limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_PAGE_SIZE)
         offset = request.args.get('offset', 0, type=int)
+        before = request.args.get('before')
+        use_cursor = before is not None or request.args.get('paginate') == 'cursor'
+        count_mode = request.args.get('count', 'none' if use_cursor else 'exact')
+        
+        if count_mode not in ('exact', 'approximate', 'none'):
+            return {'error': 'count must be exact, approximate or none'}, 400
+        
+        before_position = None
+        if before:
+            try:
+                before_position = decode_cursor(before)
+            except ValueError:
+                return {'error': 'Invalid cursor'}, 400
         
         conn = get_db_connection()
         if not conn:
@@ -51,26 +85,48 @@ class TransactionHistory(Resource):
             account_ids = [acc['account_id'] for acc in accounts]
             placeholders = ', '.join(['%s'] * len(account_ids))
 
-            # Get transaction count for pagination (ALL accounts)
-            cursor.execute(f"SELECT COUNT(*) as total FROM transactions WHERE account_id IN ({placeholders})", account_ids)
-            total_count = cursor.fetchone()['total']
+            total_count = count_transactions(cursor, account_ids, count_mode)
             
-            # Get transactions with pagination (ALL accounts)
-            cursor.execute(f"""
-                SELECT 
-                    transaction_id,
-                    type,
-                    amount,
-                    balance_after,
-                    description,
-                    created_at
-                FROM transactions 
-                WHERE account_id IN ({placeholders})
-                ORDER BY created_at DESC 
-                LIMIT %s OFFSET %s
-            """, account_ids + [limit, offset])
+            if use_cursor:
+                # Keyset pagination: range scan on (account_id, created_at, transaction_id)
+                where = f"account_id IN ({placeholders})"
+                params = list(account_ids)
+                if before_position:
+                    where += " AND (created_at < %s OR (created_at = %s AND transaction_id < %s))"
+                    params += [before_position[0], before_position[0], before_position[1]]
+                
+                cursor.execute(f"""
+                    SELECT 
+                        transaction_id,
+                        type,
+                        amount,
+                        balance_after,
+                        description,
+                        created_at
+                    FROM transactions 
+                    WHERE {where}
+                    ORDER BY created_at DESC, transaction_id DESC 
+                    LIMIT %s
+                """, params + [limit + 1])
+            else:
+                # Get transactions with pagination (ALL accounts)
+                cursor.execute(f"""
+                    SELECT 
+                        transaction_id,
+                        type,
+                        amount,
+                        balance_after,
+                        description,
+                        created_at
+                    FROM transactions 
+                    WHERE account_id IN ({placeholders})
+                    ORDER BY created_at DESC, transaction_id DESC 
+                    LIMIT %s OFFSET %s
+                """, account_ids + [limit + 1, offset])
             
             transactions = cursor.fetchall()
+            has_more = len(transactions) > limit
+            transactions = transactions[:limit]
             
             # Format transactions for response
             formatted_transactions = []
@@ -84,14 +140,24 @@ class TransactionHistory(Resource):
                     'date': tx['created_at'].isoformat() if tx['created_at'] else None
                 })
             
+            next_cursor = None
+            if has_more and transactions:
+                last = transactions[-1]
+                next_cursor = encode_cursor(last['created_at'], last['transaction_id'])
+            
+            pagination = {
+                'total': total_count,
+                'total_is_estimate': count_mode == 'approximate',
+                'limit': limit,
+                'has_more': has_more,
+                'next_cursor': next_cursor
+            }
+            if not use_cursor:
+                pagination['offset'] = offset
+            
             return {
                 'transactions': formatted_transactions,
-                'pagination': {
-                    'total': total_count,
-                    'limit': limit,
-                    'offset': offset,
-                    'has_more': (offset + len(transactions)) < total_count
-                }
+                'pagination': pagination
             }
             
         except Exception as e:
@@ -159,4 +225,90 @@ class TransactionDetail(Resource):
             return {'error': f'Failed to get transaction details: {str(e)}'}, 500
         finally:
             cursor.close()
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+EXPORT_COLUMNS = ['id', 'account_number', 'type', 'amount', 'balance_after', 'description', 'date']
+
+def parse_export_date(value, field):
+    """Parse a YYYY-MM-DD query parameter"""
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'Invalid {field} date. Use YYYY-MM-DD')
+
+def format_export_row(tx):
+    return {
+        'id': tx['transaction_id'],
+        'account_number': tx['account_number'],
+        'type': tx['type'],
+        'amount': float(tx['amount']),
+        'balance_after': float(tx['balance_after']),
+        'description': tx['description'],
+        'date': tx['created_at'].isoformat() if tx['created_at'] else None
+    }
+
+def format_export_csv_row(tx):
+    row = format_export_row(tx)
+    row['amount'] = f"{tx['amount']:.2f}"
+    row['balance_after'] = f"{tx['balance_after']:.2f}"
+    return row
+
+class TransactionExport(Resource):
+    def get(self):
+        """Stream the user's full transaction history as CSV or NDJSON.
+        
+        Optional `from` / `to` (YYYY-MM-DD, inclusive) limit the date range.
+        Rows are read with an unbuffered cursor, so memory use does not grow
+        with the size of the history.
+        """
+        user_data = get_user_from_token()
+        if not user_data:
+            return {'error': 'Invalid or expired token'}, 401
+        
+        export_format = request.args.get('format', 'csv').lower()
+        if export_format not in ('csv', 'ndjson'):
+            return {'error': 'Format must be csv or ndjson'}, 400
+        
+        where = ["a.user_id = %s"]
+        params = [user_data['user_id']]
+        try:
+            if request.args.get('from'):
+                where.append("t.created_at >= %s")
+                params.append(parse_export_date(request.args['from'], 'from'))
+            if request.args.get('to'):
+                where.append("t.created_at < %s")
+                params.append(parse_export_date(request.args['to'], 'to') + datetime.timedelta(days=1))
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        
+        conn = get_db_connection()
+        if not conn:
+            return {'error': 'Database connection failed'}, 500
+        
+        try:
+            # Unbuffered: rows are pulled from the server as the response is written
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            cursor.execute(f"""
+                SELECT 
+                    t.transaction_id,
+                    a.account_number,
+                    t.type,
+                    t.amount,
+                    t.balance_after,
+                    t.description,
+                    t.created_at
+                FROM transactions t
+                JOIN accounts a ON t.account_id = a.account_id
+                WHERE {' AND '.join(where)}
+                ORDER BY t.created_at, t.transaction_id
+            """, params)
+        except Exception as e:
+            conn.close()
+            return {'error': f'Failed to export transactions: {str(e)}'}, 500
+        
+        if export_format == 'csv':
+            body = csv_chunks(cursor, EXPORT_COLUMNS, format_export_csv_row)
+            return streaming_response(conn, cursor, body, 'text/csv', 'transactions.csv')
+        
+        body = ndjson_chunks(cursor, format_export_row)
+        return streaming_response(conn, cursor, body, 'application/x-ndjson', 'transactions.ndjson')
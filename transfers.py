@@ -1,30 +1,14 @@
 from flask import request, jsonify
 from flask_restful import Resource
 from config import get_db_connection
-import jwt
+from auth_middleware import get_user_from_token
+from idempotency import idempotent
+from services.ledger_service import ledger_service
+from services.receipt_service import receipt_service
 from decimal import Decimal
 
-def verify_token(token):
-    """Verify JWT token and return user data"""
-    try:
-        payload = jwt.decode(token, 'your-secret-key-here-change-in-production', algorithms=['HS256'])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
-
-def get_user_from_token():
-    """Extract user from authorization token"""
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    
-    token = auth_header.split(' ')[1]
-    user_data = verify_token(token)
-    return user_data
-
 class Transfer(Resource):
+    @idempotent('transfer')
     def post(self):
         user_data = get_user_from_token()
         if not user_data:
@@ -56,9 +40,9 @@ class Transfer(Resource):
         try:
             cursor = conn.cursor(dictionary=True, buffered=True)
             
-            # Get sender's account with balance check
+            # Resolve sender's account
             cursor.execute("""
-                SELECT a.account_id, a.balance, a.account_number, a.user_id, u.full_name, u.email
+                SELECT a.account_id, a.account_number, a.user_id, u.full_name, u.email
                 FROM accounts a 
                 JOIN users u ON a.user_id = u.user_id 
                 WHERE a.account_number = %s AND a.user_id = %s
@@ -68,20 +52,9 @@ class Transfer(Resource):
             if not sender_account:
                 return {'error': f'Sender account {from_account} not found'}, 404
             
-            # Check if sender has sufficient funds
-            sender_balance = Decimal(str(sender_account['balance']))
-            if sender_balance < amount:
-                return {'error': 'Insufficient funds'}, 400
-            
-            # Check minimum balance after transfer
-            new_sender_balance = sender_balance - amount
-            min_balance = Decimal('10') if sender_account['account_number'].startswith('NBS') else Decimal('5')
-            if new_sender_balance < min_balance:
-                return {'error': f'Account must maintain minimum balance of ${min_balance} after transfer'}, 400
-            
             # Get recipient's account by account number (CASE INSENSITIVE)
             cursor.execute("""
-                SELECT a.account_id, a.balance, a.account_number, a.user_id, u.full_name, u.email
+                SELECT a.account_id, a.account_number, a.user_id, u.full_name, u.email
                 FROM accounts a 
                 JOIN users u ON a.user_id = u.user_id 
                 WHERE UPPER(a.account_number) = UPPER(%s)
@@ -95,44 +68,44 @@ class Transfer(Resource):
             if recipient_account['user_id'] == user_data['user_id']:
                 return {'error': 'Cannot transfer to your own account'}, 400
             
-            # Update sender's balance
-            cursor.execute(
-                "UPDATE accounts SET balance = %s WHERE account_id = %s",
-                (float(new_sender_balance), sender_account['account_id'])
+            # Lock both accounts (in account_id order) and read their current balances
+            locked = ledger_service.lock_accounts(
+                cursor, [sender_account['account_id'], recipient_account['account_id']]
             )
+            sender_ledger = locked[sender_account['account_id']]
+            recipient_ledger = locked[recipient_account['account_id']]
             
-            # Record sender's transaction (withdrawal)
-            cursor.execute(
-                """INSERT INTO transactions 
-                (account_id, type, amount, balance_after, description) 
-                VALUES (%s, %s, %s, %s, %s)""",
-                (sender_account['account_id'], 'withdraw', float(amount), 
-                 float(new_sender_balance), f'Transfer to {recipient_account["full_name"]}: {description}')
-            )
+            # Check if sender has sufficient funds
+            sender_balance = Decimal(str(sender_ledger['balance']))
+            if sender_balance < amount:
+                return {'error': 'Insufficient funds'}, 400
             
-            sender_transaction_id = cursor.lastrowid
+            # Check minimum balance after transfer
+            new_sender_balance = sender_balance - amount
+            min_balance = Decimal('10') if sender_account['account_number'].startswith('NBS') else Decimal('5')
+            if new_sender_balance < min_balance:
+                return {'error': f'Account must maintain minimum balance of ${min_balance} after transfer'}, 400
             
-            # Update recipient's balance
-            recipient_balance = Decimal(str(recipient_account['balance']))
-            new_recipient_balance = recipient_balance + amount
-            cursor.execute(
-                "UPDATE accounts SET balance = %s WHERE account_id = %s",
-                (float(new_recipient_balance), recipient_account['account_id'])
+            # Debit sender and record sender's transaction (withdrawal)
+            sender_transaction_id, new_sender_balance = ledger_service.post(
+                cursor, sender_ledger, 'withdraw', amount,
+                f'Transfer to {recipient_account["full_name"]}: {description}'
             )
             
-            # Record recipient's transaction (deposit)
-            cursor.execute(
-                """INSERT INTO transactions 
-                (account_id, type, amount, balance_after, description) 
-                VALUES (%s, %s, %s, %s, %s)""",
-                (recipient_account['account_id'], 'deposit', float(amount), 
-                 float(new_recipient_balance), f'Transfer from {sender_account["full_name"]}: {description}')
+            # Credit recipient and record recipient's transaction (deposit)
+            recipient_transaction_id, new_recipient_balance = ledger_service.post(
+                cursor, recipient_ledger, 'deposit', amount,
+                f'Transfer from {sender_account["full_name"]}: {description}'
             )
             
-            recipient_transaction_id = cursor.lastrowid
+            receipt = receipt_service.create_transfer_receipt(
+                cursor, user_data['user_id'], amount, sender_account['account_number'],
+                recipient_account['account_number'], description, sender_transaction_id
+            )
             
             # Commit changes
             conn.commit()
+            receipt_service.publish(receipt)
             
             return {
                 'message': 'Transfer successful',
@@ -143,7 +116,8 @@ class Transfer(Resource):
                     'amount': float(amount),
                     'description': description,
                     'sender_new_balance': float(new_sender_balance),
-                    'transaction_id': sender_transaction_id
+                    'transaction_id': sender_transaction_id,
+                    'receipt_number': receipt['receipt_number']
                 }
             }
             